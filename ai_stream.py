@@ -0,0 +1,50 @@
+import queue
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from metrics import gemini_stream
+# ======================================================================================
+# CHẠY ĐỒNG THỜI VÀ NHẬN PHẢN HỒI DẠNG LUỒNG TỪ GEMINI
+# Mỗi yêu cầu chạy trong một luồng của ThreadPoolExecutor và đẩy từng mảnh văn bản
+# vào một hàng đợi chung. Luồng chính (luồng script Streamlit) đọc hàng đợi và cập
+# nhật giao diện, vì các lệnh st.* chỉ được gọi từ luồng chính.
+# ======================================================================================
+# text: mảnh văn bản mới (None với sự kiện lỗi/kết thúc); error: ngoại lệ nếu có; done: luồng đã kết thúc
+StreamEvent = namedtuple("StreamEvent", ["name", "text", "error", "done"])
+
+def stream_text(model, prompt, generation_config=None, stage="stream"):
+    """
+    Sinh lần lượt các mảnh văn bản từ model.generate_content(..., stream=True).
+    Độ trễ và số token được ghi vào metrics dưới công đoạn gemini.<stage>.
+    """
+    for chunk in gemini_stream(stage, model, prompt, generation_config=generation_config):
+        if chunk.text:
+            yield chunk.text
+
+def stream_concurrently(streams, max_workers=None):
+    """
+    Chạy đồng thời các luồng sinh văn bản.
+    streams: dict {tên: hàm không tham số trả về iterator các mảnh văn bản}.
+    Sinh ra StreamEvent theo thứ tự mảnh văn bản đến; mỗi luồng kết thúc bằng một sự kiện done=True.
+    """
+    events = queue.Queue()
+
+    def worker(name, factory):
+        try:
+            for piece in factory():
+                events.put(StreamEvent(name, piece, None, False))
+        except Exception as e:
+            events.put(StreamEvent(name, None, e, False))
+        finally:
+            events.put(StreamEvent(name, None, None, True))
+
+    if not streams:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers or len(streams)) as executor:
+        for name, factory in streams.items():
+            executor.submit(worker, name, factory)
+        remaining = len(streams)
+        while remaining:
+            event = events.get()
+            if event.done:
+                remaining -= 1
+            yield event
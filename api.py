@@ -0,0 +1,309 @@
+"""
+Dịch vụ HTTP thẩm định (không cần giao diện Streamlit) cho các hệ thống khác gọi trực tiếp.
+
+Các điểm cuối (dữ liệu vào/ra JSON, trừ khi ghi chú khác):
+    POST /trich-xuat     thân yêu cầu là nội dung file .docx -> {"thong_tin": {...}} (?van_ban=1: kèm toàn văn)
+    POST /chi-so         {"so_tien_vay", "tong_nhu_cau_von", "von_doi_ung", "tsdb_gia_tri"} -> các chỉ số (%)
+    POST /lich-tra-no    {"so_tien_vay", "lai_suat", "thoi_gian_vay", "phuong_thuc_tra_no"?, "an_han_goc"?,
+                          "chu_ky_tra_goc"?} -> lịch trả nợ theo cột và số liệu tổng hợp
+    POST /excel          các trường như /lich-tra-no cùng thông tin khách hàng ("ho_ten", "cccd",
+                         "muc_dich_vay": chuỗi), TSĐB -> file .xlsx
+    GET  /tai-xuong/<mã> file tải xuống lớn do ứng dụng Streamlit ghi (downloads.py), gửi theo từng khối
+    GET  /health, GET /metrics (Prometheus)
+
+Dữ liệu vào không hợp lệ: 422 khi thiếu trường hoặc trường không phải số; 400 khi số không hữu
+hạn (NaN, Infinity), nằm ngoài phạm vi cho phép hoặc trường văn bản không phải chuỗi.
+
+Công đoạn nặng CPU (đọc .docx, ghi .xlsx) chạy trên nhóm tiến trình để vòng lặp sự kiện
+luôn rảnh nhận yêu cầu; chỉ số và lịch trả nợ (đã vector hóa, dưới 1 ms) tính ngay.
+
+Cấu hình bằng biến môi trường: API_WORKERS (số tiến trình xử lý, mặc định số nhân CPU;
+0: dùng luồng trong tiến trình), API_MAX_BODY_MB (mặc định 20), API_MAX_TERM (số kỳ tối
+đa của lịch trả nợ, mặc định 600), API_MAX_AMOUNT (số tiền lớn nhất, mặc định 10^15 đồng),
+DOWNLOAD_DIR (thư mục tải xuống dùng chung với ứng dụng Streamlit, xem downloads.py).
+
+Cách chạy:
+    python api.py [--host 0.0.0.0] [--port 8000]
+    (hoặc: uvicorn api:app --host 0.0.0.0 --port 8000)
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from io import BytesIO
+from xml.etree.ElementTree import ParseError
+import uvicorn
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+import core
+import downloads
+from excel_export import appraisal_inputs, generate_excel_download
+from metrics import REGISTRY
+from schedule import GOC_DEU, METHODS
+
+MAX_BODY_BYTES = int(float(os.environ.get("API_MAX_BODY_MB", 20)) * 1024 * 1024)
+MAX_TERM = int(os.environ.get("API_MAX_TERM", 600))
+# Giới hạn số tiền để lịch trả nợ (kể cả lãi cộng dồn) luôn là số hữu hạn
+MAX_AMOUNT = float(os.environ.get("API_MAX_AMOUNT", 1e15))
+MAX_RATE = 100
+# Giới hạn ký tự của một ô Excel
+MAX_TEXT_LENGTH = 32767
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Tên trường JSON cho các cột của lịch trả nợ
+SCHEDULE_FIELDS = {
+    "Kỳ trả nợ": "ky",
+    "Dư nợ đầu kỳ": "du_no_dau_ky",
+    "Gốc trả trong kỳ": "goc",
+    "Lãi trả trong kỳ": "lai",
+    "Tổng gốc và lãi": "tong_tra",
+    "Dư nợ cuối kỳ": "du_no_cuoi_ky",
+}
+RATIO_FIELDS = ["so_tien_vay", "tong_nhu_cau_von", "von_doi_ung", "tsdb_gia_tri"]
+# Trường văn bản được ghi vào file Excel
+TEXT_FIELDS = ["ho_ten", "cccd", "muc_dich_vay"]
+# Ký tự điều khiển mà openpyxl không cho ghi vào ô
+_ILLEGAL_TEXT = re.compile(r"[\000-\010\013\014\016-\037]")
+
+# ======================================================================================
+# CÔNG VIỆC CHẠY TRONG TIẾN TRÌNH XỬ LÝ (hàm cấp module để gửi được sang tiến trình con)
+# ======================================================================================
+def _extract_job(data, with_text):
+    """(toàn văn hoặc None, thông tin); không cần toàn văn thì chỉ đọc file tới khi đủ thông tin."""
+    if with_text:
+        return core.extract_and_parse_docx(BytesIO(data))
+    return None, core.parse_docx(BytesIO(data))
+
+def _excel_job(info, loan_terms):
+    df = core.calculate_repayment_schedule(*loan_terms)
+    ratios = core.calculate_ratios(*(info.get(field, 0) for field in RATIO_FIELDS))
+    return generate_excel_download(df, appraisal_inputs(info), ratios)
+
+async def run_cpu(request, func, *args):
+    """Chạy func trên nhóm tiến trình của ứng dụng (hoặc nhóm luồng mặc định khi API_WORKERS=0)."""
+    return await asyncio.get_running_loop().run_in_executor(request.app.state.pool, func, *args)
+
+# ======================================================================================
+# ĐỌC VÀ KIỂM TRA DỮ LIỆU VÀO
+# ======================================================================================
+async def read_body(request, limit=MAX_BODY_BYTES):
+    """Đọc thân yêu cầu, dừng ngay (413) khi vượt giới hạn thay vì đọc hết vào bộ nhớ."""
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(413, f"Dữ liệu gửi lên vượt quá {limit // (1024 * 1024)} MB.")
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(413, f"Dữ liệu gửi lên vượt quá {limit // (1024 * 1024)} MB.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+async def read_json(request):
+    try:
+        payload = json.loads(await read_body(request))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Dữ liệu gửi lên không phải JSON hợp lệ.")
+    if not isinstance(payload, dict):
+        raise HTTPException(400, "Dữ liệu gửi lên phải là một đối tượng JSON.")
+    return payload
+
+def number_field(payload, name, default=None, minimum=0, maximum=MAX_AMOUNT, allow_minimum=True, integer=False):
+    """
+    Giá trị số của trường name trong khoảng [minimum, maximum] (allow_minimum=False: lớn hơn hẳn
+    minimum); integer=True: phải là số nguyên, trả về int.
+    """
+    value = payload.get(name, default)
+    if value is None:
+        raise HTTPException(422, f"Thiếu trường '{name}'.")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise HTTPException(422, f"Trường '{name}' phải là số.")
+    # JSON cho phép NaN, Infinity và số nguyên vượt quá phạm vi số thực
+    try:
+        finite = math.isfinite(value)
+    except OverflowError:
+        finite = False
+    if not finite:
+        raise HTTPException(400, f"Trường '{name}' phải là số hữu hạn.")
+    if value < minimum or (value == minimum and not allow_minimum):
+        raise HTTPException(400, f"Trường '{name}' phải từ {minimum:g} trở lên." if allow_minimum
+                            else f"Trường '{name}' phải lớn hơn {minimum:g}.")
+    if value > maximum:
+        raise HTTPException(400, f"Trường '{name}' không được vượt quá {maximum:g}.")
+    if integer:
+        if value != int(value):
+            raise HTTPException(400, f"Trường '{name}' phải là số nguyên.")
+        return int(value)
+    return value
+
+def text_field(payload, name):
+    """Giá trị chuỗi của trường name (mặc định chuỗi rỗng), ghi được vào ô Excel."""
+    value = payload.get(name)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise HTTPException(400, f"Trường '{name}' phải là chuỗi.")
+    if len(value) > MAX_TEXT_LENGTH:
+        raise HTTPException(400, f"Trường '{name}' dài quá {MAX_TEXT_LENGTH} ký tự.")
+    if _ILLEGAL_TEXT.search(value):
+        raise HTTPException(400, f"Trường '{name}' chứa ký tự điều khiển không hợp lệ.")
+    return value
+
+def loan_terms(payload):
+    """Tham số của core.calculate_repayment_schedule lấy từ JSON, đã kiểm tra hợp lệ."""
+    method = payload.get("phuong_thuc_tra_no", GOC_DEU)
+    if method not in METHODS:
+        raise HTTPException(422, f"Phương thức trả nợ không hợp lệ, chọn một trong: {', '.join(METHODS)}.")
+    term = number_field(payload, "thoi_gian_vay", minimum=1, maximum=MAX_TERM, integer=True)
+    return (
+        number_field(payload, "so_tien_vay", allow_minimum=False),
+        number_field(payload, "lai_suat", maximum=MAX_RATE, allow_minimum=False),
+        term,
+        method,
+        number_field(payload, "an_han_goc", 0, maximum=MAX_TERM, integer=True),
+        number_field(payload, "chu_ky_tra_goc", 3, minimum=1, maximum=MAX_TERM, integer=True),
+    )
+
+# ======================================================================================
+# ĐIỂM CUỐI
+# ======================================================================================
+async def extract(request):
+    data = await read_body(request)
+    if not data:
+        raise HTTPException(400, "Chưa gửi nội dung file .docx.")
+    with_text = request.query_params.get("van_ban") in ("1", "true")
+    try:
+        text, info = await run_cpu(request, _extract_job, data, with_text)
+    except (zipfile.BadZipFile, ParseError, KeyError, ValueError) as e:
+        raise HTTPException(422, f"Không đọc được file .docx: {e}")
+    result = {"thong_tin": info}
+    if with_text:
+        result["van_ban"] = text
+    return JSONResponse(result)
+
+def finite_json(content):
+    """JSONResponse cho kết quả tính toán; 400 thay vì lỗi 500 khi kết quả có NaN hoặc vô cực."""
+    try:
+        return JSONResponse(content)
+    except ValueError:
+        raise HTTPException(400, "Kết quả tính toán không hữu hạn, hãy kiểm tra lại dữ liệu vào.")
+
+async def ratios(request):
+    payload = await read_json(request)
+    values = core.calculate_ratios(*(number_field(payload, field) for field in RATIO_FIELDS))
+    return finite_json({"chi_so": values, "hien_thi": core.format_ratios_for_report(values)})
+
+async def repayment_schedule(request):
+    df = core.calculate_repayment_schedule(*loan_terms(await read_json(request)))
+    return finite_json({
+        "lich_tra_no": {field: df[col].tolist() for col, field in SCHEDULE_FIELDS.items()} if not df.empty else {},
+        "tong_hop": core.summarize_schedule(df),
+    })
+
+async def excel(request):
+    payload = await read_json(request)
+    terms = loan_terms(payload)
+    info = {field: text_field(payload, field) for field in TEXT_FIELDS}
+    info.update({field: number_field(payload, field, 0) for field in RATIO_FIELDS})
+    info.update(so_tien_vay=terms[0], lai_suat=terms[1], thoi_gian_vay=terms[2], phuong_thuc_tra_no=terms[3],
+                an_han_goc=terms[4])
+    data = await run_cpu(request, _excel_job, info, terms)
+    name = "".join(ch for ch in info["ho_ten"] if ch.isascii() and ch.isalnum()) or "KH"
+    return Response(data, media_type=XLSX_MIME,
+                    headers={"Content-Disposition": f'attachment; filename="KeHoachTraNo_{name}.xlsx"'})
+
+async def download(request):
+    path = downloads.resolve(request.path_params["token"])
+    if path is None:
+        raise HTTPException(404, "File tải xuống không tồn tại hoặc đã hết hạn.")
+    # FileResponse đọc và gửi file theo từng khối 64 KB
+    return FileResponse(path, filename=os.path.basename(path))
+
+async def health(request):
+    return JSONResponse({"trang_thai": "ok"})
+
+async def metrics(request):
+    return PlainTextResponse(REGISTRY.to_prometheus())
+
+async def http_error(request, exc):
+    return JSONResponse({"loi": exc.detail}, status_code=exc.status_code)
+
+# ======================================================================================
+# ỨNG DỤNG
+# ======================================================================================
+class TimingMiddleware:
+    """Ghi thời gian xử lý từng điểm cuối vào REGISTRY (công đoạn 'api <đường dẫn>')."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = []
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            await send(message)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Đường dẫn không tồn tại không được ghi để số công đoạn không tăng theo yêu cầu rác;
+            # ghi theo mẫu đường dẫn của route (không theo mã trong đường dẫn)
+            route = scope.get("route")
+            path = route.path if route is not None else scope["path"]
+            if not status or status[0] not in (404, 405):
+                REGISTRY.observe(f"api {path}", time.perf_counter() - start, error=not status or status[0] >= 500)
+
+def create_pool():
+    """Nhóm tiến trình xử lý công đoạn nặng CPU (None: dùng nhóm luồng mặc định của asyncio)."""
+    workers = int(os.environ.get("API_WORKERS", os.cpu_count() or 1))
+    if workers <= 0:
+        return None
+    # spawn thay vì fork: tiến trình máy chủ đã có các luồng của vòng lặp sự kiện
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.pool = create_pool()
+    try:
+        yield
+    finally:
+        if app.state.pool is not None:
+            app.state.pool.shutdown(cancel_futures=True)
+
+app = Starlette(
+    routes=[
+        Route("/trich-xuat", extract, methods=["POST"]),
+        Route("/chi-so", ratios, methods=["POST"]),
+        Route("/lich-tra-no", repayment_schedule, methods=["POST"]),
+        Route("/excel", excel, methods=["POST"]),
+        Route("/tai-xuong/{token}", download),
+        Route("/health", health),
+        Route("/metrics", metrics),
+    ],
+    exception_handlers={HTTPException: http_error},
+    lifespan=lifespan,
+)
+app.add_middleware(TimingMiddleware)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dịch vụ HTTP thẩm định phương án kinh doanh.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    # Một tiến trình máy chủ là đủ: phần nặng CPU đã chạy trên nhóm tiến trình xử lý
+    uvicorn.run(app, host=args.host, port=args.port, access_log=False)
+
+if __name__ == "__main__":
+    main()
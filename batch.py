@@ -0,0 +1,154 @@
+"""
+Chế độ thẩm định hàng loạt (không cần giao diện Streamlit).
+
+Chạy cùng quy trình với ứng dụng (đọc .docx -> trích xuất thông tin -> chỉ số
+-> kế hoạch trả nợ) cho cả một thư mục hoặc một file .zip chứa các phương án,
+phân phối trên nhiều tiến trình và ghi ra một bảng tổng hợp duy nhất.
+
+Cách dùng:
+    python batch.py <thư_mục | file.zip> -o ket_qua.xlsx [-j SỐ_TIẾN_TRÌNH] [--bao-cao bao_cao.zip]
+                    [--metrics so_lieu.jsonl | so_lieu.prom]
+"""
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import pandas as pd
+import core
+from excel_export import FORMAT_VND, frame_sheet, write_workbook
+from metrics import REGISTRY, timed
+from report import build_context, render_reports_zip
+
+# Các cột tiền (VNĐ) được định dạng phân cách hàng nghìn khi ghi ra .xlsx
+VND_COLUMNS = [
+    "tong_nhu_cau_von", "von_doi_ung", "so_tien_vay", "tsdb_gia_tri", "doanh_thu", "chi_phi",
+    "chenh_lech_thu_chi", "nguon_tra_no", "tong_goc", "tong_lai", "tong_goc_lai", "ky_tra_cao_nhat",
+]
+
+# Mỗi tiến trình con giữ sẵn các file .zip đã mở để không phải mở lại cho từng phương án
+_open_archives = {}
+
+def list_sources(input_path):
+    """
+    Liệt kê các phương án cần xử lý dưới dạng (đường_dẫn, tên_trong_zip).
+    Với file nằm trực tiếp trên đĩa, tên_trong_zip là None.
+    """
+    sources = []
+    if os.path.isdir(input_path):
+        for root, _, files in os.walk(input_path):
+            for name in sorted(files):
+                # Bỏ qua file tạm của Word (~$...)
+                if name.lower().endswith(".docx") and not name.startswith("~$"):
+                    sources.append((os.path.join(root, name), None))
+    elif zipfile.is_zipfile(input_path) and not input_path.lower().endswith(".docx"):
+        with zipfile.ZipFile(input_path) as zf:
+            for member in zf.namelist():
+                base = os.path.basename(member)
+                if member.lower().endswith(".docx") and not base.startswith("~$"):
+                    sources.append((input_path, member))
+    elif input_path.lower().endswith(".docx"):
+        sources.append((input_path, None))
+    else:
+        raise ValueError(f"Không nhận dạng được đầu vào: {input_path}")
+    return sources
+
+def _read_source(path, member):
+    """Trả về đối tượng file-like cho một phương án."""
+    if member is None:
+        return path
+    archive = _open_archives.get(path)
+    if archive is None:
+        archive = _open_archives[path] = zipfile.ZipFile(path)
+    return BytesIO(archive.read(member))
+
+@timed("appraise_source")
+def appraise_source(source):
+    """Thẩm định một phương án; mọi lỗi được ghi vào cột 'loi' thay vì dừng cả lô."""
+    path, member = source
+    row = {"file": member if member is not None else path, "loi": ""}
+    try:
+        info = core.parse_docx(_read_source(path, member))
+        row.update(info)
+        row.update(core.calculate_ratios(
+            info["so_tien_vay"], info["tong_nhu_cau_von"], info["von_doi_ung"], info["tsdb_gia_tri"]
+        ))
+        schedule = core.calculate_repayment_schedule(
+            info["so_tien_vay"], info["lai_suat"], int(info["thoi_gian_vay"] or 0)
+        )
+        row.update(core.summarize_schedule(schedule))
+    except Exception as e:
+        row["loi"] = f"{type(e).__name__}: {e}"
+    return row
+
+def run_batch(sources, workers=None):
+    """Xử lý danh sách phương án trên một nhóm tiến trình, trả về DataFrame tổng hợp."""
+    workers = workers or os.cpu_count() or 1
+    if not sources:
+        return pd.DataFrame(columns=["file", "loi"])
+    # Gom việc thành từng cụm để giảm chi phí trao đổi giữa các tiến trình
+    chunksize = max(1, len(sources) // (workers * 4))
+    if workers == 1:
+        rows = [appraise_source(s) for s in sources]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(appraise_source, sources, chunksize=chunksize))
+    df = pd.DataFrame(rows)
+    # Đưa cột lỗi về cuối bảng cho dễ đọc
+    return df[[c for c in df.columns if c != "loi"] + ["loi"]]
+
+def write_table(df, output_path):
+    """Ghi bảng tổng hợp theo định dạng suy ra từ phần mở rộng (.parquet, .csv, .xlsx)."""
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext == ".parquet":
+        df.to_parquet(output_path, index=False)
+    elif ext == ".csv":
+        df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    elif ext in (".xlsx", ".xls"):
+        write_workbook(output_path, [frame_sheet("TongHop", df, {col: FORMAT_VND for col in VND_COLUMNS if col in df.columns})])
+    else:
+        raise ValueError(f"Định dạng đầu ra không được hỗ trợ: {ext}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Thẩm định hàng loạt các phương án kinh doanh (.docx).")
+    parser.add_argument("input", help="Thư mục, file .zip hoặc file .docx cần xử lý")
+    parser.add_argument("-o", "--output", default="ket_qua_tham_dinh.xlsx",
+                        help="File kết quả (.parquet, .csv hoặc .xlsx)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="Số tiến trình xử lý (mặc định: số nhân CPU)")
+    parser.add_argument("--bao-cao", dest="reports", default=None,
+                        help="Ghi thêm báo cáo thẩm định (.docx) của từng phương án vào file .zip này")
+    parser.add_argument("--metrics", default=None,
+                        help="Ghi số liệu thời gian theo công đoạn ra file (.prom: Prometheus, còn lại: JSON lines). "
+                             "Số liệu từng phương án chỉ đầy đủ khi chạy một tiến trình (-j 1)")
+    args = parser.parse_args(argv)
+
+    sources = list_sources(args.input)
+    start = time.perf_counter()
+    with timed("run_batch"):
+        df = run_batch(sources, args.workers)
+    elapsed = time.perf_counter() - start
+    with timed("write_table"):
+        write_table(df, args.output)
+
+    if args.reports:
+        ok = df[df["loi"] == ""]
+        jobs = (
+            (f"{os.path.splitext(os.path.basename(row['file']))[0]}_{idx}.docx",
+             build_context(row, core.format_ratios_for_report(row)))
+            for idx, row in zip(ok.index, ok.to_dict("records"))
+        )
+        render_reports_zip(jobs, args.reports, workers=args.workers)
+    if args.metrics:
+        REGISTRY.dump(args.metrics)
+
+    n_errors = int((df["loi"] != "").sum())
+    rate = len(df) / elapsed if elapsed > 0 else 0
+    print(f"Đã xử lý {len(df)} phương án ({n_errors} lỗi) trong {elapsed:.2f}s "
+          f"- {rate:.1f} file/s -> {args.output}", file=sys.stderr)
+    return 0 if n_errors == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
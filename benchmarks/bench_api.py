@@ -0,0 +1,105 @@
+"""
+Đo thông lượng dịch vụ HTTP api.py: khởi động máy chủ uvicorn trong tiến trình riêng rồi
+gửi yêu cầu đồng thời trên các kết nối giữ mở (keep-alive) tới từng điểm cuối, báo số
+yêu cầu mỗi giây và độ trễ p50/p95.
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.bench_api [--connections 32] [--duration 5] [--pages 10] [--term 120]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from benchmarks.synthetic import build_plan_docx, random_plan
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def fetch(reader, writer, path, body, content_type):
+    """Gửi một yêu cầu POST trên kết nối có sẵn; trả về mã trạng thái."""
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("ascii") + body)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+async def load(port, path, body, content_type, connections, duration):
+    """Mỗi kết nối gửi liên tục trong `duration` giây; trả về (độ trễ các yêu cầu thành công, số lỗi)."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if await fetch(reader, writer, path, body, content_type) == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        writer.close()
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    return latencies, errors
+
+def wait_ready(port, timeout=30):
+    async def probe():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /health HTTP/1.1\r\nHost: bench\r\n\r\n")
+        await reader.readline()
+        writer.close()
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return asyncio.run(probe())
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--connections", type=int, default=32, help="Số kết nối gửi đồng thời")
+    parser.add_argument("--duration", type=float, default=5.0, help="Thời gian đo mỗi điểm cuối (giây)")
+    parser.add_argument("--pages", type=int, default=10, help="Cỡ phương án .docx cho /trich-xuat")
+    parser.add_argument("--term", type=int, default=120, help="Số kỳ của lịch trả nợ")
+    parser.add_argument("--workers", default=None, help="API_WORKERS cho máy chủ (mặc định: số nhân CPU)")
+    args = parser.parse_args(argv)
+
+    plan = random_plan(0)
+    loan = json.dumps({**plan, "thoi_gian_vay": args.term}, ensure_ascii=False).encode("utf-8")
+    docx, _ = build_plan_docx(args.pages, 0)
+    cases = [
+        ("/chi-so", loan, "application/json"),
+        ("/lich-tra-no", loan, "application/json"),
+        ("/excel", loan, "application/json"),
+        ("/trich-xuat", docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    ]
+
+    env = dict(os.environ)
+    if args.workers is not None:
+        env["API_WORKERS"] = args.workers
+    server = subprocess.Popen([sys.executable, "api.py", "--port", str(args.port)], cwd=ROOT, env=env)
+    try:
+        wait_ready(args.port)
+        print(f"{'điểm cuối':>14} {'yêu cầu/s':>10} {'lỗi':>5} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+        for path, body, content_type in cases:
+            # Lượt ngắn để khởi động tiến trình xử lý và cache trước khi đo
+            asyncio.run(load(args.port, path, body, content_type, args.connections, 0.5))
+            latencies, errors = asyncio.run(load(args.port, path, body, content_type, args.connections, args.duration))
+            p50, p95 = np.quantile(latencies, (0.5, 0.95)) * 1000 if latencies else (float("nan"),) * 2
+            print(f"{path:>14} {len(latencies) / args.duration:>10.0f} {errors:>5} {p50:>9.1f} {p95:>9.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+So sánh dựng biểu đồ: go.Scatter / px.bar cũ với charts.py (giảm mẫu LTTB + Scattergl),
+về số điểm, kích thước payload JSON gửi xuống trình duyệt và thời gian dựng + tuần tự hóa.
+Thời gian vẽ phía trình duyệt không đo được từ máy chủ; payload nhỏ hơn và trace WebGL
+là hai yếu tố chính quyết định thời gian đó.
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.bench_charts [--loans 2000 20000] [--max-points 1000]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from charts import DEFAULT_MAX_POINTS, balance_figure, cash_flow_figure
+from core import calculate_repayment_schedule
+from portfolio import Portfolio, project_cash_flows
+
+def legacy_balance_figure(so_tien_vay, repayment_df):
+    """Bản sao nguyên trạng biểu đồ dư nợ cũ (tab 3)."""
+    initial_row = pd.DataFrame([{'Kỳ trả nợ': 0, 'Dư nợ cuối kỳ': so_tien_vay}])
+    df_chart = pd.concat([initial_row, repayment_df[['Kỳ trả nợ', 'Dư nợ cuối kỳ']]], ignore_index=True)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=df_chart['Kỳ trả nợ'], y=df_chart['Dư nợ cuối kỳ'], mode='lines+markers', name='Dư nợ', fill='tozeroy'))
+    fig.update_layout(title_text='Dư nợ giảm dần qua các kỳ', xaxis_title='Kỳ trả nợ (Tháng)', yaxis_title='Dư nợ còn lại (VNĐ)')
+    return fig
+
+def legacy_cash_flow_figure(cash_flows, group_col):
+    """Bản sao nguyên trạng biểu đồ dòng tiền danh mục cũ (tab 6)."""
+    chart_df = cash_flows.assign(thang=cash_flows["thang"].astype(str))
+    return px.bar(chart_df, x="thang", y="tong", color=group_col,
+                  labels={"thang": "Tháng", "tong": "Gốc + lãi thu về (VNĐ)"}, title="Dòng thu gốc và lãi theo tháng")
+
+def random_portfolio(n_loans, seed=0):
+    rng = np.random.default_rng(seed)
+    return Portfolio.from_frame(pd.DataFrame({
+        "so_tien_vay": rng.uniform(1e8, 5e9, n_loans).round(-6),
+        "lai_suat": rng.uniform(6, 12, n_loans).round(1),
+        "thoi_gian_vay": rng.integers(12, 481, n_loans),
+        "ngay_giai_ngan": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 3650, n_loans), unit="D"),
+        "san_pham": rng.choice(["Tiêu dùng", "Kinh doanh", "Nhà ở"], n_loans),
+    }))
+
+def measure(build, repeat=5):
+    """(số điểm, KB payload, ms dựng + to_json) - lấy thời gian nhỏ nhất qua repeat lần."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = build()
+        payload = fig.to_json()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    points = sum(len(trace.x) for trace in fig.data)
+    return points, len(payload) / 1024, best
+
+def report(name, old, new):
+    print(f"{name:>30} {old[0]:>8} {new[0]:>8} {old[1]:>9.1f} {new[1]:>9.1f} {old[2]:>8.1f} {new[2]:>8.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--loans", type=int, nargs="+", default=[2000, 20000])
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS)
+    args = parser.parse_args(argv)
+
+    # Lượt khởi động: lần dựng đầu tiên của Plotly nạp validator, không phản ánh thời gian thực
+    legacy_balance_figure(1, calculate_repayment_schedule(1_000_000, 8.0, 12)).to_json()
+    print(f"{'trường hợp':>30} {'điểm cũ':>8} {'điểm mới':>8} {'KB cũ':>9} {'KB mới':>9} {'ms cũ':>8} {'ms mới':>8}")
+    for term in (120, 360, 480):
+        df = calculate_repayment_schedule(3_000_000_000, 8.5, term)
+        periods = np.r_[0, df['Kỳ trả nợ'].to_numpy()]
+        balances = np.r_[3_000_000_000, df['Dư nợ cuối kỳ'].to_numpy()]
+        report(f"dư nợ {term} kỳ",
+               measure(lambda: legacy_balance_figure(3_000_000_000, df)),
+               measure(lambda: balance_figure(periods, balances, args.max_points)[0]))
+
+    for n_loans in args.loans:
+        portfolio = random_portfolio(n_loans)
+        for group_by in ((), ("san_pham",)):
+            cash_flows = project_cash_flows(portfolio, group_by)
+            group_col = group_by[0] if group_by else None
+            report(f"danh mục {n_loans}{' theo sản phẩm' if group_col else ''}",
+                   measure(lambda: legacy_cash_flow_figure(cash_flows, group_col)),
+                   measure(lambda: cash_flow_figure(cash_flows, group_col, max_points=args.max_points)[0]))
+
+if __name__ == "__main__":
+    main()
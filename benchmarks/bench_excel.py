@@ -0,0 +1,79 @@
+"""
+So sánh xuất Excel: pd.ExcelWriter một sheet (generate_excel_download cũ) với
+excel_export.write_workbook ở chế độ write_only, về thời gian và bộ nhớ đỉnh (tracemalloc).
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.bench_excel [--loans 50 200 500]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+import numpy as np
+import pandas as pd
+from core import calculate_ratios, calculate_repayment_schedule
+from excel_export import appraisal_sheets, portfolio_schedule_sheets, write_workbook
+from portfolio import Portfolio
+
+def legacy_excel(df):
+    """Bản sao nguyên trạng generate_excel_download cũ."""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='LichTraNo')
+    return output.getvalue()
+
+def legacy_portfolio_excel(portfolio, path):
+    """Cách cũ cho nhiều khoản vay: ghép mọi kế hoạch trả nợ thành một DataFrame rồi to_excel."""
+    frames = []
+    for i in range(len(portfolio)):
+        df = calculate_repayment_schedule(portfolio.principal[i], float(portfolio.rate[i]), int(portfolio.term[i]))
+        frames.append(df.assign(**{"Khoản vay": i + 1}))
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        pd.concat(frames, ignore_index=True).to_excel(writer, index=False, sheet_name='LichTraNo')
+
+def random_portfolio(n_loans, seed=0):
+    rng = np.random.default_rng(seed)
+    return Portfolio.from_frame(pd.DataFrame({
+        "so_tien_vay": rng.uniform(1e8, 5e9, n_loans).round(-6),
+        "lai_suat": rng.uniform(6, 12, n_loans).round(1),
+        "thoi_gian_vay": rng.integers(12, 361, n_loans),
+    }))
+
+def measure(func):
+    """(giây, MB bộ nhớ đỉnh); thời gian đo riêng vì tracemalloc làm chậm đáng kể."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--loans", type=int, nargs="+", default=[50, 200, 500])
+    args = parser.parse_args(argv)
+
+    print(f"{'trường hợp':>24} {'dòng':>8} {'cũ (s)':>8} {'mới (s)':>8} {'cũ (MB)':>8} {'mới (MB)':>9}")
+    for term in (360, 480):
+        df = calculate_repayment_schedule(3_000_000_000, 8.5, term)
+        inputs = [("Số tiền vay", 3_000_000_000, "VNĐ"), ("Lãi suất", 8.5, "%/năm"), ("Thời gian vay", term, "tháng")]
+        ratios = calculate_ratios(3_000_000_000, 4_000_000_000, 1_000_000_000, 5_000_000_000)
+        old_t, old_m = measure(lambda: legacy_excel(df))
+        new_t, new_m = measure(lambda: write_workbook(BytesIO(), appraisal_sheets(inputs, ratios, df)))
+        print(f"{f'lịch {term} kỳ':>24} {term:>8} {old_t:>8.2f} {new_t:>8.2f} {old_m:>8.1f} {new_m:>9.1f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.xlsx")
+        for n_loans in args.loans:
+            portfolio = random_portfolio(n_loans)
+            old_t, old_m = measure(lambda: legacy_portfolio_excel(portfolio, path))
+            new_t, new_m = measure(lambda: write_workbook(path, portfolio_schedule_sheets(portfolio)))
+            rows = int(portfolio.term.astype(np.int64).sum())
+            print(f"{f'danh mục {n_loans} khoản vay':>24} {rows:>8} {old_t:>8.2f} {new_t:>8.2f} {old_m:>8.1f} {new_m:>9.1f}")
+
+if __name__ == "__main__":
+    main()
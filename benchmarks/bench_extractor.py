@@ -0,0 +1,113 @@
+"""
+So sánh tốc độ trích xuất trường thông tin: chuỗi re.search cũ (safe_search)
+với bộ trích xuất một lượt quét trong extractor.py, trên văn bản phương án lớn.
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.bench_extractor [--pages 100 200 500] [--repeat 5]
+"""
+import argparse
+import re
+import timeit
+from extractor import get_extractor
+
+# Khoảng 3.000 ký tự cho một trang A4 văn bản thuần
+CHARS_PER_PAGE = 3000
+
+FILLER = (
+    "Hộ kinh doanh hoạt động ổn định trong nhiều năm, có nguồn khách hàng thường xuyên "
+    "tại địa bàn xã và các vùng lân cận, doanh số bán hàng tăng đều qua các quý.\n"
+)
+
+HEADER = (
+    "PHƯƠNG ÁN SỬ DỤNG VỐN\n"
+    "I. Thông tin khách hàng\n"
+    "Họ và tên: Nguyễn Văn An. Sinh năm 1980\n"
+    "CCCD số: 042080001234 cấp ngày 01/01/2021\n"
+    "Nơi cư trú: Thôn 1, xã Thạch Hà, tỉnh Hà Tĩnh\n"
+    "Số điện thoại: 0912345678\n"
+    "II. Phương án vay vốn\n"
+    "Mục đích vay: Bổ sung vốn lưu động kinh doanh vật liệu xây dựng\n"
+)
+
+FOOTER = (
+    "Tài sản bảo đảm: Quyền sử dụng đất thửa số 123, tờ bản đồ số 4\n"
+    "III. Thông tin tài chính\n"
+    "- Chi phí kinh doanh: 1.500.000.000 đồng\n"
+    "+Doanh thu của phương án: 1.800.000.000 đồng\n"
+    "+  Chi phí kinh doanh: 1.500.000.000 đồng\n"
+    "+  Chênh lệch thu chi: 300.000.000 đồng\n"
+    "Vốn đối ứng của khách hàng là 500.000.000 đồng,500.000.000\n"
+    "Lãi suất đề nghị: 6,5%/năm\n"
+    "Thời hạn cho vay: 12 tháng\n"
+    "Tổng tài sản đảm bảo: 2.000.000.000\n"
+    "- Từ nguồn thu của phương án kinh doanh: 300.000.000đồng\n"
+)
+
+def legacy_parse_info_from_text(text):
+    """Bản sao nguyên trạng cách trích xuất cũ (16 lần re.search) để làm mốc so sánh."""
+    info = {}
+    def safe_search(pattern, text, group=1, default=None, is_numeric=False):
+        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        if match:
+            result = match.group(group).strip()
+            if is_numeric:
+                try:
+                    cleaned_result = re.sub(r'[^\d,.]', '', result)
+                    cleaned_result = cleaned_result.replace('.', '').replace(',', '.')
+                    return float(cleaned_result)
+                except (ValueError, IndexError):
+                    return default
+            return result
+        return default
+    info['ho_ten'] = safe_search(r"Họ và tên:\s*(.*?)\s*\.", text) or "Chưa rõ"
+    info['cccd'] = safe_search(r"CCCD số:\s*(\d+)", text) or ""
+    info['dia_chi'] = safe_search(r"Nơi cư trú:\s*(.*?)(?:,|$|\n)", text) or "Chưa rõ"
+    info['sdt'] = safe_search(r"Số điện thoại:\s*(\d+)", text) or ""
+    info['muc_dich_vay'] = safe_search(r"Mục đích vay:\s*(.*?)\n", text) or "Kinh doanh vật liệu xây dựng"
+    info['tong_nhu_cau_von'] = safe_search(r"- Chi phí kinh doanh:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
+    info['von_doi_ung'] = safe_search(r"Vốn đối ứng.*?đồng,([\d.,]+)", text, is_numeric=True, default=0)
+    info['so_tien_vay'] = safe_search(r"Chênh lệch thu chi:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
+    info['lai_suat'] = safe_search(r"Lãi suất đề nghị:\s*([\d.,]+)%/năm", text, is_numeric=True, default=5.0)
+    info['thoi_gian_vay'] = safe_search(r"Thời hạn cho vay:\s*(\d+)\s*tháng", text, is_numeric=True, default=3)
+    info['tsdb_mo_ta'] = safe_search(r"Tài sản bảo đảm:\s*(.*?)(?=III\. Thông tin)", text) or "Chưa có mô tả"
+    info['tsdb_gia_tri'] = safe_search(r"Tổng tài sản đảm bảo:\s*([\d.,]+)", text, is_numeric=True, default=0)
+    info['doanh_thu'] = safe_search(r"\+Doanh thu của phương án:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
+    info['chi_phi'] = safe_search(r"\+  Chi phí kinh doanh:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
+    info['chenh_lech_thu_chi'] = safe_search(r"\+  Chênh lệch thu chi:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
+    info['nguon_tra_no'] = safe_search(r"- Từ nguồn thu của phương án kinh doanh:\s*([\d.,]+)đồng", text, is_numeric=True, default=0)
+    return info
+
+# Các tình huống đo: số liệu tài chính ở cuối văn bản, ở đầu văn bản, và thiếu một số trường
+SCENARIOS = ("cuoi", "dau", "thieu")
+
+def build_plan_text(pages, scenario="cuoi"):
+    """Tạo văn bản phương án khoảng `pages` trang theo một trong các tình huống SCENARIOS."""
+    body = FILLER * max(1, pages * CHARS_PER_PAGE // len(FILLER))
+    if scenario == "dau":
+        return HEADER + FOOTER + body
+    if scenario == "thieu":
+        # Bỏ các dòng lãi suất, thời hạn và vốn đối ứng: cách cũ phải quét hết văn bản cho mỗi trường thiếu
+        footer = "".join(line for line in FOOTER.splitlines(keepends=True)
+                         if not line.startswith(("Lãi suất", "Thời hạn", "Vốn đối ứng")))
+        return HEADER + body + footer
+    return HEADER + body + FOOTER
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 200, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    extractor = get_extractor()
+    print(f"{'trang':>6} {'tình huống':>10} {'cũ (ms)':>10} {'mới (ms)':>10} {'tăng tốc':>9}")
+    for pages in args.pages:
+        for scenario in SCENARIOS:
+            text = build_plan_text(pages, scenario)
+            # Hai cách phải cho cùng kết quả
+            assert extractor.extract(text) == legacy_parse_info_from_text(text)
+            old = min(timeit.repeat(lambda: legacy_parse_info_from_text(text), number=1, repeat=args.repeat))
+            new = min(timeit.repeat(lambda: extractor.extract(text), number=1, repeat=args.repeat))
+            print(f"{pages:>6} {scenario:>10} {old * 1000:>10.2f} {new * 1000:>10.2f} {old / new:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+So sánh tốc độ định dạng tiền tệ cho bảng hiển thị: apply(format_currency) từng ô (cách cũ)
+với format_currency_array vector hóa, trên lịch trả nợ 360/480 kỳ và bảng cỡ danh mục.
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.bench_format [--rows 10000 100000] [--repeat 5]
+"""
+import argparse
+import timeit
+import numpy as np
+import pandas as pd
+from core import calculate_repayment_schedule, format_currency, format_currency_array
+
+CURRENCY_COLUMNS = ["Dư nợ đầu kỳ", "Gốc trả trong kỳ", "Lãi trả trong kỳ", "Tổng gốc và lãi", "Dư nợ cuối kỳ"]
+
+def legacy_display(df, columns):
+    """Cách định dạng cũ của tab 2: sao chép bảng và gọi format_currency cho từng ô."""
+    df_display = df.copy()
+    for col in columns:
+        df_display[col] = df_display[col].apply(format_currency)
+    return df_display
+
+def vectorized_display(df, columns):
+    df_display = df.copy()
+    for col in columns:
+        df_display[col] = format_currency_array(df_display[col])
+    return df_display
+
+def portfolio_table(rows, seed=0):
+    """Bảng dòng tiền cỡ danh mục: ba cột tiền tệ với giá trị từ vài trăm nghìn đến hàng chục tỷ."""
+    rng = np.random.default_rng(seed)
+    goc = np.round(rng.lognormal(18, 2, rows))
+    lai = np.round(goc * rng.uniform(0.003, 0.01, rows))
+    return pd.DataFrame({"Gốc": goc, "Lãi": lai, "Tổng": goc + lai})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    cases = [
+        (f"lịch {term} kỳ", calculate_repayment_schedule(3_000_000_000, 8.5, term), CURRENCY_COLUMNS)
+        for term in (360, 480)
+    ]
+    cases += [(f"danh mục {rows:,} dòng", portfolio_table(rows), ["Gốc", "Lãi", "Tổng"]) for rows in args.rows]
+
+    print(f"{'bảng':>22} {'cũ (ms)':>10} {'mới (ms)':>10} {'tăng tốc':>9}")
+    for name, df, columns in cases:
+        # Hai cách phải cho cùng kết quả
+        assert legacy_display(df, columns).astype(str).equals(vectorized_display(df, columns).astype(str))
+        old = min(timeit.repeat(lambda: legacy_display(df, columns), number=1, repeat=args.repeat))
+        new = min(timeit.repeat(lambda: vectorized_display(df, columns), number=1, repeat=args.repeat))
+        print(f"{name:>22} {old * 1000:>10.2f} {new * 1000:>10.2f} {old / new:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Đo tải lớp gọi Gemini trên máy chủ giả lập (benchmarks.gemini_stub): gọi thẳng
+GenerativeModel (cách cũ) so với gemini_client.GeminiClient, khi nhiều người dùng gửi
+yêu cầu cùng lúc vượt hạn mức và có các yêu cầu trùng nhau.
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.bench_gemini [--users 30] [--duplicate 0.3] [--quota 10] [--window 2]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from benchmarks.gemini_stub import start_stub
+from gemini_client import GeminiClient, Limiter, create_model
+
+def run_load(model, prompts):
+    """Gửi đồng thời mọi prompt; trả về (số lỗi người dùng thấy, độ trễ từng yêu cầu thành công)."""
+    def call(prompt):
+        start = time.perf_counter()
+        try:
+            model.generate_content(prompt).text
+            return time.perf_counter() - start
+        except Exception:
+            return None
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        results = list(executor.map(call, prompts))
+    latencies = [r for r in results if r is not None]
+    return len(results) - len(latencies), latencies
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=30, help="Số yêu cầu gửi đồng thời")
+    parser.add_argument("--duplicate", type=float, default=0.3, help="Tỷ lệ yêu cầu trùng với yêu cầu khác")
+    parser.add_argument("--quota", type=int, default=10, help="Hạn mức của máy chủ giả lập: số yêu cầu mỗi cửa sổ")
+    parser.add_argument("--window", type=float, default=2.0, help="Độ dài cửa sổ hạn mức (giây)")
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    n_unique = max(1, round(args.users * (1 - args.duplicate)))
+    prompts = [f"Phân tích phương án số {int(i)}" for i in rng.integers(n_unique, size=args.users)]
+    rpm = args.quota / args.window * 60
+
+    print(f"{'cách gọi':>14} {'lỗi':>5} {'gửi lên':>8} {'bị 429':>7} {'p50 (s)':>8} {'p95 (s)':>8} {'tổng (s)':>9}")
+    for name in ("gọi thẳng", "GeminiClient"):
+        server, endpoint = start_stub(latency=args.latency, quota=args.quota, window=args.window)
+        model = create_model("stub", "gemini-2.0-flash-exp", endpoint)
+        if name == "GeminiClient":
+            # Hạn mức máy chủ tính trên cửa sổ trượt: burst + tốc độ x cửa sổ không được vượt quota,
+            # nên phía client đặt thấp hơn một chút và không cho dồn yêu cầu
+            model = GeminiClient(model, Limiter(4, rpm * 0.9, 1), base_delay=0.5, seed=0)
+        start = time.perf_counter()
+        errors, latencies = run_load(model, prompts)
+        total = time.perf_counter() - start
+        p50, p95 = np.quantile(latencies, (0.5, 0.95)) if latencies else (float("nan"),) * 2
+        print(f"{name:>14} {errors:>5} {server.state.requests:>8} {server.state.rejected:>7} "
+              f"{p50:>8.2f} {p95:>8.2f} {total:>9.2f}")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
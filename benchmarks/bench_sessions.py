@@ -0,0 +1,69 @@
+"""
+Đo bộ nhớ giữ các mục lớn của nhiều phiên: lưu riêng trong từng phiên (như st.session_state
+trước đây) so với session_store.SessionStore (dùng chung theo mã băm, ngân sách mỗi phiên,
+chuyển xuống đĩa). Mỗi phiên mở một trong --docs phương án giả lập, có hai kết quả phân
+tích AI và lịch sử trò chuyện.
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.bench_sessions [--sessions 60] [--docs 10] [--pages 100] [--budget-mb 4] [--memory-mb 8]
+"""
+import argparse
+import tempfile
+import time
+from io import BytesIO
+import numpy as np
+from benchmarks.synthetic import build_plan_docx
+from core import extract_text_from_docx
+from session_store import SessionStore, estimate_size
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=60)
+    parser.add_argument("--docs", type=int, default=10, help="Số phương án khác nhau được mở")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--budget-mb", type=float, default=4, help="Ngân sách bộ nhớ mỗi phiên (MB)")
+    parser.add_argument("--memory-mb", type=float, default=8, help="Tổng bộ nhớ của kho (MB)")
+    args = parser.parse_args(argv)
+
+    texts = [extract_text_from_docx(BytesIO(build_plan_docx(args.pages, seed)[0])) for seed in range(args.docs)]
+    rng = np.random.default_rng(0)
+    opened = rng.integers(args.docs, size=args.sessions)
+    def session_items(i):
+        # Mỗi phiên nhận bản văn bản riêng (như khi đọc lại từ file tải lên), phân tích AI và lịch sử trò chuyện riêng
+        return {
+            "docx_text": "".join(texts[opened[i]]),
+            "ai_analysis_1": f"Phân tích {i}: " + "Phương án có nguồn trả nợ ổn định. " * 300,
+            "ai_analysis_2": f"Đánh giá {i}: " + "Cần làm rõ thêm rủi ro thị trường. " * 300,
+            "chat_history": [{"role": "user" if j % 2 == 0 else "assistant", "content": f"Tin nhắn {i}-{j} " * 40}
+                             for j in range(20)],
+        }
+
+    naive = sum(estimate_size(value) for i in range(args.sessions) for value in session_items(i).values())
+    with tempfile.TemporaryDirectory() as spill_dir:
+        store = SessionStore(args.budget_mb, args.memory_mb, spill_dir=spill_dir)
+        start = time.perf_counter()
+        for i in range(args.sessions):
+            for name, value in session_items(i).items():
+                if name == "chat_history":
+                    # Như ứng dụng: lịch sử trò chuyện được thêm từng tin nhắn
+                    for message in value:
+                        store.append(f"s{i}", name, message)
+                else:
+                    store.put(f"s{i}", name, value)
+        put_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in rng.integers(args.sessions, size=200):
+            store.get(f"s{i}", "docx_text")
+        get_ms = (time.perf_counter() - start) / 200 * 1000
+        stats = store.stats()
+        worst = max(row.memory_bytes for row in store.usage())
+
+    mb = 1024 * 1024
+    print(f"Lưu riêng từng phiên: {naive / mb:,.1f} MB trong bộ nhớ")
+    print(f"SessionStore: {stats['memory_bytes'] / mb:,.1f} MB trong bộ nhớ, {stats['disk_bytes'] / mb:,.1f} MB trên đĩa, "
+          f"{stats['items']} mục ({stats['shared_items']} dùng chung), phiên lớn nhất {worst / mb:,.1f} MB")
+    print(f"Ghi {args.sessions * 4} mục (lịch sử trò chuyện từng tin nhắn): {put_s:.2f} s · đọc văn bản: {get_ms:.2f} ms/lần "
+          f"({stats['spills']} lần chuyển xuống đĩa, {stats['loads']} lần nạp lại)")
+
+if __name__ == "__main__":
+    main()
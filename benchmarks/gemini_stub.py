@@ -0,0 +1,155 @@
+"""
+Máy chủ giả lập Gemini API (REST v1beta) chạy cục bộ, dùng để kiểm tra và đo tải gemini_client
+mà không gọi API thật.
+
+Hỗ trợ generateContent, streamGenerateContent và countTokens; có độ trễ cấu hình được và
+giới hạn số yêu cầu mỗi phút như hạn mức thật (vượt hạn mức trả về 429 RESOURCE_EXHAUSTED).
+Trỏ ứng dụng vào máy chủ này bằng biến môi trường GEMINI_API_ENDPOINT=http://127.0.0.1:<cổng>.
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.gemini_stub [--port 8765] [--latency 0.5] [--rpm 60] [--error-rate 0]
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubState:
+    """Cấu hình và bộ đếm của máy chủ giả lập (đọc từ bài đo sau khi chạy)."""
+
+    def __init__(self, latency=0.5, quota=None, window=60.0, error_rate=0.0, chunks=3, seed=0):
+        self.latency = latency
+        # Hạn mức: tối đa quota yêu cầu trong mỗi khoảng window giây (None: không giới hạn)
+        self.quota = quota
+        self.window = window
+        self.error_rate = error_rate
+        self.chunks = chunks
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+        self.active = 0
+        self.max_active = 0
+        self.prompts = []
+        # API key của từng yêu cầu, theo thứ tự nhận
+        self.api_keys = []
+
+    def admit(self):
+        """Trả về mã lỗi HTTP nếu yêu cầu bị từ chối (429 vượt hạn mức, 503 lỗi ngẫu nhiên), ngược lại None."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            while self._recent and now - self._recent[0] > self.window:
+                self._recent.popleft()
+            if self.quota is not None and len(self._recent) >= self.quota:
+                self.rejected += 1
+                return 429
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.failed += 1
+                return 503
+            self._recent.append(now)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            return None
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+def _prompt_text(body):
+    return "\n".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+
+def _response(text, prompt_tokens, final=True):
+    chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}],
+             "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": len(text) // 4,
+                               "totalTokenCount": prompt_tokens + len(text) // 4}}
+    if final:
+        chunk["candidates"][0]["finishReason"] = "STOP"
+    return chunk
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        state = self.server.state
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        method = self.path.split("?", 1)[0].rsplit(":", 1)[-1]
+        prompt = _prompt_text(body.get("generateContentRequest", body))
+        prompt_tokens = max(1, len(prompt) // 4)
+        with state._lock:
+            state.api_keys.append(self.headers.get("x-goog-api-key"))
+        if method == "countTokens":
+            return self._send_json(200, {"totalTokens": prompt_tokens})
+        status = state.admit()
+        if status is not None:
+            message, code = (("Resource has been exhausted (e.g. check quota).", "RESOURCE_EXHAUSTED") if status == 429
+                             else ("The service is currently unavailable.", "UNAVAILABLE"))
+            return self._send_json(status, {"error": {"code": status, "message": message, "status": code}})
+        try:
+            with state._lock:
+                state.prompts.append(prompt)
+            answer = f"Phản hồi giả lập cho yêu cầu {hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]}."
+            if method == "generateContent":
+                time.sleep(state.latency)
+                return self._send_json(200, _response(answer, prompt_tokens))
+            # streamGenerateContent (REST): một mảng JSON gửi dần từng phần tử
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [answer[len(answer) * i // state.chunks:len(answer) * (i + 1) // state.chunks] for i in range(state.chunks)]
+            for i, piece in enumerate(pieces):
+                time.sleep(state.latency / state.chunks)
+                data = ("[" if i == 0 else ",\n") + json.dumps(_response(piece, prompt_tokens, i == len(pieces) - 1), ensure_ascii=False)
+                if i == len(pieces) - 1:
+                    data += "]"
+                self._write_chunk(data.encode("utf-8"))
+            self._write_chunk(b"")
+        finally:
+            state.release()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+def start_stub(port=0, **kwargs):
+    """Chạy máy chủ giả lập trong luồng nền; trả về (server, endpoint). Dừng bằng server.shutdown()."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.daemon_threads = True
+    server.state = StubState(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Độ trễ mỗi phản hồi (giây)")
+    parser.add_argument("--rpm", type=int, default=None, help="Hạn mức số yêu cầu mỗi phút (mặc định: không giới hạn)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỷ lệ yêu cầu trả về lỗi 503 ngẫu nhiên")
+    args = parser.parse_args(argv)
+    server, endpoint = start_stub(args.port, latency=args.latency, quota=args.rpm, error_rate=args.error_rate)
+    print(f"Máy chủ giả lập Gemini đang chạy tại {endpoint} (Ctrl+C để dừng)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
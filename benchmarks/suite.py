@@ -0,0 +1,158 @@
+"""
+Bộ đo hiệu năng toàn quy trình trên phương án giả lập (benchmarks.synthetic), có lưu mốc so sánh.
+
+Công đoạn đo theo cỡ phương án (số trang): đọc .docx, trích xuất trường (từ văn bản và
+dạng luồng), sinh báo cáo .docx. Theo thời hạn khoản vay (số kỳ): lập lịch trả nợ, định
+dạng bảng hiển thị, xuất Excel. Mỗi công đoạn chạy --repeat lần và báo p50/p95.
+Lần đầu chạy với --save-baseline để lưu mốc; các lần sau so p50 với mốc và đánh dấu
+công đoạn chậm hơn quá ngưỡng (trả về mã lỗi 1 khi có công đoạn chậm đi).
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.suite [--pages 1 10 100 500] [--terms 12 120 360 480] [--repeat 7]
+                               [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import core
+from benchmarks.synthetic import build_plan_docx
+from excel_export import appraisal_sheets, write_workbook
+from metrics import Metrics
+from report import ReportTemplate, build_context, build_default_template
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+CURRENCY_COLUMNS = ["Dư nợ đầu kỳ", "Gốc trả trong kỳ", "Lãi trả trong kỳ", "Tổng gốc và lãi", "Dư nợ cuối kỳ"]
+# Phân tích AI giả lập cho báo cáo (khoảng 2 trang), để công đoạn sinh báo cáo có nội dung thực tế
+AI_TEXT = "\n".join(["Phương án có nguồn trả nợ ổn định, tỷ lệ vốn đối ứng đạt yêu cầu."] * 60)
+
+def document_stages(pages, seed):
+    """Các công đoạn phụ thuộc cỡ phương án: {tên: hàm không tham số}."""
+    data, expected = build_plan_docx(pages, seed)
+    text = core.extract_text_from_docx(BytesIO(data))
+    # Bộ đo chỉ có ý nghĩa khi kết quả đúng
+    assert core.parse_info_from_text(text) == expected, "Trích xuất sai trên phương án giả lập"
+    template = ReportTemplate(build_default_template())
+    ratios = core.format_ratios_for_report(core.calculate_ratios(
+        expected["so_tien_vay"], expected["tong_nhu_cau_von"], expected["von_doi_ung"], expected["tsdb_gia_tri"]))
+    return {
+        "doc_docx": lambda: core.extract_text_from_docx(BytesIO(data)),
+        "trich_xuat_van_ban": lambda: core.parse_info_from_text(text),
+        "trich_xuat_luong": lambda: core.extract_and_parse_docx(BytesIO(data)),
+        "bao_cao_docx": lambda: template.render(build_context(expected, ratios, AI_TEXT, AI_TEXT)),
+    }
+
+def loan_stages(term):
+    """Các công đoạn phụ thuộc thời hạn khoản vay: {tên: hàm không tham số}."""
+    args = (3_000_000_000, 8.5, term)
+    df = core.calculate_repayment_schedule(*args)
+    ratios = core.calculate_ratios(3_000_000_000, 4_000_000_000, 1_000_000_000, 5_000_000_000)
+    inputs = [("Số tiền vay", 3_000_000_000, "VNĐ"), ("Lãi suất", 8.5, "%/năm"), ("Thời gian vay", term, "tháng")]
+
+    def format_table():
+        df_display = df.copy()
+        for col in CURRENCY_COLUMNS:
+            df_display[col] = core.format_currency_array(df_display[col])
+        return df_display
+
+    return {
+        "lich_tra_no": lambda: core.calculate_repayment_schedule(*args),
+        "dinh_dang_bang": format_table,
+        "xuat_excel": lambda: write_workbook(BytesIO(), appraisal_sheets(inputs, ratios, df)),
+    }
+
+def run_cases(pages_list, terms, repeat, seed=0):
+    """Chạy mọi công đoạn; trả về danh sách dòng kết quả (một lần chạy khởi động không tính)."""
+    cases = [(f"{pages} trang", document_stages(pages, seed)) for pages in pages_list]
+    cases += [(f"{term} kỳ", loan_stages(term)) for term in terms]
+    rows = []
+    for case, stages in cases:
+        for stage, func in stages.items():
+            func()
+            bench = Metrics(window=repeat)
+            timer = bench.timer(stage)
+            for _ in range(repeat):
+                with timer:
+                    func()
+            result = bench.summary()[0]
+            rows.append({"key": f"{case}/{stage}", "case": case, "stage": stage,
+                         "p50_ms": result["p50_ms"], "p95_ms": result["p95_ms"]})
+    return rows
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+def compare(rows, baseline, tolerance, min_delta_ms):
+    """Gắn p50 của mốc và cờ chậm đi vào từng dòng; trả về danh sách các dòng bị chậm đi."""
+    regressions = []
+    for row in rows:
+        base = baseline.get("results", {}).get(row["key"])
+        row["baseline_ms"] = base
+        row["flag"] = ""
+        if base is None:
+            row["flag"] = "mới"
+            continue
+        # Bỏ qua chênh lệch tuyệt đối quá nhỏ (nhiễu đo) dù tỷ lệ lớn
+        if row["p50_ms"] > base * (1 + tolerance) and row["p50_ms"] - base > min_delta_ms:
+            row["flag"] = "CHẬM ĐI"
+            regressions.append(row)
+        elif row["p50_ms"] < base * (1 - tolerance) and base - row["p50_ms"] > min_delta_ms:
+            row["flag"] = "nhanh hơn"
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--terms", type=int, nargs="+", default=[12, 120, 360, 480])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="File mốc so sánh (.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Ghi kết quả lần chạy này làm mốc mới")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Tỷ lệ chậm đi cho phép so với mốc (mặc định 0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="Chênh lệch tuyệt đối tối thiểu (ms) để bị coi là chậm đi")
+    args = parser.parse_args(argv)
+
+    rows = run_cases(args.pages, args.terms, args.repeat, args.seed)
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("environment", {}).get("platform") != platform.platform():
+            print(f"Lưu ý: mốc được đo trên môi trường khác ({baseline.get('environment', {}).get('platform')}).",
+                  file=sys.stderr)
+    regressions = compare(rows, baseline, args.tolerance, args.min_delta_ms)
+
+    print(f"{'trường hợp':>12} {'công đoạn':>20} {'p50 (ms)':>10} {'p95 (ms)':>10} {'mốc (ms)':>10} {'thay đổi':>9}")
+    for row in rows:
+        base = row["baseline_ms"]
+        base_text = f"{base:>10.2f}" if base is not None else f"{'-':>10}"
+        change = f"{(row['p50_ms'] / base - 1) * 100:>+8.0f}%" if base else f"{'':>9}"
+        print(f"{row['case']:>12} {row['stage']:>20} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f} "
+              f"{base_text} {change} {row['flag']}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "repeat": args.repeat, "seed": args.seed,
+                       "results": {row["key"]: round(row["p50_ms"], 4) for row in rows}},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Đã lưu mốc vào {args.baseline}", file=sys.stderr)
+    elif regressions:
+        print(f"{len(regressions)} công đoạn chậm hơn mốc quá {args.tolerance:.0%}.", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
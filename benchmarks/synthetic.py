@@ -0,0 +1,178 @@
+"""
+Sinh phương án kinh doanh (.docx) giả lập bằng tiếng Việt để đo hiệu năng và kiểm tra trích xuất.
+
+Mỗi phương án có đủ các nhãn mà parse_info_from_text nhận dạng ("Lãi suất đề nghị:",
+"Chênh lệch thu chi:"...), giá trị ngẫu nhiên theo seed (chạy lại cho cùng kết quả),
+phần thuyết minh và các bảng kê dài tùy số trang. Kèm theo là dict giá trị đúng của
+các trường để đối chiếu kết quả trích xuất.
+
+Cách chạy (từ thư mục gốc dự án):
+    python -m benchmarks.synthetic -o phuong_an/ [--pages 1 10 100 500] [--count 3] [--seed 0]
+"""
+import argparse
+import os
+from io import BytesIO
+import numpy as np
+from docx import Document
+
+# Khoảng 3.000 ký tự cho một trang A4 văn bản thuần (như benchmarks.bench_extractor)
+CHARS_PER_PAGE = 3000
+# Cứ khoảng chừng này trang thuyết minh thì chèn một bảng kê
+PAGES_PER_TABLE = 5
+
+HO = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Phan", "Võ", "Đặng", "Bùi", "Đỗ"]
+TEN_DEM = ["Văn", "Thị", "Đức", "Minh", "Thanh", "Hữu", "Ngọc", "Quang"]
+TEN = ["An", "Bình", "Cường", "Dung", "Hà", "Hải", "Hoa", "Hùng", "Lan", "Long", "Mai", "Nam", "Sơn", "Tâm", "Thủy"]
+XA = ["Thạch Hà", "Cẩm Xuyên", "Kỳ Anh", "Hương Sơn", "Đức Thọ", "Nghi Xuân", "Can Lộc", "Vũ Quang"]
+MUC_DICH = [
+    "Bổ sung vốn lưu động kinh doanh vật liệu xây dựng",
+    "Mua thức ăn chăn nuôi lợn thịt",
+    "Đầu tư máy móc chế biến gỗ",
+    "Mua hàng tạp hóa phục vụ kinh doanh",
+    "Trồng và chăm sóc cây ăn quả",
+    "Mở rộng cơ sở sản xuất nước mắm",
+]
+TAI_SAN = [
+    "Quyền sử dụng đất thửa số {thua}, tờ bản đồ số {to}, diện tích {dien_tich} m2",
+    "Quyền sử dụng đất và tài sản gắn liền với đất tại thửa số {thua}, tờ bản đồ số {to}",
+    "Xe ô tô tải biển kiểm soát 38C-{thua:05d}",
+]
+MAT_HANG = ["Xi măng", "Thép cuộn", "Gạch ốp lát", "Cát xây dựng", "Sơn nước", "Ống nhựa", "Tôn lợp", "Đá xây dựng"]
+# Các câu thuyết minh: không chứa nhãn của bất kỳ trường nào để không làm sai kết quả trích xuất
+CAU_THUYET_MINH = [
+    "Hộ kinh doanh hoạt động ổn định trong nhiều năm, có nguồn khách hàng thường xuyên tại địa bàn xã và các vùng lân cận.",
+    "Doanh số bán hàng tăng đều qua các quý nhờ nhu cầu xây dựng nhà ở và công trình dân dụng trên địa bàn.",
+    "Cửa hàng nằm trên trục đường chính, thuận tiện cho việc vận chuyển và giao nhận hàng hóa.",
+    "Khách hàng có kinh nghiệm quản lý, ghi chép sổ sách thu chi đầy đủ hằng tháng.",
+    "Nguồn hàng được nhập trực tiếp từ các nhà phân phối lớn nên giá vốn ổn định và cạnh tranh.",
+    "Thị trường tiêu thụ được đánh giá còn nhiều tiềm năng do quy hoạch khu dân cư mới của huyện.",
+    "Gia đình có lao động chính trong độ tuổi, sức khỏe tốt và không có nợ quá hạn tại tổ chức tín dụng khác.",
+    "Rủi ro chủ yếu đến từ biến động giá nguyên vật liệu và thời tiết mưa bão trong mùa xây dựng.",
+    "Phương án dự kiến duy trì tỷ lệ tồn kho hợp lý, quay vòng hàng hóa khoảng bốn đến sáu lần mỗi năm.",
+    "Các khoản phải thu được thu hồi trong vòng ba mươi ngày, chủ yếu từ các đội thợ xây quen thuộc.",
+]
+
+def money(value):
+    """Số tiền theo định dạng Việt Nam: 1.500.000.000"""
+    return f"{int(value):,}".replace(",", ".")
+
+def random_plan(seed=0):
+    """Giá trị đúng của các trường (cùng khóa với parse_info_from_text) cho một phương án ngẫu nhiên."""
+    rng = np.random.default_rng(seed)
+    pick = lambda items: items[int(rng.integers(len(items)))]
+    chi_phi = int(rng.integers(5, 300)) * 10_000_000
+    chenh_lech = int(rng.integers(1, max(2, chi_phi // 10_000_000 // 3))) * 10_000_000
+    von_doi_ung = int(rng.integers(1, 10)) * chi_phi // 10 // 1_000_000 * 1_000_000
+    tai_san = pick(TAI_SAN).format(thua=int(rng.integers(1, 999)), to=int(rng.integers(1, 60)),
+                                   dien_tich=int(rng.integers(80, 600)))
+    return {
+        "ho_ten": f"{pick(HO)} {pick(TEN_DEM)} {pick(TEN)}",
+        "cccd": f"0420{int(rng.integers(10**7, 10**8))}",
+        "dia_chi": f"Thôn {int(rng.integers(1, 15))} xã {pick(XA)}",
+        "sdt": f"09{int(rng.integers(10**7, 10**8))}",
+        "muc_dich_vay": pick(MUC_DICH),
+        "tong_nhu_cau_von": float(chi_phi),
+        "von_doi_ung": float(von_doi_ung),
+        # Mẫu mặc định lấy số tiền vay theo dòng "Chênh lệch thu chi" (như regex ban đầu)
+        "so_tien_vay": float(chenh_lech),
+        "lai_suat": float(rng.integers(50, 120)) / 10,
+        "thoi_gian_vay": float(pick([6, 12, 24, 36, 60, 120, 240, 360])),
+        "tsdb_mo_ta": tai_san,
+        "tsdb_gia_tri": float(int(rng.integers(2, 30)) * chi_phi // 10),
+        "doanh_thu": float(chi_phi + chenh_lech),
+        "chi_phi": float(chi_phi),
+        "chenh_lech_thu_chi": float(chenh_lech),
+        "nguon_tra_no": float(chenh_lech),
+    }
+
+def _financial_lines(plan):
+    return [
+        f"Tài sản bảo đảm: {plan['tsdb_mo_ta']}",
+        "III. Thông tin tài chính",
+        f"- Chi phí kinh doanh: {money(plan['tong_nhu_cau_von'])} đồng",
+        f"+Doanh thu của phương án: {money(plan['doanh_thu'])} đồng",
+        f"+  Chi phí kinh doanh: {money(plan['chi_phi'])} đồng",
+        f"+  Chênh lệch thu chi: {money(plan['chenh_lech_thu_chi'])} đồng",
+        f"Vốn đối ứng của khách hàng là {money(plan['von_doi_ung'])} đồng,{money(plan['von_doi_ung'])}",
+        f"Lãi suất đề nghị: {plan['lai_suat']:.1f}%/năm".replace(".", ","),
+        f"Thời hạn cho vay: {int(plan['thoi_gian_vay'])} tháng",
+        f"Tổng tài sản đảm bảo: {money(plan['tsdb_gia_tri'])}",
+        f"- Từ nguồn thu của phương án kinh doanh: {money(plan['nguon_tra_no'])}đồng",
+    ]
+
+def build_plan_docx(pages=1, seed=0, financial_at_end=True):
+    """
+    Tạo file .docx phương án khoảng `pages` trang; trả về (nội dung file, dict giá trị đúng).
+    financial_at_end=True đặt phần tài chính sau toàn bộ thuyết minh (trường hợp xấu nhất
+    cho việc đọc dạng luồng vì phải đọc hết file mới đủ trường).
+    """
+    plan = random_plan(seed)
+    rng = np.random.default_rng(seed + 1)
+    doc = Document()
+    doc.add_heading("PHƯƠNG ÁN SỬ DỤNG VỐN", level=1)
+    doc.add_paragraph("I. Thông tin khách hàng")
+    doc.add_paragraph(f"Họ và tên: {plan['ho_ten']}. Sinh năm {int(rng.integers(1960, 2000))}")
+    doc.add_paragraph(f"CCCD số: {plan['cccd']} cấp ngày 01/01/2021")
+    doc.add_paragraph(f"Nơi cư trú: {plan['dia_chi']}, tỉnh Hà Tĩnh")
+    doc.add_paragraph(f"Số điện thoại: {plan['sdt']}")
+    doc.add_paragraph("II. Phương án vay vốn")
+    doc.add_paragraph(f"Mục đích vay: {plan['muc_dich_vay']}")
+    if not financial_at_end:
+        for line in _financial_lines(plan):
+            doc.add_paragraph(line)
+
+    written = 0
+    target = pages * CHARS_PER_PAGE
+    next_table = PAGES_PER_TABLE * CHARS_PER_PAGE
+    section = 1
+    while written < target:
+        if written >= next_table:
+            # Bảng kê hàng hóa: khoảng một trang, mỗi dòng 4 ô
+            doc.add_paragraph(f"Bảng kê hàng hóa dự kiến nhập - đợt {section}")
+            table = doc.add_table(rows=1, cols=4)
+            for cell, title in zip(table.rows[0].cells, ("Mặt hàng", "Số lượng", "Đơn giá (đồng)", "Thành tiền (đồng)")):
+                cell.text = title
+            for _ in range(30):
+                qty = int(rng.integers(10, 500))
+                price = int(rng.integers(5, 500)) * 1000
+                for cell, value in zip(table.add_row().cells, (MAT_HANG[int(rng.integers(len(MAT_HANG)))],
+                                                               str(qty), money(price), money(qty * price))):
+                    cell.text = value
+            written += 30 * 50
+            next_table += PAGES_PER_TABLE * CHARS_PER_PAGE
+            section += 1
+            continue
+        paragraph = " ".join(CAU_THUYET_MINH[i] for i in rng.integers(len(CAU_THUYET_MINH), size=4))
+        # Số liệu ngẫu nhiên để văn bản không lặp lại hoàn toàn (kích thước file nén gần với thực tế)
+        paragraph += (f" Doanh số tháng {int(rng.integers(1, 13))}/{int(rng.integers(2019, 2025))} đạt "
+                      f"{money(int(rng.integers(50, 900)) * 1_000_000 + int(rng.integers(1000)) * 1000)} đồng, "
+                      f"phục vụ {int(rng.integers(20, 400))} lượt khách.")
+        doc.add_paragraph(paragraph)
+        written += len(paragraph)
+
+    if financial_at_end:
+        for line in _financial_lines(plan):
+            doc.add_paragraph(line)
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue(), plan
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-o", "--output", required=True, help="Thư mục ghi các file .docx")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--count", type=int, default=1, help="Số phương án cho mỗi cỡ trang")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    for pages in args.pages:
+        for i in range(args.count):
+            data, _ = build_plan_docx(pages, seed=args.seed + i)
+            path = os.path.join(args.output, f"phuong_an_{pages:03d}trang_{i + 1:02d}.docx")
+            with open(path, "wb") as f:
+                f.write(data)
+            print(f"{path}: {len(data) / 1024:,.0f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+import numpy as np
+import plotly.graph_objects as go
+# ======================================================================================
+# DỰNG BIỂU ĐỒ CHO CHUỖI DÀI (KẾ HOẠCH TRẢ NỢ DÀI HẠN, DÒNG TIỀN DANH MỤC)
+# - Chuỗi dài được giảm mẫu phía máy chủ bằng LTTB (Largest-Triangle-Three-Buckets),
+#   giữ hình dạng đường cong với số điểm cố định.
+# - Dùng trace WebGL (Scattergl) và truyền mảng NumPy để Plotly mã hóa nhị phân.
+# - Biểu đồ đã dựng được cache theo mã băm của dữ liệu, kèm số liệu kích thước
+#   payload JSON và thời gian dựng để theo dõi.
+# ======================================================================================
+DEFAULT_MAX_POINTS = 1000
+# Số điểm tối đa còn vẽ kèm marker; nhiều hơn thì chỉ vẽ đường
+MARKER_LIMIT = 120
+
+# points: số điểm gửi đi; source_points: số điểm gốc; payload_bytes: kích thước JSON; build_ms: thời gian dựng + tuần tự hóa
+FigureStats = namedtuple("FigureStats", ["points", "source_points", "payload_bytes", "build_ms"])
+
+def lttb(x, y, threshold):
+    """
+    Giảm chuỗi (x, y) còn threshold điểm theo thuật toán LTTB; giữ nguyên điểm đầu và cuối.
+    Trả về chỉ số các điểm được giữ lại (tăng dần).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Biên các nhóm cho n - 2 điểm ở giữa
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Điểm trung bình của nhóm kế tiếp (nhóm cuối dùng điểm cuối cùng)
+        next_start, next_stop = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        # Chọn điểm tạo tam giác lớn nhất với điểm đã chọn trước đó và điểm trung bình nhóm sau
+        area = np.abs((x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+def downsample(x, y, max_points=DEFAULT_MAX_POINTS):
+    """(x, y) sau khi giảm mẫu LTTB nếu chuỗi dài hơn max_points."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) <= max_points:
+        return x, y
+    idx = lttb(x, y, max_points)
+    return x[idx], y[idx]
+
+def data_hash(*arrays, extra=""):
+    """Mã băm nội dung của các mảng/cột dữ liệu (kèm tham số extra), dùng làm khóa cache biểu đồ."""
+    digest = hashlib.sha1(str(extra).encode("utf-8"))
+    for array in arrays:
+        array = np.ascontiguousarray(np.asarray(array))
+        if array.dtype == object:
+            digest.update("\x1f".join(map(str, array.tolist())).encode("utf-8"))
+        else:
+            digest.update(str(array.dtype).encode("ascii"))
+            digest.update(array.tobytes())
+    return digest.hexdigest()
+
+class FigureCache:
+    """Cache LRU các biểu đồ đã dựng (kèm FigureStats), an toàn khi dùng từ nhiều luồng."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, builder):
+        """Trả về (figure, FigureStats); builder() trả về (figure, số điểm, số điểm gốc)."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+        start = time.perf_counter()
+        fig, points, source_points = builder()
+        payload = len(fig.to_json())
+        stats = FigureStats(points, source_points, payload, (time.perf_counter() - start) * 1000)
+        with self._lock:
+            self.misses += 1
+            self._items[key] = (fig, stats)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return fig, stats
+
+def balance_figure(periods, balances, max_points=DEFAULT_MAX_POINTS):
+    """Biểu đồ dư nợ giảm dần qua các kỳ; trả về (figure, số điểm vẽ, số điểm gốc)."""
+    x, y = downsample(periods, balances, max_points)
+    fig = go.Figure(go.Scattergl(
+        x=x,
+        y=y,
+        mode="lines+markers" if len(x) <= MARKER_LIMIT else "lines",
+        name="Dư nợ",
+        fill="tozeroy" # Tô màu vùng dưới đường line
+    ))
+    fig.update_layout(
+        title_text="Dư nợ giảm dần qua các kỳ",
+        xaxis_title="Kỳ trả nợ (Tháng)",
+        yaxis_title="Dư nợ còn lại (VNĐ)",
+    )
+    return fig, len(x), len(periods)
+
+def cash_flow_figure(cash_flows, group_col=None, group_label=None, max_points=DEFAULT_MAX_POINTS, bar_limit=240):
+    """
+    Biểu đồ dòng thu gốc + lãi theo tháng của danh mục (cột 'thang', 'tong' và cột nhóm tùy chọn).
+    Ít tháng: cột chồng theo nhóm; nhiều tháng: mỗi nhóm một đường WebGL đã giảm mẫu.
+    Trả về (figure, số điểm vẽ, số điểm gốc).
+    """
+    groups = cash_flows.groupby(group_col, sort=True) if group_col else [(None, cash_flows)]
+    n_months = cash_flows["thang"].nunique()
+    fig = go.Figure()
+    points = 0
+    for name, part in groups:
+        # Nhãn tháng dạng "YYYY-MM" (ngắn hơn chuỗi ngày giờ đầy đủ trong payload)
+        x = part["thang"].astype(str).to_numpy()
+        y = part["tong"].to_numpy()
+        label = str(name) if name is not None else "Gốc + lãi"
+        if n_months <= bar_limit:
+            fig.add_trace(go.Bar(x=x, y=y, name=label))
+        else:
+            # Giảm mẫu theo số thứ tự tháng (Period ordinal) để khoảng cách thời gian được giữ đúng
+            idx = lttb(part["thang"].array.asi8, y, max_points)
+            x, y = x[idx], y[idx]
+            fig.add_trace(go.Scattergl(x=x, y=y, mode="lines", name=label))
+        points += len(x)
+    fig.update_layout(
+        barmode="stack",
+        title_text="Dòng thu gốc và lãi theo tháng",
+        xaxis_title="Tháng",
+        yaxis_title="Gốc + lãi thu về (VNĐ)",
+        legend_title_text=group_label or "",
+        showlegend=group_col is not None,
+    )
+    return fig, points, len(cash_flows)
+
+def describe_stats(stats):
+    """Mô tả ngắn FigureStats để hiển thị dưới biểu đồ."""
+    sampled = f" (giảm mẫu từ {stats.source_points:,})" if stats.points < stats.source_points else ""
+    text = f"{stats.points:,} điểm{sampled} · payload {stats.payload_bytes / 1024:,.1f} KB · dựng trong {stats.build_ms:,.1f} ms"
+    return text.replace(",", "\x00").replace(".", ",").replace("\x00", ".")
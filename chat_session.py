@@ -0,0 +1,101 @@
+import json
+from metrics import gemini_generate
+from retrieval import estimate_tokens
+# ======================================================================================
+# PHIÊN TRÒ CHUYỆN CỦA CHATBOT
+# Giữ lịch sử hội thoại dạng sẵn sàng gửi cho Gemini (không dựng lại mỗi lần rerun).
+# Khi lịch sử vượt ngân sách token, các lượt cũ được nén thành một bản tóm tắt chạy
+# (running summary), chỉ giữ nguyên văn vài lượt gần nhất, nên kích thước prompt và
+# độ trễ luôn bị chặn trên dù cuộc trò chuyện kéo dài.
+# ======================================================================================
+SUMMARY_PROMPT = """
+Bạn đang hỗ trợ cán bộ thẩm định tín dụng. Hãy cập nhật bản tóm tắt cuộc trò chuyện dưới đây,
+giữ lại các số liệu, kết luận và câu hỏi còn bỏ ngỏ quan trọng. Viết tối đa 200 từ.
+
+Tóm tắt hiện có:
+{summary}
+
+Các lượt trao đổi cần gộp thêm vào tóm tắt:
+{transcript}
+"""
+
+_ROLE_NAMES = {"user": "Người dùng", "model": "Trợ lý"}
+
+class ChatSession:
+    """Lịch sử hội thoại (tóm tắt + các lượt gần nhất) gắn với một mô hình Gemini."""
+
+    def __init__(self, model, token_budget=6000, keep_recent=6):
+        self.model = model
+        self.token_budget = token_budget
+        # Số lượt (tin nhắn) gần nhất luôn giữ nguyên văn; nên là số chẵn để giữ trọn cặp hỏi - đáp
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.turns = []
+        self._tokens = 0
+
+    @classmethod
+    def from_history(cls, model, chat_history, **kwargs):
+        """Khôi phục phiên từ st.session_state.chat_history (bỏ qua các tin nhắn báo lỗi)."""
+        session = cls(model, **kwargs)
+        for message in chat_history:
+            if message.get("error"):
+                # Bỏ cả câu hỏi không nhận được trả lời để lịch sử luôn xen kẽ hỏi - đáp
+                if session.turns and session.turns[-1]["role"] == "user":
+                    dropped = session.turns.pop()
+                    session._tokens -= estimate_tokens(dropped["text"])
+                continue
+            session._append("user" if message["role"] == "user" else "model", message["content"])
+        return session
+
+    @property
+    def tokens(self):
+        """Ước lượng số token của phần lịch sử sẽ gửi kèm mỗi câu hỏi."""
+        return self._tokens
+
+    def _append(self, role, text):
+        self.turns.append({"role": role, "text": text})
+        self._tokens += estimate_tokens(text)
+
+    def contents(self, message):
+        """Danh sách nội dung gửi cho generate_content: tóm tắt, các lượt gần nhất và tin nhắn mới."""
+        contents = []
+        if self.summary:
+            contents.append({"role": "user", "parts": [f"Tóm tắt các trao đổi trước đó:\n{self.summary}"]})
+            contents.append({"role": "model", "parts": ["Tôi đã nắm được nội dung trao đổi trước đó."]})
+        contents += [{"role": turn["role"], "parts": [turn["text"]]} for turn in self.turns]
+        contents.append({"role": "user", "parts": [message]})
+        return contents
+
+    def compact(self):
+        """Nén các lượt cũ vào bản tóm tắt nếu lịch sử vượt ngân sách token."""
+        if self._tokens <= self.token_budget or len(self.turns) <= self.keep_recent:
+            return
+        old, self.turns = self.turns[:-self.keep_recent], self.turns[-self.keep_recent:]
+        transcript = "\n".join(f"{_ROLE_NAMES[turn['role']]}: {turn['text']}" for turn in old)
+        try:
+            response = gemini_generate(
+                "tom_tat_hoi_thoai", self.model,
+                SUMMARY_PROMPT.format(summary=self.summary or "(chưa có)", transcript=transcript)
+            )
+            self.summary = response.text.strip()
+        except Exception:
+            # Không tóm tắt được thì giữ bản tóm tắt cũ; các lượt cũ vẫn bị bỏ để prompt không phình ra
+            pass
+        self._tokens = estimate_tokens(self.summary) + sum(estimate_tokens(t["text"]) for t in self.turns)
+
+    def send(self, question, message, cache=None):
+        """
+        Gửi tin nhắn (message: câu hỏi đã kèm ngữ cảnh) và ghi lại lượt hỏi - đáp.
+        Lịch sử chỉ lưu câu hỏi gốc (question) để ngữ cảnh truy xuất không bị lặp lại ở các lượt sau.
+        Nếu có cache (LLMCache), khóa cache gồm cả lịch sử nên câu trả lời luôn đúng ngữ cảnh.
+        """
+        self.compact()
+        contents = self.contents(message)
+        call = lambda: gemini_generate("chatbot", self.model, contents).text
+        if cache is not None:
+            text = cache.cached_call(self.model.model_name, json.dumps(contents, ensure_ascii=False), call)
+        else:
+            text = call()
+        self._append("user", question)
+        self._append("model", text)
+        return text
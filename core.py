@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from docx_stream import iter_docx_lines
+from extractor import DEFAULT_TEMPLATE, get_extractor
+from metrics import timed
+from schedule import GOC_DEU, compute_schedules
+# ======================================================================================
+# LÕI XỬ LÝ THẨM ĐỊNH (không phụ thuộc Streamlit)
+# Dùng chung cho giao diện python.py và chế độ chạy hàng loạt batch.py
+# ======================================================================================
+# Tăng giá trị này mỗi khi thay đổi cách đọc .docx hoặc trích xuất trường thông tin,
+# để các kết quả đã cache theo phiên bản cũ không còn được dùng lại
+EXTRACTOR_VERSION = 4
+
+def format_currency(value, decimal_places=0):
+    """Định dạng số thành chuỗi tiền tệ với dấu chấm phân cách hàng nghìn và dấu phẩy thập phân."""
+    if value is None or not isinstance(value, (int, float)):
+        return "0"
+    # Format với dấu phẩy phân cách nghìn (Python mặc định)
+    formatted = f"{value:,.{decimal_places}f}"
+    # Đổi dấu: phẩy (nghìn) -> chấm, chấm (thập phân) -> phẩy
+    formatted = formatted.replace(",", "TEMP").replace(".", ",").replace("TEMP", ".")
+    return formatted
+
+def format_currency_array(values, decimal_places=0):
+    """
+    Phiên bản vector hóa của format_currency cho cả mảng/cột số: trả về mảng chuỗi cùng kích thước.
+    Các chữ số, dấu chấm hàng nghìn, dấu phẩy thập phân và dấu âm được điền thẳng vào một
+    ma trận mã ký tự (mỗi dòng một số, căn phải) rồi xem như mảng chuỗi độ rộng cố định,
+    không gọi hàm Python cho từng ô. Giá trị không hữu hạn (NaN, inf) được định dạng thành "0";
+    số có trị tuyệt đối từ 2**63 trở lên (không vừa int64) được định dạng từng số bằng format_currency.
+    """
+    arr = np.asarray(values, dtype=float)
+    flat = arr.ravel()
+    finite = np.isfinite(flat)
+    huge = finite & (np.abs(np.where(finite, flat, 0.0)) >= 2.0 ** 63)
+    scale = 10 ** decimal_places
+    magnitude = np.abs(np.where(finite & ~huge, flat, 0.0))
+    # Làm tròn nửa về số chẵn như f-string. Tách phần nguyên trước khi nhân scale (phép trừ phần
+    # nguyên là chính xác) để số lớn không mất phần thập phân; không có phần thập phân thì làm tròn trực tiếp.
+    whole = np.floor(magnitude) if decimal_places > 0 else np.rint(magnitude)
+    frac_part = np.rint((magnitude - whole) * scale).astype(np.int64)
+    carry = frac_part >= scale
+    int_part = whole.astype(np.int64) + carry
+    frac_part[carry] -= scale
+
+    n_digits = np.ones(flat.size, dtype=np.int64)
+    max_digits = len(str(int_part.max())) if flat.size else 1
+    for k in range(1, max_digits):
+        n_digits += int_part >= 10 ** k
+    # Cột 0 dành cho dấu âm; phần nguyên kết thúc ở cột end; sau đó là dấu phẩy và phần thập phân
+    end = max_digits + (max_digits - 1) // 3
+    width = end + 1 + (decimal_places + 1 if decimal_places > 0 else 0)
+    buf = np.full((flat.size, width), ord(" "), dtype=np.uint32)
+    remaining = int_part
+    for k in range(max_digits):
+        remaining, digit = np.divmod(remaining, 10)
+        buf[:, end - k - k // 3] = np.where(n_digits > k, ord("0") + digit, ord(" "))
+    for group in range(1, (max_digits - 1) // 3 + 1):
+        buf[:, end - 4 * group + 1] = np.where(n_digits > 3 * group, ord("."), ord(" "))
+    if decimal_places > 0:
+        buf[:, end + 1] = ord(",")
+        for j in range(decimal_places):
+            buf[:, end + 2 + j] = ord("0") + frac_part // 10 ** (decimal_places - 1 - j) % 10
+    negative = np.flatnonzero(np.signbit(flat) & finite)
+    first = end - (n_digits[negative] - 1) - (n_digits[negative] - 1) // 3
+    buf[negative, first - 1] = ord("-")
+    buf[~finite] = ord(" ")
+    buf[~finite, -1] = ord("0")
+    text = np.char.lstrip(np.ascontiguousarray(buf).view(f"<U{width}").ravel())
+    if huge.any():
+        big = [format_currency(float(value), decimal_places) for value in flat[huge]]
+        text = text.astype(f"<U{max(text.dtype.itemsize // 4, max(map(len, big)))}")
+        text[huge] = big
+    return text.reshape(arr.shape)
+
+@timed("extract_text_from_docx")
+def extract_text_from_docx(docx_file):
+    """
+    Trích xuất toàn bộ văn bản từ file .docx (gồm cả nội dung các bảng).
+    Lỗi đọc file được ném ra để nơi gọi tự quyết định cách hiển thị/ghi nhận.
+    """
+    return "\n".join(iter_docx_lines(docx_file))
+
+@timed("parse_info_from_text")
+def parse_info_from_text(text, template=DEFAULT_TEMPLATE):
+    """
+    Phân tích văn bản để trích xuất thông tin ban đầu (best-effort).
+    Các trường được khai báo theo mẫu phương án trong extractor.py và trích xuất
+    bằng một lượt quét duy nhất trên văn bản.
+    """
+    return get_extractor(template).extract(text)
+
+@timed("parse_docx")
+def parse_docx(docx_file, template=DEFAULT_TEMPLATE):
+    """Trích xuất thông tin trực tiếp từ luồng đọc file .docx, ngừng đọc khi đã đủ trường."""
+    return get_extractor(template).extract_stream(iter_docx_lines(docx_file))
+
+@timed("extract_and_parse_docx")
+def extract_and_parse_docx(docx_file, template=DEFAULT_TEMPLATE):
+    """
+    Đọc file .docx một lần, vừa đọc vừa trích xuất thông tin.
+    Trả về (toàn bộ văn bản, dict thông tin).
+    """
+    lines = []
+    def collect():
+        for line in iter_docx_lines(docx_file):
+            lines.append(line)
+            yield line
+    stream = collect()
+    info = get_extractor(template).extract_stream(stream)
+    # Đọc nốt phần còn lại của file để có đầy đủ văn bản cho các phân tích sau
+    for _ in stream:
+        pass
+    return "\n".join(lines), info
+
+def calculate_ratios(so_tien_vay, tong_nhu_cau_von, von_doi_ung, tsdb_gia_tri):
+    """Tính các chỉ số tài chính (đơn vị %) như tab 'Phân tích Chỉ số'."""
+    ty_le_vay_tong_von = (so_tien_vay / tong_nhu_cau_von * 100) if tong_nhu_cau_von > 0 else 0
+    ty_le_doi_ung = (von_doi_ung / tong_nhu_cau_von * 100) if tong_nhu_cau_von > 0 else 0
+    ty_le_vay_tsdb = (so_tien_vay / tsdb_gia_tri * 100) if tsdb_gia_tri > 0 else 0
+    return {
+        "ty_le_vay_tong_von": ty_le_vay_tong_von,
+        "ty_le_doi_ung": ty_le_doi_ung,
+        "ty_le_vay_tsdb": ty_le_vay_tsdb,
+    }
+
+def format_ratios_for_report(ratios):
+    """Chuyển các chỉ số sang dạng chuỗi dùng cho báo cáo và prompt AI."""
+    return {
+        "Tỷ lệ Vay/Tổng nhu cầu vốn": f"{ratios['ty_le_vay_tong_von']:.2f}%",
+        "Tỷ lệ Vốn đối ứng/Tổng nhu cầu vốn": f"{ratios['ty_le_doi_ung']:.2f}%",
+        "Tỷ lệ Vay/Giá trị TSĐB": f"{ratios['ty_le_vay_tsdb']:.2f}%"
+    }
+
+@timed("calculate_repayment_schedule")
+def calculate_repayment_schedule(principal, annual_rate, term_months, method=GOC_DEU, grace_months=0, season_months=3):
+    """Tạo bảng kế hoạch trả nợ chi tiết (phương thức trả nợ xem schedule.METHODS)."""
+    if not all([principal > 0, annual_rate > 0, term_months > 0]):
+        return pd.DataFrame()
+    schedules = compute_schedules(principal, annual_rate, int(term_months), method, grace_months, season_months)
+    n = int(schedules.term[0])
+    return pd.DataFrame({
+        "Kỳ trả nợ": np.arange(1, n + 1),
+        "Dư nợ đầu kỳ": schedules.opening[0, :n],
+        "Gốc trả trong kỳ": schedules.principal[0, :n],
+        "Lãi trả trong kỳ": schedules.interest[0, :n],
+        "Tổng gốc và lãi": schedules.payment[0, :n],
+        "Dư nợ cuối kỳ": schedules.closing[0, :n],
+    })
+
+def summarize_schedule(df):
+    """Tổng hợp các số liệu chính của bảng kế hoạch trả nợ."""
+    if df.empty:
+        return {"so_ky": 0, "tong_goc": 0.0, "tong_lai": 0.0, "tong_goc_lai": 0.0, "ky_tra_cao_nhat": 0.0}
+    return {
+        "so_ky": int(len(df)),
+        "tong_goc": float(df["Gốc trả trong kỳ"].sum()),
+        "tong_lai": float(df["Lãi trả trong kỳ"].sum()),
+        "tong_goc_lai": float(df["Tổng gốc và lãi"].sum()),
+        "ky_tra_cao_nhat": float(df["Tổng gốc và lãi"].max()),
+    }
@@ -0,0 +1,139 @@
+import zipfile
+from collections import namedtuple
+from xml.etree.ElementTree import iterparse
+# ======================================================================================
+# ĐỌC FILE .DOCX DẠNG LUỒNG
+# Đọc trực tiếp word/document.xml trong file zip bằng bộ phân tích XML tăng dần,
+# trả về đoạn văn và ô bảng theo đúng thứ tự trong tài liệu. Phần tử đã xử lý được
+# giải phóng ngay nên bộ nhớ sử dụng gần như không đổi theo kích thước file.
+# ======================================================================================
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_BODY = _W + "body"
+_P = _W + "p"
+_T = _W + "t"
+_TAB = _W + "tab"
+_BR = _W + "br"
+_CR = _W + "cr"
+_TR = _W + "tr"
+_TC = _W + "tc"
+_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+DOCUMENT_PART = "word/document.xml"
+
+# kind: "paragraph" hoặc "cell"; row: số thứ tự dòng bảng (None với đoạn văn); col: số thứ tự ô trong dòng
+Block = namedtuple("Block", ["kind", "text", "row", "col"])
+
+def iter_docx_blocks(docx_file):
+    """
+    Sinh lần lượt các Block (đoạn văn, ô bảng) của file .docx theo thứ tự xuất hiện.
+    docx_file có thể là đường dẫn hoặc đối tượng file (kể cả file tải lên của Streamlit).
+    """
+    with zipfile.ZipFile(docx_file) as archive:
+        with archive.open(DOCUMENT_PART) as xml_stream:
+            yield from _iter_blocks(xml_stream)
+
+def _iter_blocks(xml_stream):
+    """
+    Các phần tử đang mở được giữ trên một ngăn xếp: ["p", mảnh chữ, dòng phụ], ["tc", đoạn văn]
+    hoặc ["tr", số thứ tự dòng, ô]. Nhờ vậy đoạn văn lồng trong đoạn văn (khung văn bản
+    w:txbxContent) không làm mất phần chữ của đoạn bên ngoài, và bảng lồng trong ô bảng
+    không làm tách dòng của bảng bên ngoài.
+    """
+    body = None
+    depth = 0
+    body_depth = None
+    skip_depth = None    # đang bỏ qua nội dung mc:Fallback (bản sao của khung văn bản)
+    stack = []
+    row_counter = 0
+    for event, elem in iterparse(xml_stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            depth += 1
+            if skip_depth is not None:
+                continue
+            if tag == _FALLBACK:
+                skip_depth = depth
+            elif tag == _BODY:
+                body, body_depth = elem, depth
+            elif tag == _P:
+                stack.append(["p", [], []])
+            elif tag == _TR:
+                row_counter += 1
+                stack.append(["tr", row_counter, []])
+            elif tag == _TC:
+                stack.append(["tc", []])
+            continue
+
+        # event == "end"
+        depth -= 1
+        if skip_depth is not None:
+            if depth < skip_depth:
+                skip_depth = None
+                elem.clear()
+            continue
+        top = stack[-1] if stack else None
+        if tag == _T:
+            if elem.text and top is not None and top[0] == "p":
+                top[1].append(elem.text)
+        elif tag == _TAB:
+            if top is not None and top[0] == "p":
+                top[1].append("\t")
+        elif tag in (_BR, _CR):
+            if top is not None and top[0] == "p":
+                top[1].append("\n")
+        elif tag == _P:
+            _, runs, nested = stack.pop()
+            # Đoạn văn trong khung văn bản đứng ngay sau đoạn chứa nó
+            yield from _deliver(stack, ["".join(runs)] + nested)
+            elem.clear()
+        elif tag == _TC:
+            paragraphs = stack.pop()[1]
+            if stack and stack[-1][0] == "tr":
+                stack[-1][2].append("\n".join(paragraphs))
+            elem.clear()
+        elif tag == _TR:
+            _, row, cells = stack.pop()
+            if stack:
+                # Bảng lồng nhau: mỗi dòng của bảng con là một dòng (các ô nối bằng tab) trong phần tử chứa nó
+                yield from _deliver(stack, ["\t".join(cells)])
+            else:
+                for col, text in enumerate(cells):
+                    yield Block("cell", text, row, col)
+            elem.clear()
+        # Giải phóng các phần tử con trực tiếp của body sau khi đã xử lý xong
+        if body is not None and depth == body_depth:
+            body.clear()
+
+def _deliver(stack, lines):
+    """Đưa các dòng văn bản vào phần tử đang mở gần nhất, hoặc sinh Block đoạn văn nếu đang ở cấp body."""
+    parent = stack[-1] if stack else None
+    if parent is None:
+        for text in lines:
+            yield Block("paragraph", text, None, None)
+    elif parent[0] == "p":
+        parent[2].extend(lines)
+    elif parent[0] == "tc":
+        parent[1].extend(lines)
+
+def iter_docx_lines(docx_file):
+    """
+    Sinh các dòng văn bản của file .docx: mỗi đoạn văn là một dòng, mỗi dòng bảng
+    được ghép các ô bằng ký tự tab để giữ cặp "nhãn - giá trị" trên cùng một dòng.
+    """
+    current_row = None
+    row_cells = []
+    for block in iter_docx_blocks(docx_file):
+        if block.kind == "cell" and block.row == current_row:
+            row_cells.append(block.text)
+            continue
+        if row_cells:
+            yield "\t".join(row_cells)
+            row_cells = []
+        if block.kind == "cell":
+            current_row = block.row
+            row_cells.append(block.text)
+        else:
+            current_row = None
+            yield block.text
+    if row_cells:
+        yield "\t".join(row_cells)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import secrets
+import string
+import tempfile
+import time
+from contextlib import contextmanager
+# ======================================================================================
+# FILE TẢI XUỐNG LỚN GHI TRÊN ĐĨA
+# File .zip báo cáo hàng loạt và file Excel danh mục được ghi thẳng vào thư mục tải
+# xuống (DOWNLOAD_DIR) dưới một mã ngẫu nhiên khó đoán. Dịch vụ api.py phục vụ file
+# theo từng khối (GET /tai-xuong/<mã>), nên không tiến trình nào phải giữ cả file
+# trong bộ nhớ. Thư mục phải dùng chung giữa ứng dụng Streamlit và api.py; file quá
+# DOWNLOAD_TTL_MINUTES phút (mặc định 60) bị xóa ở lần tạo file tải xuống tiếp theo.
+# ======================================================================================
+DOWNLOAD_DIR = os.environ.get("DOWNLOAD_DIR", os.path.join(tempfile.gettempdir(), "tham_dinh_tai_xuong"))
+DOWNLOAD_TTL_SECONDS = float(os.environ.get("DOWNLOAD_TTL_MINUTES", 60)) * 60
+# Đuôi của file đang ghi dở: chưa được phục vụ
+_PARTIAL_SUFFIX = ".part"
+_TOKEN_CHARS = frozenset(string.ascii_letters + string.digits + "-_")
+
+@contextmanager
+def new_download(file_name, directory=DOWNLOAD_DIR, ttl_seconds=DOWNLOAD_TTL_SECONDS):
+    """
+    Chỗ ghi một file tải xuống mới: with new_download(tên) as (mã, đường dẫn): ghi file vào đường dẫn.
+    File chỉ được phục vụ sau khi khối with kết thúc bình thường; lỗi giữa chừng thì file bị xóa.
+    """
+    purge_expired(directory, ttl_seconds)
+    token = secrets.token_urlsafe(24)
+    folder = os.path.join(directory, token)
+    os.makedirs(folder)
+    path = os.path.join(folder, os.path.basename(file_name))
+    try:
+        yield token, path + _PARTIAL_SUFFIX
+        os.replace(path + _PARTIAL_SUFFIX, path)
+    except BaseException:
+        shutil.rmtree(folder, ignore_errors=True)
+        raise
+
+def resolve(token, directory=DOWNLOAD_DIR, ttl_seconds=DOWNLOAD_TTL_SECONDS):
+    """Đường dẫn file của mã token; None nếu mã không hợp lệ, file chưa ghi xong, không tồn tại hoặc đã hết hạn."""
+    if not token or not set(token) <= _TOKEN_CHARS:
+        return None
+    folder = os.path.join(directory, token)
+    try:
+        names = [name for name in os.listdir(folder) if not name.endswith(_PARTIAL_SUFFIX)]
+        if len(names) != 1 or time.time() - os.path.getmtime(folder) > ttl_seconds:
+            return None
+    except OSError:
+        return None
+    return os.path.join(folder, names[0])
+
+def purge_expired(directory=DOWNLOAD_DIR, ttl_seconds=DOWNLOAD_TTL_SECONDS):
+    """Xóa các file tải xuống quá hạn; trả về số file đã xóa."""
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    now = time.time()
+    removed = 0
+    for entry in entries:
+        try:
+            expired = entry.is_dir() and now - entry.stat().st_mtime > ttl_seconds
+        except OSError:
+            continue
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+def discard(token, directory=DOWNLOAD_DIR):
+    """Xóa ngay file tải xuống của mã token (khi nội dung đã được gửi theo cách khác)."""
+    if token and set(token) <= _TOKEN_CHARS:
+        shutil.rmtree(os.path.join(directory, token), ignore_errors=True)
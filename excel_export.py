@@ -0,0 +1,221 @@
+from collections import namedtuple
+from io import BytesIO
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+from core import summarize_schedule
+from metrics import timed
+from schedule import METHODS, compute_schedules
+# ======================================================================================
+# XUẤT EXCEL NHIỀU SHEET, BỘ NHỚ KHÔNG ĐỔI
+# Workbook được ghi ở chế độ write_only của openpyxl: từng dòng được ghi thẳng ra
+# file tạm thay vì giữ toàn bộ ô trong bộ nhớ. Mỗi cột dùng lại một ô mẫu đã gắn
+# định dạng số, dòng tiêu đề được cố định (freeze) để cuộn bảng dài vẫn thấy tên cột.
+# ======================================================================================
+FORMAT_VND = "#,##0"
+FORMAT_PERCENT = "0.00%"
+FORMAT_RATE = "0.00"
+FORMAT_INTEGER = "0"
+# Số dòng tối đa của một sheet Excel (.xlsx), kể cả dòng tiêu đề
+EXCEL_MAX_ROWS = 1048576
+
+# title: tên sheet; columns: [(tên cột, định dạng số hoặc None, độ rộng)]; rows: iterable các dòng giá trị
+SheetSpec = namedtuple("SheetSpec", ["title", "columns", "rows"])
+# Giá trị kèm định dạng riêng cho một ô (khi các dòng trong cùng cột có đơn vị khác nhau)
+Styled = namedtuple("Styled", ["value", "number_format"])
+
+SCHEDULE_COLUMNS = [
+    ("Kỳ trả nợ", FORMAT_INTEGER, 11),
+    ("Dư nợ đầu kỳ", FORMAT_VND, 18),
+    ("Gốc trả trong kỳ", FORMAT_VND, 18),
+    ("Lãi trả trong kỳ", FORMAT_VND, 18),
+    ("Tổng gốc và lãi", FORMAT_VND, 18),
+    ("Dư nợ cuối kỳ", FORMAT_VND, 18),
+]
+
+_HEADER_FONT = Font(bold=True, color="FFFFFF")
+_HEADER_FILL = PatternFill("solid", fgColor="1F4E78")
+
+@timed("write_workbook")
+def write_workbook(target, sheets, max_rows=EXCEL_MAX_ROWS):
+    """
+    Ghi các SheetSpec ra target (đường dẫn file hoặc file-like như BytesIO).
+    Ghi ra đường dẫn file thì bộ nhớ không tăng theo số dòng; với BytesIO chỉ có
+    file .xlsx đã nén nằm trong bộ nhớ. Sheet vượt max_rows dòng (kể cả dòng tiêu đề)
+    được ghi tiếp sang các sheet "<tên>_2", "<tên>_3"... có cùng tiêu đề cột.
+    """
+    wb = Workbook(write_only=True)
+    for sheet in sheets:
+        formats = [fmt for _, fmt, _ in sheet.columns]
+        part = 1
+        ws, styled_cell = _start_sheet(wb, sheet, sheet.title)
+        written = 1
+        for row in sheet.rows:
+            if written >= max_rows:
+                part += 1
+                ws, styled_cell = _start_sheet(wb, sheet, f"{sheet.title}_{part}")
+                written = 1
+            values = []
+            for col_idx, (value, fmt) in enumerate(zip(row, formats)):
+                if isinstance(value, Styled):
+                    values.append(styled_cell(col_idx, value.value, value.number_format))
+                elif fmt is None or value is None:
+                    values.append(value)
+                else:
+                    values.append(styled_cell(col_idx, value, fmt))
+            ws.append(values)
+            written += 1
+    wb.save(target)
+
+def _start_sheet(wb, sheet, title):
+    """Tạo sheet mới với dòng tiêu đề của SheetSpec; trả về (sheet, hàm tạo ô có định dạng số)."""
+    ws = wb.create_sheet(title)
+    ws.freeze_panes = "A2"
+    for idx, (_, _, width) in enumerate(sheet.columns, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = width
+    header = []
+    for name, _, _ in sheet.columns:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = _HEADER_FONT
+        cell.fill = _HEADER_FILL
+        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+        header.append(cell)
+    ws.append(header)
+
+    # Ô mẫu theo (cột, định dạng): openpyxl ghi ô ngay khi append nên có thể dùng lại cho mọi dòng
+    templates = {}
+    def styled_cell(col_idx, value, number_format):
+        cell = templates.get((col_idx, number_format))
+        if cell is None:
+            cell = templates[(col_idx, number_format)] = WriteOnlyCell(ws)
+            cell.number_format = number_format
+        cell.value = value
+        return cell
+    return ws, styled_cell
+
+def frame_sheet(title, df, formats=None, width=16):
+    """SheetSpec từ DataFrame; formats: {tên cột: định dạng số}."""
+    formats = formats or {}
+    columns = [(str(col), formats.get(col), width) for col in df.columns]
+    def column_values(col):
+        series = df[col]
+        # Ô thiếu giá trị (NaN) được ghi thành ô trống thay vì số rỗng
+        if series.isna().any():
+            series = series.astype(object).where(series.notna(), None)
+        return series.tolist()
+    rows = zip(*(column_values(col) for col in df.columns)) if len(df.columns) else iter(())
+    return SheetSpec(title, columns, rows)
+
+def appraisal_sheets(inputs, ratios, repayment_df):
+    """
+    Các sheet của một phương án: thông tin đầu vào, chỉ số, kế hoạch trả nợ và tổng hợp.
+    inputs: [(chỉ tiêu, giá trị, đơn vị)]; ratios: dict kết quả core.calculate_ratios.
+    """
+    def input_rows():
+        for label, value, unit in inputs:
+            if isinstance(value, (int, float)):
+                value = Styled(value, FORMAT_VND if unit == "VNĐ" else FORMAT_RATE if unit == "%/năm" else FORMAT_INTEGER)
+            yield label, value, unit
+    ratio_labels = {
+        "ty_le_vay_tong_von": "Tỷ lệ Vay/Tổng nhu cầu vốn",
+        "ty_le_doi_ung": "Tỷ lệ Vốn đối ứng/Tổng nhu cầu vốn",
+        "ty_le_vay_tsdb": "Tỷ lệ Vay/Giá trị TSĐB",
+    }
+    summary = summarize_schedule(repayment_df)
+    summary_rows = [
+        ("Số kỳ trả nợ", Styled(summary["so_ky"], FORMAT_INTEGER)),
+        ("Tổng gốc phải trả (VNĐ)", summary["tong_goc"]),
+        ("Tổng lãi phải trả (VNĐ)", summary["tong_lai"]),
+        ("Tổng gốc và lãi (VNĐ)", summary["tong_goc_lai"]),
+        ("Số tiền trả cao nhất một kỳ (VNĐ)", summary["ky_tra_cao_nhat"]),
+    ]
+    schedule = repayment_df[[name for name, _, _ in SCHEDULE_COLUMNS]] if not repayment_df.empty else None
+    return [
+        SheetSpec("ThongTin", [("Chỉ tiêu", None, 32), ("Giá trị", None, 40), ("Đơn vị", None, 10)], input_rows()),
+        SheetSpec("ChiSo", [("Chỉ số", None, 40), ("Giá trị", FORMAT_PERCENT, 14)],
+                  ((label, ratios.get(key, 0) / 100) for key, label in ratio_labels.items())),
+        SheetSpec("LichTraNo", SCHEDULE_COLUMNS,
+                  zip(*(schedule[col].tolist() for col in schedule.columns)) if schedule is not None else iter(())),
+        SheetSpec("TongHop", [("Chỉ tiêu", None, 36), ("Giá trị", FORMAT_VND, 20)], summary_rows),
+    ]
+
+def appraisal_inputs(info):
+    """Các dòng (chỉ tiêu, giá trị, đơn vị) của sheet thông tin đầu vào từ dict thông tin phương án."""
+    return [
+        ("Họ và tên", info.get("ho_ten", ""), ""),
+        ("CCCD/CMND", info.get("cccd", ""), ""),
+        ("Mục đích vay", info.get("muc_dich_vay", ""), ""),
+        ("Tổng nhu cầu vốn", info.get("tong_nhu_cau_von", 0), "VNĐ"),
+        ("Vốn đối ứng", info.get("von_doi_ung", 0), "VNĐ"),
+        ("Số tiền vay", info.get("so_tien_vay", 0), "VNĐ"),
+        ("Lãi suất", info.get("lai_suat", 0), "%/năm"),
+        ("Thời gian vay", info.get("thoi_gian_vay", 0), "tháng"),
+        ("Phương thức trả nợ", METHODS.get(info.get("phuong_thuc_tra_no")), ""),
+        ("Ân hạn gốc", info.get("an_han_goc", 0), "tháng"),
+        ("Giá trị TSĐB", info.get("tsdb_gia_tri", 0), "VNĐ"),
+    ]
+
+def generate_excel_download(df, inputs, ratios):
+    """Nội dung file Excel (thông tin đầu vào, chỉ số, kế hoạch trả nợ, tổng hợp) của một phương án."""
+    output = BytesIO()
+    write_workbook(output, appraisal_sheets(inputs, ratios, df))
+    return output.getvalue()
+
+def portfolio_schedule_sheets(portfolio, memory_budget_mb=64):
+    """
+    Các sheet kế hoạch trả nợ của mọi khoản vay trong danh mục (portfolio.Portfolio).
+    Kế hoạch được tính theo từng khối khoản vay vừa memory_budget_mb và ghi dòng ngay,
+    nên bộ nhớ không tăng theo số khoản vay. Sheet tổng hợp tính lại theo khối ở lượt thứ hai.
+    Danh mục có hơn EXCEL_MAX_ROWS kỳ trả nợ được write_workbook chia sang LichTraNo_2, LichTraNo_3...
+    """
+    n_loans = len(portfolio)
+    method_keys = np.asarray(list(METHODS.keys()))
+    max_term = int(portfolio.term.max()) if n_loans else 1
+    # Mỗi khối cần khoảng 16 mảng (khoản vay x kỳ) 8 byte, cộng danh sách giá trị Python của các dòng
+    rows_per_chunk = max(1, int(memory_budget_mb * 2**20 // (max_term * 8 * 32)))
+
+    def chunks():
+        for start in range(0, n_loans, rows_per_chunk):
+            sl = slice(start, start + rows_per_chunk)
+            yield start, compute_schedules(
+                portfolio.principal[sl], portfolio.rate[sl], portfolio.term[sl],
+                method_keys[portfolio.method[sl]], portfolio.grace[sl], portfolio.season[sl],
+            )
+
+    def schedule_rows():
+        for start, schedules in chunks():
+            width = schedules.principal.shape[1]
+            periods = np.arange(1, width + 1)
+            mask = periods[None, :] <= schedules.term[:, None]
+            loan_idx, period_idx = np.nonzero(mask)
+            yield from zip(
+                (start + loan_idx + 1).tolist(), periods[period_idx].tolist(),
+                schedules.opening[mask].tolist(), schedules.principal[mask].tolist(),
+                schedules.interest[mask].tolist(), schedules.payment[mask].tolist(),
+                schedules.closing[mask].tolist(),
+            )
+
+    def summary_rows():
+        products = portfolio.categories["san_pham"]
+        for start, schedules in chunks():
+            n = schedules.principal.shape[0]
+            yield from zip(
+                range(start + 1, start + n + 1),
+                products[1][products[0][start:start + n]].tolist(),
+                portfolio.principal[start:start + n].tolist(),
+                portfolio.rate[start:start + n].astype(float).tolist(),
+                schedules.term.tolist(),
+                schedules.interest.sum(axis=1).tolist(),
+                schedules.payment.max(axis=1, initial=0.0).tolist(),
+            )
+
+    return [
+        SheetSpec("LichTraNo", [("Khoản vay", FORMAT_INTEGER, 11)] + SCHEDULE_COLUMNS, schedule_rows()),
+        SheetSpec("TongHop", [
+            ("Khoản vay", FORMAT_INTEGER, 11), ("Sản phẩm", None, 24), ("Số tiền vay", FORMAT_VND, 18),
+            ("Lãi suất (%/năm)", FORMAT_RATE, 12), ("Số kỳ", FORMAT_INTEGER, 8),
+            ("Tổng lãi", FORMAT_VND, 18), ("Kỳ trả cao nhất", FORMAT_VND, 18),
+        ], summary_rows()),
+    ]
@@ -0,0 +1,218 @@
+import re
+from collections import namedtuple
+# ======================================================================================
+# BỘ TRÍCH XUẤT TRƯỜNG THÔNG TIN MỘT LƯỢT QUÉT
+# Mỗi mẫu phương án (template) khai báo danh sách FieldSpec. Toàn bộ nhãn được gộp
+# thành một regex biên dịch sẵn; văn bản chỉ được quét một lần từ đầu đến cuối và
+# dừng ngay khi mọi trường đã tìm thấy.
+# ======================================================================================
+FieldSpec = namedtuple("FieldSpec", ["name", "label", "value", "numeric", "default", "max_span"])
+FieldSpec.__new__.__defaults__ = (False, None, None)
+FieldSpec.__doc__ = """
+Mô tả một trường cần trích xuất.
+- label: regex của nhãn (phần mở đầu cố định, ví dụ "Lãi suất đề nghị:")
+- value: regex ngay sau nhãn, nhóm 1 là giá trị cần lấy
+- numeric: True nếu giá trị là số theo định dạng Việt Nam (1.234.567,89)
+- default: giá trị mặc định khi không tìm thấy (hoặc tìm thấy chuỗi rỗng)
+- max_span: giới hạn số ký tự được phép khớp kể từ nhãn, tránh quét ngược cả văn bản.
+  Đây là khác biệt có chủ đích so với regex ban đầu (không giới hạn): giá trị nằm xa nhãn
+  hơn max_span sẽ không được nhận. Chỉ đặt cho trường mà giá trị thực tế luôn nằm gần nhãn.
+"""
+
+FLAGS = re.IGNORECASE | re.DOTALL
+_NON_NUMERIC = re.compile(r'[^\d,.]')
+
+DEFAULT_TEMPLATE = "mac_dinh"
+
+# Mẫu phương án mặc định (tương ứng với các regex ban đầu của parse_info_from_text)
+DEFAULT_FIELDS = [
+    # Thông tin khách hàng
+    FieldSpec('ho_ten', r"Họ và tên:", r"\s*(.*?)\s*\.", default="Chưa rõ"),
+    FieldSpec('cccd', r"CCCD số:", r"\s*(\d+)", default=""),
+    FieldSpec('dia_chi', r"Nơi cư trú:", r"\s*(.*?)(?:,|$|\n)", default="Chưa rõ"),
+    FieldSpec('sdt', r"Số điện thoại:", r"\s*(\d+)", default=""),
+    # Thông tin phương án vay
+    FieldSpec('muc_dich_vay', r"Mục đích vay:", r"\s*(.*?)\n", default="Kinh doanh vật liệu xây dựng"),
+    FieldSpec('tong_nhu_cau_von', r"- Chi phí kinh doanh:", r"\s*([\d.,]+)\s*đồng", numeric=True, default=0),
+    FieldSpec('von_doi_ung', r"Vốn đối ứng", r".*?đồng,([\d.,]+)", numeric=True, default=0),
+    FieldSpec('so_tien_vay', r"Chênh lệch thu chi:", r"\s*([\d.,]+)\s*đồng", numeric=True, default=0),
+    FieldSpec('lai_suat', r"Lãi suất đề nghị:", r"\s*([\d.,]+)%/năm", numeric=True, default=5.0),
+    FieldSpec('thoi_gian_vay', r"Thời hạn cho vay:", r"\s*(\d+)\s*tháng", numeric=True, default=3),
+    # Thông tin tài sản đảm bảo (mô tả dài quá 20.000 ký tự không được nhận, khác regex ban đầu)
+    FieldSpec('tsdb_mo_ta', r"Tài sản bảo đảm:", r"\s*(.*?)(?=III\. Thông tin)", default="Chưa có mô tả", max_span=20000),
+    FieldSpec('tsdb_gia_tri', r"Tổng tài sản đảm bảo:", r"\s*([\d.,]+)", numeric=True, default=0),
+    # Thông tin doanh thu - chi phí của phương án
+    FieldSpec('doanh_thu', r"\+Doanh thu của phương án:", r"\s*([\d.,]+)\s*đồng", numeric=True, default=0),
+    FieldSpec('chi_phi', r"\+  Chi phí kinh doanh:", r"\s*([\d.,]+)\s*đồng", numeric=True, default=0),
+    FieldSpec('chenh_lech_thu_chi', r"\+  Chênh lệch thu chi:", r"\s*([\d.,]+)\s*đồng", numeric=True, default=0),
+    FieldSpec('nguon_tra_no', r"- Từ nguồn thu của phương án kinh doanh:", r"\s*([\d.,]+)đồng", numeric=True, default=0),
+]
+
+def parse_vn_number(raw, default=None):
+    """Chuyển chuỗi số định dạng Việt Nam (1.234,5) về float."""
+    try:
+        cleaned = _NON_NUMERIC.sub('', raw)
+        return float(cleaned.replace('.', '').replace(',', '.'))
+    except (ValueError, IndexError):
+        return default
+
+def _lower_pattern(pattern):
+    """Chữ thường hóa phần chữ của regex nhãn, giữ nguyên các chuỗi escape (\\d, \\S, \\. ...)."""
+    out = []
+    escaped = False
+    for ch in pattern:
+        out.append(ch if escaped else ch.lower())
+        escaped = not escaped and ch == "\\"
+    return "".join(out)
+
+# Số ký tự tối đa tính từ cuối nhãn vừa quét được để tìm các nhãn chồng lấn với nó
+_OVERLAP_WINDOW = 256
+# Kích thước khối văn bản được chữ thường hóa mỗi lần khi quét
+_CHUNK_SIZE = 1 << 14
+# Số ký tự tối thiểu phía sau một nhãn cần có trong bộ đệm trước khi khớp giá trị (chế độ luồng)
+_STREAM_LOOKAHEAD = 4096
+
+class FieldExtractor:
+    """Trích xuất các trường theo một danh sách FieldSpec với một lượt quét văn bản."""
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        # Regex nhãn và regex đầy đủ (nhãn + giá trị) của từng trường, dùng tại vị trí ứng viên
+        self._labels = [re.compile(f.label, FLAGS) for f in self.fields]
+        self._patterns = [re.compile(f.label + f.value, FLAGS) for f in self.fields]
+        alternation = "|".join(f"(?:{_lower_pattern(f.label)})" for f in self.fields)
+        # Quét trên văn bản đã chữ thường hóa mà không dùng IGNORECASE: regex engine
+        # giữ được bộ lọc theo ký tự đầu, nhanh hơn nhiều so với alternation không phân biệt hoa thường
+        self._scanner = re.compile(alternation, re.DOTALL)
+        # Dự phòng cho văn bản mà lower() làm thay đổi độ dài (lệch vị trí ký tự)
+        self._scanner_ci = re.compile("|".join(f"(?:{f.label})" for f in self.fields), FLAGS)
+
+    def _convert(self, field, raw):
+        if field.numeric:
+            return parse_vn_number(raw, field.default)
+        return raw or field.default
+
+    def _match_near(self, idx, text, pos, span_end):
+        """
+        Thử trường idx tại các nhãn bắt đầu trong đoạn [pos, span_end) của ứng viên vừa quét.
+        Nhờ vậy các nhãn lồng nhau (ví dụ "Chênh lệch thu chi:" nằm trong
+        "+  Chênh lệch thu chi:") vẫn được xét dù regex quét chỉ trả về nhãn dài hơn.
+        """
+        field = self.fields[idx]
+        text_len = len(text)
+        for label in self._labels[idx].finditer(text, pos, min(text_len, span_end + _OVERLAP_WINDOW)):
+            start = label.start()
+            if start >= span_end:
+                break
+            end = text_len if field.max_span is None else min(text_len, start + field.max_span)
+            match = self._patterns[idx].match(text, start, end)
+            if match:
+                return match
+        return None
+
+    def _candidates(self, text, start=0, stop=None):
+        """
+        Sinh các vị trí nhãn ứng viên trong [start, stop) theo thứ tự trong văn bản.
+        Văn bản được chữ thường hóa theo từng khối nên việc dừng sớm không phải trả
+        chi phí xử lý phần còn lại của tài liệu.
+        """
+        text_len = len(text)
+        stop = text_len if stop is None else stop
+        while start < stop:
+            chunk_stop = min(stop, start + _CHUNK_SIZE)
+            window_end = min(text_len, chunk_stop + _OVERLAP_WINDOW)
+            lowered = text[start:window_end].lower()
+            if len(lowered) == window_end - start:
+                for candidate in self._scanner.finditer(lowered):
+                    if start + candidate.start() >= chunk_stop:
+                        break
+                    yield start + candidate.start(), start + candidate.end()
+            else:
+                for candidate in self._scanner_ci.finditer(text, start, window_end):
+                    if candidate.start() >= chunk_stop:
+                        break
+                    yield candidate.span()
+            start = chunk_stop
+
+    def _scan(self, text, start, stop, pending, found):
+        """Xử lý các nhãn ứng viên trong [start, stop); trả về danh sách trường còn thiếu."""
+        for pos, span_end in self._candidates(text, start, stop):
+            still_pending = []
+            for idx in pending:
+                match = self._match_near(idx, text, pos, span_end)
+                if match:
+                    field = self.fields[idx]
+                    found[field.name] = self._convert(field, match.group(1).strip())
+                else:
+                    still_pending.append(idx)
+            pending = still_pending
+            # Dừng sớm khi đã có đủ mọi trường
+            if not pending:
+                break
+        return pending
+
+    def _result(self, found):
+        return {f.name: found.get(f.name, f.default) for f in self.fields}
+
+    def extract(self, text):
+        """Trả về dict {tên trường: giá trị}; trường không tìm thấy nhận giá trị mặc định."""
+        found = {}
+        self._scan(text, 0, len(text), list(range(len(self.fields))), found)
+        return self._result(found)
+
+    def extract_stream(self, lines, separator="\n"):
+        """
+        Trích xuất từ một luồng dòng văn bản (ví dụ docx_stream.iter_docx_lines).
+        Việc quét bắt đầu ngay khi đã nhận đủ một khối, chỉ giữ lại phần đuôi văn bản
+        chưa xử lý, và ngừng đọc luồng khi mọi trường đã được tìm thấy.
+        Trường không khai báo max_span được giới hạn trong _STREAM_LOOKAHEAD ký tự (khác
+        extract, vốn khớp tới cuối văn bản như regex ban đầu). Các dòng được nối bằng separator
+        như "\n".join(lines): không có separator sau dòng cuối.
+        """
+        lookahead = max([_STREAM_LOOKAHEAD] + [f.max_span for f in self.fields if f.max_span])
+        found = {}
+        pending = list(range(len(self.fields)))
+        tail = ""
+        buffered = []
+        buffered_len = 0
+        pending_separator = False
+        for line in lines:
+            if pending_separator:
+                buffered.append(separator)
+                buffered_len += len(separator)
+            pending_separator = True
+            buffered.append(line)
+            buffered_len += len(line)
+            if buffered_len < _CHUNK_SIZE + lookahead:
+                continue
+            tail += "".join(buffered)
+            buffered, buffered_len = [], 0
+            # Chỉ xử lý các vị trí đã có đủ phần văn bản phía sau để khớp giá trị
+            ready = len(tail) - lookahead
+            pending = self._scan(tail, 0, ready, pending, found)
+            if not pending:
+                return self._result(found)
+            tail = tail[ready:]
+        tail += "".join(buffered)
+        self._scan(tail, 0, len(tail), pending, found)
+        return self._result(found)
+
+# Sổ đăng ký mẫu phương án: thêm mẫu mới bằng register_template, không cần sửa code trích xuất
+_templates = {}
+_extractors = {}
+
+def register_template(name, fields):
+    """Đăng ký (hoặc thay thế) danh sách trường cho một mẫu phương án."""
+    _templates[name] = list(fields)
+    _extractors.pop(name, None)
+
+def get_extractor(template=DEFAULT_TEMPLATE):
+    """Lấy bộ trích xuất đã biên dịch cho mẫu phương án (biên dịch một lần, dùng lại)."""
+    extractor = _extractors.get(template)
+    if extractor is None:
+        if template not in _templates:
+            raise KeyError(f"Chưa đăng ký mẫu phương án: {template}")
+        extractor = _extractors[template] = FieldExtractor(_templates[template])
+    return extractor
+
+register_template(DEFAULT_TEMPLATE, DEFAULT_FIELDS)
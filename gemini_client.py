@@ -0,0 +1,251 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+from llm_cache import make_key
+from metrics import REGISTRY
+# ======================================================================================
+# LỚP GỌI GEMINI DÙNG CHUNG CHO CẢ TIẾN TRÌNH
+# - Semaphore giới hạn số yêu cầu đồng thời và token bucket giới hạn số yêu cầu mỗi
+#   phút, dùng chung cho mọi phiên dùng cùng một API key (hạn mức tính theo key).
+# - Lỗi tạm thời (429, 5xx, hết thời gian chờ) được thử lại với thời gian chờ tăng
+#   theo cấp số nhân và ngẫu nhiên hóa (full jitter) để các phiên không thử lại cùng lúc.
+# - Các yêu cầu giống hệt nhau đang chờ phản hồi được gộp: chỉ một yêu cầu được gửi đi,
+#   các nơi gọi còn lại nhận chung kết quả (kể cả phản hồi dạng luồng).
+# GeminiClient có cùng giao diện với genai.GenerativeModel (model_name, generate_content,
+# count_tokens) nên dùng thay trực tiếp ở mọi nơi đang nhận model.
+# ======================================================================================
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_BURST = 5
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 32.0
+
+# Lỗi tạm thời đáng thử lại: vượt hạn mức, máy chủ quá tải/lỗi, hết thời gian chờ, mất kết nối
+RETRYABLE_ERRORS = (
+    api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted, api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError, api_exceptions.BadGateway, api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded, ConnectionError, TimeoutError,
+)
+
+class TokenBucket:
+    """Giới hạn tốc độ: trung bình rate yêu cầu/giây, cho phép dồn tối đa capacity yêu cầu liền nhau."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Lấy một lượt, chờ nếu cần; trả về số giây đã chờ."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Đặt chỗ trước (số lượt có thể âm) rồi mới chờ ngoài khóa: các yêu cầu được phục vụ theo thứ tự đến
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+class Limiter:
+    """Semaphore số yêu cầu đồng thời và token bucket số yêu cầu mỗi phút."""
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 burst=DEFAULT_BURST):
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+
+class _SharedStream:
+    """Phản hồi dạng luồng dùng chung: một luồng nền ghi các chunk, nhiều nơi gọi cùng đọc."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def __iter__(self):
+        idx = 0
+        while True:
+            with self._cond:
+                while idx >= len(self.chunks) and not self.done:
+                    self._cond.wait()
+                if idx >= len(self.chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+                chunk = self.chunks[idx]
+            idx += 1
+            yield chunk
+
+class GeminiClient:
+    """Bọc một genai.GenerativeModel (hoặc đối tượng cùng giao diện) với giới hạn tốc độ, thử lại và gộp yêu cầu."""
+
+    def __init__(self, model, limiter=None, max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, sleep=time.sleep, seed=None):
+        self.model = model
+        self.model_name = model.model_name
+        self.limiter = limiter or Limiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._random = random.Random(seed)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        """Thời gian chờ trước lần thử lại thứ attempt + 1 (full jitter)."""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _call(self, call, limited=True, can_retry=None):
+        """Gọi call() trong giới hạn đồng thời/tốc độ, thử lại lỗi tạm thời tối đa max_retries lần."""
+        for attempt in range(self.max_retries + 1):
+            queued = time.perf_counter()
+            with self.limiter.semaphore:
+                if limited:
+                    self.limiter.bucket.acquire()
+                REGISTRY.observe("gemini.hang_doi", time.perf_counter() - queued)
+                try:
+                    return call()
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries or (can_retry is not None and not can_retry()):
+                        raise
+                    REGISTRY.incr("gemini_retries", error=type(e).__name__)
+            # Chờ ngoài semaphore để nhường lượt cho các yêu cầu khác
+            self._sleep(self.backoff(attempt))
+
+    def _claim(self, key, factory):
+        """(đối tượng dùng chung, True nếu nơi gọi này phải tự gửi yêu cầu)."""
+        with self._lock:
+            shared = self._inflight.get(key)
+            if shared is not None:
+                REGISTRY.incr("gemini_coalesced")
+                return shared, False
+            shared = self._inflight[key] = factory()
+            return shared, True
+
+    def _release(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        """Như GenerativeModel.generate_content; yêu cầu giống hệt đang chờ được gộp làm một."""
+        key = make_key(self.model_name, contents, {"generation_config": generation_config, "stream": stream, **kwargs})
+        if stream:
+            return self._stream(key, contents, generation_config, kwargs)
+        future, leader = self._claim(key, Future)
+        if not leader:
+            return future.result()
+        try:
+            response = self._call(lambda: self.model.generate_content(contents, generation_config=generation_config, **kwargs))
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key)
+
+    def _stream(self, key, contents, generation_config, kwargs):
+        shared, leader = self._claim(key, _SharedStream)
+        if leader:
+            # Luồng nền đọc phản hồi tới cùng để nơi gọi nào dừng đọc sớm cũng không làm hỏng các nơi khác
+            def pump():
+                def consume():
+                    for chunk in self.model.generate_content(contents, generation_config=generation_config,
+                                                             stream=True, **kwargs):
+                        shared.publish(chunk)
+                try:
+                    # Chỉ thử lại khi chưa nhận chunk nào (phần đã nhận đã được hiển thị cho người dùng)
+                    self._call(consume, can_retry=lambda: not shared.chunks)
+                    shared.finish()
+                except BaseException as e:
+                    shared.finish(e)
+                finally:
+                    self._release(key)
+            threading.Thread(target=pump, daemon=True).start()
+        return iter(shared)
+
+    def count_tokens(self, contents):
+        """Đếm token (hạn mức riêng của countTokens nên không tính vào token bucket)."""
+        return self._call(lambda: self.model.count_tokens(contents), limited=False)
+
+# Giới hạn dùng chung theo API key, để mọi model của cùng một key chia nhau hạn mức
+_limiters = {}
+_limiters_lock = threading.Lock()
+_MISSING = object()
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def create_model(api_key, model_name, endpoint=None):
+    """
+    genai.GenerativeModel gắn với client riêng của api_key. Không dùng genai.configure: đó là
+    cấu hình toàn cục của thư viện, các phiên dùng key khác nhau sẽ ghi đè key của nhau.
+    endpoint: địa chỉ REST thay thế (ví dụ máy chủ giả lập benchmarks.gemini_stub).
+    """
+    options = {"api_key": api_key}
+    if endpoint:
+        options["api_endpoint"] = endpoint
+    model = genai.GenerativeModel(model_name)
+    # google-generativeai 0.8 chưa có tham số công khai để gắn client riêng cho một model: GenerativeModel
+    # chỉ lấy client mặc định (toàn cục) khi thuộc tính _client còn là None. Thư viện đổi cách làm thì báo
+    # lỗi ngay, không âm thầm gửi yêu cầu bằng key toàn cục (hoặc key của phiên khác).
+    if getattr(model, "_client", _MISSING) is not None:
+        raise RuntimeError(
+            f"google-generativeai {getattr(genai, '__version__', '?')} không còn hỗ trợ gắn client riêng cho "
+            "GenerativeModel; cần phiên bản 0.8.x (xem requirements.txt)."
+        )
+    model._client = glm.GenerativeServiceClient(client_options=options, transport="rest" if endpoint else None)
+    return model
+
+def create_client(api_key, model_name):
+    """
+    GeminiClient cho model_name dùng riêng api_key, cấu hình qua biến môi trường:
+    GEMINI_MAX_CONCURRENCY, GEMINI_RPM, GEMINI_BURST, GEMINI_MAX_RETRIES và GEMINI_API_ENDPOINT
+    (địa chỉ REST thay thế, ví dụ máy chủ giả lập benchmarks.gemini_stub).
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(api_key)
+        if limiter is None:
+            limiter = _limiters[api_key] = Limiter(
+                _env_int("GEMINI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+                _env_int("GEMINI_RPM", DEFAULT_REQUESTS_PER_MINUTE),
+                _env_int("GEMINI_BURST", DEFAULT_BURST),
+            )
+    return GeminiClient(create_model(api_key, model_name, os.environ.get("GEMINI_API_ENDPOINT")), limiter,
+                        max_retries=_env_int("GEMINI_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+
+def describe_error(error):
+    """Thông báo lỗi dễ hiểu cho người dùng thay vì chuỗi lỗi thô của thư viện."""
+    if isinstance(error, (api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted)):
+        return "Hệ thống AI đang vượt hạn mức yêu cầu (đã tự động thử lại nhưng chưa thành công). Vui lòng thử lại sau ít phút."
+    if isinstance(error, (api_exceptions.Unauthenticated, api_exceptions.PermissionDenied)) or "API key" in str(error):
+        return "Gemini API Key không hợp lệ hoặc không có quyền truy cập. Vui lòng kiểm tra lại API Key ở thanh bên."
+    if isinstance(error, RETRYABLE_ERRORS):
+        return "Dịch vụ Gemini tạm thời không phản hồi. Vui lòng thử lại sau."
+    return f"Lỗi khi gọi API Gemini: {error}"
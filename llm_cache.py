@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from ai_stream import stream_text
+from metrics import gemini_generate
+# ======================================================================================
+# BỘ NHỚ ĐỆM PHẢN HỒI CỦA MÔ HÌNH NGÔN NGỮ (GEMINI)
+# Lưu phản hồi trong SQLite theo khóa băm của (tên mô hình, prompt, cấu hình sinh).
+# Có thời hạn sống (TTL), giới hạn dung lượng (xóa mục ít dùng nhất), bộ đếm
+# trúng/trượt và tùy chọn bỏ qua cache khi người dùng muốn phân tích lại.
+# ======================================================================================
+DEFAULT_PATH = os.path.join(".cache", "llm_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 200 * 2**20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+"""
+
+def make_key(model_name, prompt, settings=None):
+    """Khóa cache: SHA-256 của tên mô hình, prompt và cấu hình sinh (chuẩn hóa thứ tự khóa)."""
+    payload = json.dumps(
+        {"model": model_name, "prompt": prompt, "settings": settings or {}},
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """Cache phản hồi LLM lưu trên SQLite, an toàn khi dùng từ nhiều luồng."""
+
+    def __init__(self, path=DEFAULT_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key):
+        """Trả về phản hồi đã lưu (còn hạn) hoặc None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model_name, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Xóa mục hết hạn, sau đó xóa các mục ít được dùng gần đây nhất cho đến khi dưới giới hạn dung lượng."""
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def cached_call(self, model_name, prompt, call, settings=None, bypass=False):
+        """
+        Trả về phản hồi cho prompt: lấy từ cache nếu có, ngược lại gọi call() (trả về chuỗi)
+        và lưu kết quả. bypass=True luôn gọi lại mô hình và ghi đè kết quả cũ.
+        Lỗi từ call() được ném ra và không bao giờ được lưu vào cache.
+        """
+        key = make_key(model_name, prompt, settings)
+        if bypass:
+            with self._lock:
+                self.bypassed += 1
+        else:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+        response = call()
+        self.put(key, model_name, response)
+        return response
+
+    def generate(self, model, prompt, generation_config=None, bypass=False, stage="generate"):
+        """Gọi model.generate_content(prompt) qua cache; trả về văn bản phản hồi (stage: tên công đoạn trong metrics)."""
+        return self.cached_call(
+            model.model_name, prompt,
+            lambda: gemini_generate(stage, model, prompt, generation_config=generation_config).text,
+            settings=generation_config, bypass=bypass,
+        )
+
+    def cached_stream(self, model_name, prompt, factory, settings=None, bypass=False):
+        """
+        Phiên bản dạng luồng của cached_call: factory() trả về iterator các mảnh văn bản.
+        Nếu trúng cache, toàn bộ phản hồi được trả về trong một mảnh; nếu không, các mảnh
+        được chuyển tiếp ngay khi nhận và phản hồi đầy đủ chỉ được lưu khi luồng kết thúc trọn vẹn.
+        """
+        key = make_key(model_name, prompt, settings)
+        if bypass:
+            with self._lock:
+                self.bypassed += 1
+        else:
+            cached = self.get(key)
+            if cached is not None:
+                yield cached
+                return
+        pieces = []
+        for piece in factory():
+            pieces.append(piece)
+            yield piece
+        self.put(key, model_name, "".join(pieces))
+
+    def generate_stream(self, model, prompt, generation_config=None, bypass=False, stage="stream"):
+        """Gọi model.generate_content(prompt, stream=True) qua cache; sinh các mảnh văn bản."""
+        return self.cached_stream(
+            model.model_name, prompt,
+            lambda: stream_text(model, prompt, generation_config, stage),
+            settings=generation_config, bypass=bypass,
+        )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            return {"entries": entries, "bytes": size, "hits": self.hits,
+                    "misses": self.misses, "bypassed": self.bypassed}
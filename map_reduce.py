@@ -0,0 +1,133 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from retrieval import CHARS_PER_TOKEN, estimate_tokens, split_chunks
+# ======================================================================================
+# PHÂN TÍCH PHƯƠNG ÁN LỚN THEO KIỂU MAP-REDUCE
+# Khi văn bản vượt ngưỡng prompt hợp lý: đếm token -> chia theo mục -> tóm tắt từng
+# mục song song (giới hạn số yêu cầu đồng thời) -> một lần gọi cuối gộp các bản tóm
+# tắt thành báo cáo thẩm định 6 điểm. Kết quả từng mục đi qua LLMCache với khóa là
+# nội dung mục, nên sửa một mục chỉ phải tóm tắt lại mục đó.
+# ======================================================================================
+DEFAULT_MAX_PROMPT_TOKENS = 30000
+DEFAULT_SECTION_TOKENS = 6000
+# Mục ngắn hơn ngưỡng này được ghép vào mục đứng trước (tránh một lần gọi API cho vài dòng)
+DEFAULT_MIN_SECTION_TOKENS = 300
+DEFAULT_CONCURRENCY = 4
+
+# Tiêu đề mục lớn: số La Mã viết hoa ("I.", "IV.") rồi tới nội dung; PHẦN, CHƯƠNG, PHỤ LỤC viết hoa;
+# hoặc "Phần 2", "Chương II". Phân biệt hoa thường để "c. Chi phí", "v.v.", "Phần lớn..." không bị
+# coi là tiêu đề.
+_MAJOR_HEADING = re.compile(r"^\s*(?:[IVXLC]+\.\s+\S|(?:PHẦN|CHƯƠNG|PHỤ LỤC)\b|(?:Phần|Chương|Phụ lục)\s+(?:\d+|[IVXLC]+)\b)")
+# Tiêu đề mục nhỏ: số thứ tự ngắn ("1.", "2.3", "4)") rồi tới một chữ viết hoa (kiểm tra riêng
+# bằng str.isupper cho cả chữ có dấu), để số liệu như "1.500.000 đồng", "2024 năm" không bị coi là tiêu đề
+_MINOR_HEADING = re.compile(r"^\s*\d{1,2}(?:\.\d{1,2}){0,3}[.)]?\s+(\w)")
+
+SECTION_PROMPT = """
+Với vai trò là một chuyên gia thẩm định tín dụng ngân hàng, hãy tóm tắt phần sau của một phương án kinh doanh.
+Giữ lại đầy đủ các số liệu (doanh thu, chi phí, lợi nhuận, nguồn vốn, tài sản đảm bảo), thông tin về kinh nghiệm,
+thị trường, sản phẩm/dịch vụ và mọi rủi ro hoặc điểm chưa rõ được nêu. Viết ngắn gọn, tối đa 300 từ.
+---
+{section}
+---
+"""
+
+REDUCE_PROMPT = """
+Với vai trò là một chuyên gia thẩm định tín dụng ngân hàng, hãy phân tích toàn bộ phương án kinh doanh của khách hàng
+dựa trên các bản tóm tắt theo từng phần của file .docx dưới đây.
+
+Cần tập trung vào các điểm sau:
+1. Tóm tắt tổng quan về phương án kinh doanh
+2. Phân tích các điểm mạnh của phương án (ví dụ: kinh nghiệm, thị trường, sản phẩm/dịch vụ, khả năng cạnh tranh)
+3. Phân tích các điểm yếu hoặc các điểm cần làm rõ thêm
+4. Nhận diện các rủi ro tiềm ẩn (rủi ro thị trường, rủi ro hoạt động, rủi ro tài chính)
+5. Đánh giá tính khả thi và hiệu quả của phương án kinh doanh
+6. Đưa ra kết luận sơ bộ và các kiến nghị
+
+Tóm tắt nội dung phương án theo từng phần:
+---
+{summaries}
+---
+"""
+
+def count_tokens(model, text):
+    """Số token theo API của mô hình; dùng ước lượng cục bộ nếu không gọi được API."""
+    try:
+        return model.count_tokens(text).total_tokens
+    except Exception:
+        return estimate_tokens(text)
+
+def needs_map_reduce(model, text, max_prompt_tokens=DEFAULT_MAX_PROMPT_TOKENS):
+    """True nếu văn bản quá lớn để gửi trong một prompt."""
+    # Văn bản rõ ràng nhỏ thì không cần tốn một lần gọi API để đếm token
+    if estimate_tokens(text) < max_prompt_tokens // 2:
+        return False
+    return count_tokens(model, text) > max_prompt_tokens
+
+def is_heading(line, major_only=False):
+    """True nếu line là dòng tiêu đề mục (major_only: chỉ tiêu đề mục lớn)."""
+    if _MAJOR_HEADING.match(line):
+        return True
+    if major_only:
+        return False
+    match = _MINOR_HEADING.match(line)
+    return match is not None and match.group(1).isupper()
+
+def split_sections(text, max_tokens=DEFAULT_SECTION_TOKENS, min_tokens=DEFAULT_MIN_SECTION_TOKENS):
+    """
+    Chia văn bản theo các dòng tiêu đề mục lớn (I., II., PHẦN...; văn bản không có mục lớn
+    thì theo mọi tiêu đề), cắt nhỏ các mục vượt quá max_tokens.
+    Mục ngắn hơn min_tokens được ghép vào mục đứng trước. Việc ghép chỉ phụ thuộc độ dài của
+    chính mục đó (không gộp dồn theo tổng kích thước), nên mỗi phần luôn bắt đầu tại một tiêu đề
+    thật và sửa một mục chỉ làm đổi nội dung (và khóa cache) của phần chứa mục đó.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    min_chars = min_tokens * CHARS_PER_TOKEN
+    lines = text.splitlines()
+    major_only = any(_MAJOR_HEADING.match(line) for line in lines)
+    headed = []
+    current = []
+    for line in lines:
+        if current and is_heading(line, major_only):
+            headed.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        headed.append("\n".join(current))
+
+    merged = []
+    for section in headed:
+        if merged and len(section.strip()) < min_chars:
+            merged[-1] += "\n" + section
+        else:
+            merged.append(section)
+
+    sections = []
+    for section in merged:
+        if len(section) > max_chars:
+            # Mục quá lớn được cắt trong phạm vi của chính nó
+            sections.extend(split_chunks(section, max_chars))
+        else:
+            sections.append(section)
+    return [s for s in sections if s.strip()]
+
+def summarize_sections(model, sections, cache, concurrency=DEFAULT_CONCURRENCY, bypass=False):
+    """Tóm tắt song song các mục (tối đa concurrency yêu cầu cùng lúc), giữ nguyên thứ tự mục."""
+    def summarize(section):
+        return cache.generate(model, SECTION_PROMPT.format(section=section), bypass=bypass, stage="tom_tat_muc")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(summarize, sections))
+
+def analyze_document(model, text, full_prompt, cache, bypass=False,
+                     max_prompt_tokens=DEFAULT_MAX_PROMPT_TOKENS, concurrency=DEFAULT_CONCURRENCY, stage="phan_tich"):
+    """
+    Sinh các mảnh văn bản của phân tích phương án.
+    Văn bản nhỏ: gửi nguyên full_prompt như trước. Văn bản lớn: map-reduce qua các bản tóm tắt mục,
+    chỉ lần gọi gộp cuối cùng được trả về dạng luồng. stage: tên công đoạn trong metrics.
+    """
+    if not needs_map_reduce(model, text, max_prompt_tokens):
+        yield from cache.generate_stream(model, full_prompt, bypass=bypass, stage=stage)
+        return
+    sections = split_sections(text)
+    summaries = summarize_sections(model, sections, cache, concurrency, bypass)
+    joined = "\n\n".join(f"Phần {i}:\n{summary}" for i, summary in enumerate(summaries, 1))
+    yield from cache.generate_stream(model, REDUCE_PROMPT.format(summaries=joined), bypass=bypass, stage=f"{stage}.tong_hop")
@@ -0,0 +1,217 @@
+import json
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+import numpy as np
+try:
+    import resource
+except ImportError:  # Windows: không có getrusage, bỏ qua số liệu bộ nhớ
+    resource = None
+# ======================================================================================
+# ĐO THỜI GIAN VÀ TÀI NGUYÊN THEO TỪNG CÔNG ĐOẠN
+# Mỗi công đoạn (đọc .docx, trích xuất, lịch trả nợ, gọi Gemini, xuất báo cáo/Excel...)
+# được bọc bằng bộ đếm thời gian: lưu các mẫu gần nhất để tính p50/p95, tổng số lần và
+# tổng thời gian từ khi khởi động, cùng mức bộ nhớ đỉnh của tiến trình (RSS) sau công
+# đoạn. Lời gọi Gemini ghi thêm số token prompt/phản hồi. Số liệu dùng chung cho cả
+# tiến trình (mọi phiên Streamlit) và xuất được dạng JSON lines hoặc Prometheus.
+# ======================================================================================
+DEFAULT_WINDOW = 2048
+QUANTILES = (0.5, 0.95)
+PROMETHEUS_PREFIX = "tham_dinh"
+
+def peak_rss_bytes():
+    """Bộ nhớ đỉnh (RSS) của tiến trình từ khi khởi động, 0 nếu hệ điều hành không hỗ trợ."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class _Timer(ContextDecorator):
+    """Bộ đếm thời gian cho một công đoạn, dùng được dạng `with` hoặc decorator."""
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+        self._starts = threading.local()
+
+    def __enter__(self):
+        # Ngăn xếp theo luồng: cùng một decorator có thể được gọi lồng nhau hoặc từ nhiều luồng
+        stack = self._starts.__dict__.setdefault("stack", [])
+        stack.append((time.perf_counter(), peak_rss_bytes()))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        start, rss_before = self._starts.stack.pop()
+        self.registry.observe(self.stage, time.perf_counter() - start, rss_before, error=exc_type is not None)
+        return False
+
+class Metrics:
+    """Sổ ghi số liệu công đoạn và bộ đếm, an toàn khi dùng từ nhiều luồng."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # stage -> deque các mẫu (thời điểm, giây, RSS đỉnh sau công đoạn, mức tăng RSS đỉnh, lỗi)
+            self._samples = {}
+            # stage -> [số lần, tổng giây, số lỗi] từ lần reset gần nhất
+            self._totals = {}
+            # (tên, nhãn đã sắp xếp) -> giá trị
+            self._counters = {}
+            self.started = time.time()
+
+    def timer(self, stage):
+        """Context manager / decorator đo thời gian của công đoạn stage."""
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds, rss_before=None, error=False):
+        """Ghi một mẫu thời gian của công đoạn (rss_before: RSS đỉnh trước công đoạn, nếu có)."""
+        rss = peak_rss_bytes()
+        growth = rss - rss_before if rss_before is not None else 0
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+                self._totals[stage] = [0, 0.0, 0]
+            samples.append((time.time(), seconds, rss, growth, error))
+            totals = self._totals[stage]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += bool(error)
+
+    def incr(self, name, value=1, **labels):
+        """Cộng value vào bộ đếm name (kèm nhãn, ví dụ stage='gemini.phan_tich')."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def summary(self):
+        """
+        Bảng tổng hợp theo công đoạn: số lần, số lỗi, p50/p95/lớn nhất (ms) trên các mẫu
+        gần nhất và bộ nhớ đỉnh cao nhất ghi nhận được (MB).
+        """
+        with self._lock:
+            snapshot = {stage: (list(samples), list(self._totals[stage])) for stage, samples in self._samples.items()}
+        rows = []
+        for stage, (samples, (count, total, errors)) in sorted(snapshot.items()):
+            ms = np.array([s[1] for s in samples]) * 1000
+            p50, p95 = np.quantile(ms, QUANTILES)
+            rows.append({
+                "stage": stage, "count": count, "errors": errors,
+                "p50_ms": float(p50), "p95_ms": float(p95), "max_ms": float(ms.max()),
+                "mean_ms": total / count * 1000, "total_s": total,
+                "peak_rss_mb": max(s[2] for s in samples) / 2**20,
+                "rss_growth_mb": max(s[3] for s in samples) / 2**20,
+            })
+        return rows
+
+    def counters(self):
+        """Danh sách (tên, dict nhãn, giá trị) của các bộ đếm."""
+        with self._lock:
+            return [(name, dict(labels), value) for (name, labels), value in sorted(self._counters.items())]
+
+    def to_jsonl(self):
+        """Các mẫu gần nhất (theo thời gian) và giá trị bộ đếm, mỗi dòng một đối tượng JSON."""
+        with self._lock:
+            samples = [(stage, s) for stage, items in self._samples.items() for s in items]
+        lines = [
+            json.dumps({"ts": ts, "stage": stage, "ms": round(seconds * 1000, 3), "peak_rss_bytes": rss,
+                        "rss_growth_bytes": growth, "error": error}, ensure_ascii=False)
+            for stage, (ts, seconds, rss, growth, error) in sorted(samples, key=lambda item: item[1][0])
+        ]
+        now = time.time()
+        lines += [json.dumps({"ts": now, "counter": name, "labels": labels, "value": value}, ensure_ascii=False)
+                  for name, labels, value in self.counters()]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """Số liệu dạng văn bản Prometheus: summary thời gian theo công đoạn, các bộ đếm và RSS đỉnh."""
+        def label_text(labels):
+            def escape(value):
+                return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}" if labels else ""
+
+        name = f"{prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Thời gian xử lý theo công đoạn (phân vị trên {self.window} mẫu gần nhất).",
+                 f"# TYPE {name} summary"]
+        rows = self.summary()
+        for row in rows:
+            stage = row["stage"]
+            for q, key in zip(QUANTILES, ("p50_ms", "p95_ms")):
+                lines.append(f"{name}{label_text({'stage': stage, 'quantile': q})} {row[key] / 1000:.6f}")
+            lines.append(f"{name}_sum{label_text({'stage': stage})} {row['total_s']:.6f}")
+            lines.append(f"{name}_count{label_text({'stage': stage})} {row['count']}")
+        errors_name = f"{prefix}_stage_errors_total"
+        lines += [f"# TYPE {errors_name} counter"]
+        lines += [f"{errors_name}{label_text({'stage': row['stage']})} {row['errors']}" for row in rows]
+        declared = set()
+        for counter, labels, value in self.counters():
+            metric = f"{prefix}_{counter}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{label_text(labels)} {value}")
+        rss_name = f"{prefix}_process_peak_rss_bytes"
+        lines += [f"# TYPE {rss_name} gauge", f"{rss_name} {peak_rss_bytes()}"]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Ghi số liệu ra file: .prom/.txt dạng Prometheus, còn lại dạng JSON lines."""
+        text = self.to_prometheus() if path.lower().endswith((".prom", ".txt")) else self.to_jsonl()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+# Sổ ghi dùng chung cho cả tiến trình
+REGISTRY = Metrics()
+
+def timed(stage):
+    """Đo công đoạn stage trên sổ ghi chung (dạng `with timed(...)` hoặc `@timed(...)`)."""
+    return REGISTRY.timer(stage)
+
+def record_usage(stage, response):
+    """Cộng số token prompt/phản hồi từ usage_metadata của phản hồi Gemini (nếu có)."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    REGISTRY.incr("gemini_prompt_tokens", getattr(usage, "prompt_token_count", 0) or 0, stage=stage)
+    REGISTRY.incr("gemini_response_tokens", getattr(usage, "candidates_token_count", 0) or 0, stage=stage)
+
+def gemini_generate(stage, model, *args, **kwargs):
+    """model.generate_content(...) có đo độ trễ, đếm số lời gọi và số token."""
+    REGISTRY.incr("gemini_calls", stage=stage)
+    with timed(f"gemini.{stage}"):
+        response = model.generate_content(*args, **kwargs)
+    record_usage(stage, response)
+    return response
+
+def gemini_stream(stage, model, *args, **kwargs):
+    """
+    model.generate_content(..., stream=True) có đo độ trễ: sinh lần lượt các chunk phản hồi.
+    Ghi hai công đoạn: thời gian tới chunk đầu tiên và thời gian tới khi nhận hết phản hồi.
+    Số token lấy từ chunk cuối (Gemini gửi usage_metadata tích lũy trên từng chunk).
+    """
+    REGISTRY.incr("gemini_calls", stage=stage)
+    start = time.perf_counter()
+    last = None
+    error = True
+    try:
+        for chunk in model.generate_content(*args, stream=True, **kwargs):
+            if last is None:
+                REGISTRY.observe(f"gemini.{stage}.first_chunk", time.perf_counter() - start)
+            last = chunk
+            yield chunk
+        error = False
+    except GeneratorExit:
+        # Nơi gọi dừng đọc giữa chừng (ví dụ người dùng rời trang): không tính là lỗi
+        error = False
+        raise
+    finally:
+        REGISTRY.observe(f"gemini.{stage}", time.perf_counter() - start, error=error)
+        if last is not None:
+            record_usage(stage, last)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+import core
+# ======================================================================================
+# BỘ NHỚ ĐỆM KẾT QUẢ TRÍCH XUẤT FILE .DOCX
+# Khóa là SHA-256 của nội dung file + phiên bản bộ trích xuất + mẫu phương án, nên
+# file giống hệt nhau (kể cả ở phiên làm việc khác) không phải phân tích lại, còn
+# file đã thay đổi luôn được phân tích mới. Gồm tầng LRU trong bộ nhớ (dùng chung
+# giữa các phiên) và tầng đĩa tùy chọn.
+# ======================================================================================
+def content_hash(data):
+    """SHA-256 (dạng hex) của nội dung file."""
+    return hashlib.sha256(data).hexdigest()
+
+class ParseCache:
+    """Cache (văn bản, thông tin trích xuất) theo nội dung file .docx."""
+
+    def __init__(self, max_entries=256, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data, template=core.DEFAULT_TEMPLATE):
+        return f"{content_hash(data)}-v{core.EXTRACTOR_VERSION}-{template}"
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), encoding="utf-8") as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = None
+            if stored is not None:
+                entry = (stored["text"], stored["info"])
+                self._remember(key, entry)
+                with self._lock:
+                    self.disk_hits += 1
+                return entry
+        return None
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, key, entry):
+        self._remember(key, entry)
+        if self.disk_dir:
+            text, info = entry
+            # Ghi ra file tạm rồi đổi tên để không bao giờ để lại file cache dở dang
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"text": text, "info": info}, f, ensure_ascii=False)
+                os.replace(tmp_path, self._disk_path(key))
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def extract_and_parse(self, data, template=core.DEFAULT_TEMPLATE, key=None):
+        """
+        Trả về (key, văn bản, thông tin) cho nội dung file .docx, chỉ đọc và
+        trích xuất khi chưa có trong cache. key có thể truyền vào nếu đã tính sẵn.
+        """
+        key = key or self.make_key(data, template)
+        entry = self.get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            entry = core.extract_and_parse_docx(BytesIO(data), template)
+            self.put(key, entry)
+        text, info = entry
+        # Trả về bản sao để nơi gọi có thể sửa thông tin mà không ảnh hưởng cache
+        return key, text, dict(info)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._memory), "hits": self.hits,
+                    "disk_hits": self.disk_hits, "misses": self.misses}
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from schedule import GOC_DEU, METHODS, compute_schedules
+# ======================================================================================
+# DỰ BÁO DÒNG TIỀN DANH MỤC CHO VAY
+# Danh mục được lưu dạng cột (mỗi thuộc tính một mảng NumPy gọn nhẹ) thay vì mỗi
+# khoản vay một DataFrame. Kế hoạch trả nợ được tính theo từng khối khoản vay vừa
+# với ngân sách bộ nhớ rồi cộng dồn ngay vào lưới (nhóm x tháng).
+# ======================================================================================
+# Các cột đầu vào của danh mục và giá trị mặc định khi file không có cột đó
+PORTFOLIO_COLUMNS = {
+    "so_tien_vay": None,
+    "lai_suat": None,
+    "thoi_gian_vay": None,
+    "phuong_thuc_tra_no": GOC_DEU,
+    "an_han_goc": 0,
+    "chu_ky_tra_goc": 3,
+    "san_pham": "Chưa phân loại",
+    "can_bo": "Chưa rõ",
+    "ngay_giai_ngan": None,
+}
+
+# Chiều tổng hợp được hỗ trợ (ngoài chiều tháng)
+GROUP_DIMENSIONS = {"san_pham": "Sản phẩm", "can_bo": "Cán bộ tín dụng"}
+
+# Số mảng (khoản vay x kỳ) 8 byte cấp phát đồng thời khi tính một khối (kế hoạch trả nợ, chỉ số ô), dùng để ước lượng bộ nhớ
+_ARRAYS_PER_SCHEDULE = 16
+
+def _month_index(dates):
+    """Đổi ngày sang số tháng tuyệt đối (năm * 12 + tháng - 1)."""
+    dates = pd.to_datetime(dates)
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int32)
+
+class Portfolio:
+    """Danh mục khoản vay lưu theo cột."""
+
+    def __init__(self, principal, rate, term, method, grace, season, start_month, categories):
+        self.principal = principal        # float64, VNĐ
+        self.rate = rate                  # float32, %/năm
+        self.term = term                  # int16, tháng
+        self.method = method              # int8, chỉ số trong danh sách phương thức
+        self.grace = grace                # int16, tháng
+        self.season = season              # int16, tháng
+        self.start_month = start_month    # int32, tháng giải ngân (năm * 12 + tháng - 1)
+        # {chiều: (mã int32 của từng khoản vay, mảng nhãn)}
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.principal)
+
+    @property
+    def nbytes(self):
+        arrays = [self.principal, self.rate, self.term, self.method, self.grace, self.season, self.start_month]
+        arrays += [codes for codes, _ in self.categories.values()]
+        return sum(a.nbytes for a in arrays)
+
+    @classmethod
+    def from_frame(cls, df, default_start=None):
+        """Tạo danh mục từ DataFrame (ví dụ bảng kết quả của batch.py)."""
+        df = df.copy()
+        for col, default in PORTFOLIO_COLUMNS.items():
+            if col not in df.columns:
+                if default is None and col != "ngay_giai_ngan":
+                    raise ValueError(f"Thiếu cột bắt buộc trong danh mục: {col}")
+                df[col] = default
+        df["ngay_giai_ngan"] = df["ngay_giai_ngan"].fillna(default_start or pd.Timestamp.today().normalize())
+        df = df[(df["so_tien_vay"] > 0) & (df["thoi_gian_vay"] > 0)]
+
+        method_keys = list(METHODS.keys())
+        unknown = set(df["phuong_thuc_tra_no"]) - set(method_keys)
+        if unknown:
+            raise ValueError(f"Phương thức trả nợ không hợp lệ: {', '.join(map(str, unknown))}")
+        categories = {}
+        for dim in GROUP_DIMENSIONS:
+            codes, labels = pd.factorize(df[dim].astype(str))
+            categories[dim] = (codes.astype(np.int32), np.asarray(labels))
+        return cls(
+            principal=df["so_tien_vay"].to_numpy(dtype=np.float64),
+            rate=df["lai_suat"].to_numpy(dtype=np.float32),
+            term=df["thoi_gian_vay"].to_numpy(dtype=np.int16),
+            method=df["phuong_thuc_tra_no"].map(method_keys.index).to_numpy(dtype=np.int8),
+            grace=df["an_han_goc"].fillna(0).to_numpy(dtype=np.int16),
+            season=df["chu_ky_tra_goc"].fillna(3).to_numpy(dtype=np.int16),
+            start_month=_month_index(df["ngay_giai_ngan"]),
+            categories=categories,
+        )
+
+def project_cash_flows(portfolio, group_by=(), memory_budget_mb=256):
+    """
+    Dự báo dòng thu gốc và lãi hàng tháng của cả danh mục, tổng hợp theo tháng
+    và các chiều trong group_by (tập con của GROUP_DIMENSIONS).
+    Bộ nhớ tạm cho kế hoạch trả nợ không vượt quá memory_budget_mb.
+    """
+    group_by = list(group_by)
+    n_loans = len(portfolio)
+    columns = ["thang"] + group_by + ["goc", "lai", "tong"]
+    if n_loans == 0:
+        return pd.DataFrame(columns=columns)
+
+    # Mã nhóm kết hợp của các chiều tổng hợp
+    sizes = [len(portfolio.categories[dim][1]) for dim in group_by]
+    if group_by:
+        group_code = np.ravel_multi_index([portfolio.categories[dim][0] for dim in group_by], sizes)
+    else:
+        group_code = np.zeros(n_loans, dtype=np.int64)
+    n_groups = int(np.prod(sizes)) if sizes else 1
+
+    max_term = int(portfolio.term.max())
+    first_month = int(portfolio.start_month.min())
+    n_months = int(portfolio.start_month.max()) - first_month + max_term + 1
+    principal_grid = np.zeros(n_groups * n_months)
+    interest_grid = np.zeros(n_groups * n_months)
+
+    method_keys = np.asarray(list(METHODS.keys()))
+    rows_per_chunk = max(1, int(memory_budget_mb * 2**20 // (max_term * 8 * _ARRAYS_PER_SCHEDULE)))
+    periods = np.arange(1, max_term + 1, dtype=np.int64)
+    for start in range(0, n_loans, rows_per_chunk):
+        sl = slice(start, start + rows_per_chunk)
+        schedules = compute_schedules(
+            portfolio.principal[sl], portfolio.rate[sl], portfolio.term[sl],
+            method_keys[portfolio.method[sl]], portfolio.grace[sl], portfolio.season[sl],
+        )
+        width = schedules.principal.shape[1]
+        # Ô (nhóm, tháng) mà từng kỳ trả nợ rơi vào; kỳ k trả vào tháng giải ngân + k
+        month_offset = (portfolio.start_month[sl].astype(np.int64) - first_month)[:, None] + periods[None, :width]
+        cell = (group_code[sl][:, None] * n_months + month_offset).ravel()
+        principal_grid += np.bincount(cell, weights=schedules.principal.ravel(), minlength=principal_grid.size)
+        interest_grid += np.bincount(cell, weights=schedules.interest.ravel(), minlength=interest_grid.size)
+
+    # Chỉ giữ lại các ô có phát sinh dòng tiền
+    nonzero = np.flatnonzero((principal_grid != 0) | (interest_grid != 0))
+    group_idx, month_idx = np.divmod(nonzero, n_months)
+    months = first_month + month_idx
+    result = {"thang": pd.PeriodIndex.from_fields(year=months // 12, month=months % 12 + 1, freq="M")}
+    if group_by:
+        for dim, codes in zip(group_by, np.unravel_index(group_idx, sizes)):
+            result[dim] = portfolio.categories[dim][1][codes]
+    result["goc"] = principal_grid[nonzero]
+    result["lai"] = interest_grid[nonzero]
+    result["tong"] = result["goc"] + result["lai"]
+    return pd.DataFrame(result, columns=columns).sort_values(["thang"] + group_by, ignore_index=True)
@@ -1,16 +1,38 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-from docx import Document
-import re
 import numpy_financial as npf
-import google.generativeai as genai
 from io import BytesIO
-from datetime import datetime
+import multiprocessing
+import os
+import time
+import uuid
+import core
+import downloads
+from parse_cache import ParseCache, content_hash
+import llm_cache
+from llm_cache import LLMCache
+from ai_stream import stream_concurrently
+from retrieval import BM25Index
+from chat_session import ChatSession
+from map_reduce import analyze_document
+from gemini_client import create_client, describe_error
+from core import format_currency, format_currency_array, parse_info_from_text, calculate_repayment_schedule
+from schedule import METHODS, GOC_DEU, THEO_MUA_VU
+from portfolio import GROUP_DIMENSIONS, Portfolio, project_cash_flows
+from report import ReportTemplate, build_context, build_default_template, create_report_pool, render_reports_zip
+from scenario import AXES as SCENARIO_AXES, METRICS as SCENARIO_METRICS, evaluate_grid, grid_slice
+from excel_export import appraisal_inputs, generate_excel_download, portfolio_schedule_sheets, write_workbook
+from charts import FigureCache, balance_figure, cash_flow_figure, data_hash, describe_stats
+from metrics import REGISTRY
+from session_store import SessionStore, estimate_size
 # ======================================================================================
 # CẤU HÌNH TRANG VÀ KHỞI TẠO
 # ======================================================================================
+# Thời điểm bắt đầu lượt chạy script (ghi vào số liệu vận hành ở cuối script)
+run_started = time.perf_counter()
 st.set_page_config(
     page_title="Hệ thống Thẩm định Phương án Kinh doanh",
     page_icon="🏦",
@@ -21,145 +43,226 @@ st.markdown("---")
 # Khởi tạo session state để lưu trữ dữ liệu giữa các lần re-run
 if 'data_extracted' not in st.session_state:
     st.session_state.data_extracted = False
-if 'docx_text' not in st.session_state:
-    st.session_state.docx_text = ""
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+# Mã phiên: khóa các mục lớn của phiên trong kho dùng chung (xem get_session_store)
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 # ======================================================================================
 # CÁC HÀM HỖ TRỢ (HELPERS)
 # ======================================================================================
-def format_currency(value, decimal_places=0):
-    """Định dạng số thành chuỗi tiền tệ với dấu chấm phân cách hàng nghìn và dấu phẩy thập phân."""
-    if value is None or not isinstance(value, (int, float)):
-        return "0"
-    # Format với dấu phẩy phân cách nghìn (Python mặc định)
-    formatted = f"{value:,.{decimal_places}f}"
-    # Đổi dấu: phẩy (nghìn) -> chấm, chấm (thập phân) -> phẩy
-    formatted = formatted.replace(",", "TEMP").replace(".", ",").replace("TEMP", ".")
-    return formatted
-
-def extract_text_from_docx(docx_file):
-    """Trích xuất toàn bộ văn bản từ file .docx."""
+@st.cache_resource
+def get_parse_cache():
+    """Cache kết quả trích xuất dùng chung cho mọi phiên (bật tầng đĩa bằng biến môi trường PARSE_CACHE_DIR)."""
+    return ParseCache(disk_dir=os.environ.get("PARSE_CACHE_DIR"))
+@st.cache_resource
+def get_session_store():
+    """
+    Kho dùng chung cho các mục lớn của mọi phiên (văn bản phương án, phân tích AI, lịch sử
+    trò chuyện), cấu hình bằng biến môi trường SESSION_BUDGET_MB (ngân sách bộ nhớ mỗi phiên),
+    SESSION_MEMORY_MB (tổng bộ nhớ của kho), SESSION_IDLE_MINUTES và SESSION_SPILL_DIR (thư mục
+    gốc; mỗi tiến trình ghi vào một thư mục con riêng).
+    """
+    return SessionStore(
+        session_budget_mb=float(os.environ.get("SESSION_BUDGET_MB", 16)),
+        memory_budget_mb=float(os.environ.get("SESSION_MEMORY_MB", 256)),
+        idle_seconds=float(os.environ.get("SESSION_IDLE_MINUTES", 120)) * 60,
+        **({"spill_dir": os.environ["SESSION_SPILL_DIR"]} if os.environ.get("SESSION_SPILL_DIR") else {}),
+    )
+@st.cache_resource
+def get_llm_cache():
+    """Cache phản hồi Gemini dùng chung cho mọi phiên (đường dẫn đổi bằng biến môi trường LLM_CACHE_PATH)."""
+    return LLMCache(os.environ.get("LLM_CACHE_PATH", llm_cache.DEFAULT_PATH))
+@st.cache_resource(show_spinner=False)
+def get_gemini_client(api_key, model_name):
+    """
+    Client Gemini dùng chung cho mọi phiên và mọi tab (giới hạn đồng thời/tốc độ theo API key,
+    tự thử lại lỗi tạm thời, gộp các yêu cầu giống hệt đang chờ).
+    """
+    return create_client(api_key, model_name)
+@st.cache_resource(max_entries=64, show_spinner=False)
+def get_retrieval_index(doc_key, _docx_text):
+    """Chỉ mục BM25 của văn bản phương án, lập một lần cho mỗi nội dung file (khóa doc_key)."""
+    return BM25Index.from_text(_docx_text)
+def extract_and_parse_docx(file_bytes, file_key):
+    """Đọc file .docx và trích xuất thông tin (qua cache); trả về (văn bản, dict thông tin)."""
     try:
-        doc = Document(docx_file)
-        full_text = [para.text for para in doc.paragraphs]
-        return "\n".join(full_text)
+        _, text, info = get_parse_cache().extract_and_parse(file_bytes, key=file_key)
+        return text, info
     except Exception as e:
         st.error(f"Lỗi khi đọc file .docx: {e}")
-        return ""
-def parse_info_from_text(text):
+        return "", parse_info_from_text("")
+@st.cache_resource
+def get_report_template():
+    """Mẫu báo cáo đã phân tích sẵn (dùng mẫu riêng bằng biến môi trường REPORT_TEMPLATE_PATH)."""
+    path = os.environ.get("REPORT_TEMPLATE_PATH")
+    return ReportTemplate.from_file(path) if path else ReportTemplate(build_default_template())
+@st.cache_resource
+def get_report_pool():
     """
-    Phân tích văn bản để trích xuất thông tin ban đầu (best-effort).
-    Hàm này sử dụng regex đơn giản và giả định cấu trúc file.
+    Nhóm tiến trình render báo cáo hàng loạt dùng chung cho mọi phiên (REPORT_WORKERS, mặc định
+    số nhân CPU; 0: render ngay trong tiến trình Streamlit). spawn thay vì fork: máy chủ đã có nhiều luồng.
     """
-    info = {}
-   
-    # Hàm tìm kiếm an toàn
-    def safe_search(pattern, text, group=1, default=None, is_numeric=False):
-        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-        if match:
-            result = match.group(group).strip()
-            if is_numeric:
-                try:
-                    # Loại bỏ ký tự không phải số (giữ lại dấu phẩy/chấm)
-                    cleaned_result = re.sub(r'[^\d,.]', '', result)
-                    # Chuẩn hóa về định dạng số của Python
-                    cleaned_result = cleaned_result.replace('.', '').replace(',', '.')
-                    return float(cleaned_result)
-                except (ValueError, IndexError):
-                    return default
-            return result
-        return default
-    # Thông tin khách hàng (không có trong file, giữ mặc định)
-    info['ho_ten'] = safe_search(r"Họ và tên:\s*(.*?)\s*\.", text) or "Chưa rõ"
-    info['cccd'] = safe_search(r"CCCD số:\s*(\d+)", text) or ""
-    info['dia_chi'] = safe_search(r"Nơi cư trú:\s*(.*?)(?:,|$|\n)", text) or "Chưa rõ"
-    info['sdt'] = safe_search(r"Số điện thoại:\s*(\d+)", text) or ""
-    # Thông tin phương án vay
-    info['muc_dich_vay'] = safe_search(r"Mục đích vay:\s*(.*?)\n", text) or "Kinh doanh vật liệu xây dựng"
-    info['tong_nhu_cau_von'] = safe_search(r"- Chi phí kinh doanh:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
-    info['von_doi_ung'] = safe_search(r"Vốn đối ứng.*?đồng,([\d.,]+)", text, is_numeric=True, default=0)  # Không có trong file, giữ default
-    info['so_tien_vay'] = safe_search(r"Chênh lệch thu chi:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)  # Sử dụng chênh lệch làm proxy nếu cần
-    info['lai_suat'] = safe_search(r"Lãi suất đề nghị:\s*([\d.,]+)%/năm", text, is_numeric=True, default=5.0)
-    info['thoi_gian_vay'] = safe_search(r"Thời hạn cho vay:\s*(\d+)\s*tháng", text, is_numeric=True, default=3)
-    # Thông tin tài sản đảm bảo (không có chi tiết cụ thể)
-    info['tsdb_mo_ta'] = safe_search(r"Tài sản bảo đảm:\s*(.*?)(?=III\. Thông tin)", text) or "Chưa có mô tả"
-    info['tsdb_gia_tri'] = safe_search(r"Tổng tài sản đảm bảo:\s*([\d.,]+)", text, is_numeric=True, default=0)
-    # Trích xuất thêm thông tin cụ thể từ file
-    info['doanh_thu'] = safe_search(r"\+Doanh thu của phương án:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
-    info['chi_phi'] = safe_search(r"\+  Chi phí kinh doanh:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
-    info['chenh_lech_thu_chi'] = safe_search(r"\+  Chênh lệch thu chi:\s*([\d.,]+)\s*đồng", text, is_numeric=True, default=0)
-    info['nguon_tra_no'] = safe_search(r"- Từ nguồn thu của phương án kinh doanh:\s*([\d.,]+)đồng", text, is_numeric=True, default=0)
-    return info
-def calculate_repayment_schedule(principal, annual_rate, term_months):
-    """Tạo bảng kế hoạch trả nợ chi tiết."""
-    if not all([principal > 0, annual_rate > 0, term_months > 0]):
-        return pd.DataFrame()
-    monthly_rate = annual_rate / 12 / 100
-   
-    # Tính tiền gốc phải trả hàng tháng
-    principal_payment = principal / term_months
-   
-    schedule = []
-    remaining_balance = principal
-    for i in range(1, term_months + 1):
-        interest_payment = remaining_balance * monthly_rate
-        total_payment = principal_payment + interest_payment
-       
-        schedule.append({
-            "Kỳ trả nợ": i,
-            "Dư nợ đầu kỳ": remaining_balance,
-            "Gốc trả trong kỳ": principal_payment,
-            "Lãi trả trong kỳ": interest_payment,
-            "Tổng gốc và lãi": total_payment,
-            "Dư nợ cuối kỳ": remaining_balance - principal_payment,
-        })
-        remaining_balance -= principal_payment
-    df = pd.DataFrame(schedule)
-    # Đảm bảo dư nợ cuối kỳ cuối cùng là 0
-    df.loc[df.index[-1], 'Dư nợ cuối kỳ'] = 0
-    return df
-def generate_excel_download(df):
-    """Tạo file Excel từ DataFrame để tải xuống."""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='LichTraNo')
-    processed_data = output.getvalue()
-    return processed_data
+    workers = int(os.environ.get("REPORT_WORKERS", os.cpu_count() or 1))
+    if workers <= 0:
+        return None
+    return create_report_pool(get_report_template(), workers, multiprocessing.get_context("spawn"))
 def generate_report_docx(customer_info, loan_info, collateral_info, ratios, ai_analysis_1, ai_analysis_2):
-    """Tạo file Báo cáo Thẩm định dưới dạng .docx."""
-    doc = Document()
-    doc.add_heading('BÁO CÁO THẨM ĐỊNH SƠ BỘ', level=1)
-    doc.add_paragraph(f"Ngày lập báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-    # Thông tin khách hàng
-    doc.add_heading('1. Thông tin khách hàng', level=2)
-    for key, value in customer_info.items():
-        doc.add_paragraph(f"{key.replace('_', ' ').title()}: {value}")
-   
-    # Thông tin khoản vay
-    doc.add_heading('2. Thông tin Phương án vay & Các chỉ số', level=2)
-    for key, value in loan_info.items():
-        val_str = format_currency(value) if isinstance(value, (int, float)) and 'lãi suất' not in key and 'thời gian' not in key else value
-        unit = " %/năm" if 'lãi suất' in key else " tháng" if 'thời gian' in key else " VNĐ" if isinstance(value, (int, float)) else ""
-        doc.add_paragraph(f"{key.replace('_', ' ').title()}: {val_str}{unit}")
-    for key, value in ratios.items():
-        doc.add_paragraph(f"{key}: {value}")
-   
-    # Tài sản đảm bảo
-    doc.add_heading('3. Thông tin tài sản đảm bảo', level=2)
-    doc.add_paragraph(f"Mô tả: {collateral_info['tsdb_mo_ta']}")
-    doc.add_paragraph(f"Tổng giá trị định giá: {format_currency(collateral_info['tsdb_gia_tri'])} VNĐ")
-    # Phân tích từ AI
-    doc.add_heading('4. Phân tích tự động bởi AI', level=2)
-    doc.add_heading('4.1. Phân tích từ dữ liệu trên ứng dụng', level=3)
-    doc.add_paragraph(ai_analysis_1 if ai_analysis_1 else "Chưa có phân tích.")
-    doc.add_heading('4.2. Phân tích từ file .docx của khách hàng', level=3)
-    doc.add_paragraph(ai_analysis_2 if ai_analysis_2 else "Chưa có phân tích.")
-    # Lưu vào buffer
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
+    """Tạo file Báo cáo Thẩm định (.docx) từ mẫu báo cáo."""
+    context = build_context({**customer_info, **loan_info, **collateral_info}, ratios, ai_analysis_1, ai_analysis_2)
+    return get_report_template().render(context)
+# Địa chỉ công khai của dịch vụ api.py phục vụ file tải xuống lớn theo từng khối (xem downloads.py).
+# Không đặt thì file được gửi qua st.download_button, vốn đọc cả file vào bộ nhớ: khi đó số file
+# của một lần xuất báo cáo hàng loạt (BULK_MAX_FILES) và cỡ file tải trực tiếp bị giới hạn.
+DOWNLOAD_BASE_URL = os.environ.get("DOWNLOAD_BASE_URL", "").rstrip("/")
+BULK_MAX_FILES = int(os.environ.get("BULK_MAX_FILES", 50))
+INLINE_DOWNLOAD_MAX_MB = float(os.environ.get("INLINE_DOWNLOAD_MAX_MB", 50))
+def offer_download(container, label, token, mime):
+    """Nút tải file đã ghi bằng downloads.new_download: liên kết tới api.py, hoặc st.download_button với file nhỏ."""
+    path = downloads.resolve(token)
+    if DOWNLOAD_BASE_URL:
+        container.link_button(label, f"{DOWNLOAD_BASE_URL}/tai-xuong/{token}", use_container_width=True)
+        return True
+    if os.path.getsize(path) > INLINE_DOWNLOAD_MAX_MB * 1024 * 1024:
+        downloads.discard(token)
+        container.error(f"File vượt quá {INLINE_DOWNLOAD_MAX_MB:g} MB, không tải trực tiếp được. "
+                        "Vui lòng liên hệ quản trị để bật dịch vụ tải xuống (DOWNLOAD_BASE_URL).")
+        return False
+    with open(path, "rb") as f:
+        data = f.read()
+    # Nội dung đã nằm trong bộ nhớ của Streamlit: bản trên đĩa không còn cần
+    downloads.discard(token)
+    container.download_button(label=label, data=data, file_name=os.path.basename(path), mime=mime,
+                              use_container_width=True)
+    return True
+def generate_reports_zip(uploaded_files):
+    """
+    Thẩm định từng file phương án tải lên và gói các báo cáo vào một file .zip trong thư mục tải xuống.
+    Trả về (số báo cáo, mã file tải xuống, danh sách file lỗi bị bỏ qua).
+    """
+    failed = []
+    def jobs():
+        for idx, uploaded in enumerate(uploaded_files, 1):
+            try:
+                _, _, info = get_parse_cache().extract_and_parse(uploaded.getvalue())
+            except Exception as e:
+                failed.append(f"{uploaded.name}: {e}")
+                continue
+            ratios = core.calculate_ratios(info["so_tien_vay"], info["tong_nhu_cau_von"], info["von_doi_ung"], info["tsdb_gia_tri"])
+            name = os.path.splitext(uploaded.name)[0]
+            yield f"{idx:03d}_BaoCaoThamDinh_{name}.docx", build_context(info, core.format_ratios_for_report(ratios))
+    # Render trên nhóm tiến trình dùng chung, mỗi lúc chỉ vài báo cáo chờ ghi; các báo cáo được ghi
+    # dần thẳng vào file .zip trên đĩa
+    pool = get_report_pool()
+    with downloads.new_download("BaoCaoThamDinh_HangLoat.zip") as (token, path):
+        count = render_reports_zip(jobs(), path, get_report_template(), workers=0 if pool is None else None, pool=pool)
+    return count, token, failed
+@st.cache_data(show_spinner=False)
+def load_portfolio_frame(data, file_name):
+    """Đọc file danh mục khoản vay (.csv, .xlsx, .parquet) thành DataFrame."""
+    if file_name.lower().endswith(".csv"):
+        return pd.read_csv(BytesIO(data))
+    if file_name.lower().endswith(".parquet"):
+        return pd.read_parquet(BytesIO(data))
+    return pd.read_excel(BytesIO(data))
+@st.cache_data(show_spinner=False)
+def project_portfolio(portfolio_df, group_by):
+    """Dự báo dòng tiền danh mục (kết quả được cache theo dữ liệu đầu vào)."""
+    portfolio = Portfolio.from_frame(portfolio_df)
+    return len(portfolio), project_cash_flows(portfolio, group_by)
+@st.cache_resource(show_spinner=False, max_entries=8)
+def scenario_grid(rates, terms, amounts, shocks, method, grace_months, season_months,
+                  nguon_tra_no, chenh_lech_thu_chi, doanh_thu, tsdb_gia_tri):
+    """Lưới kịch bản độ nhạy (cache_resource: các mảng chỉ đọc, không sao chép mỗi lần rerun)."""
+    return evaluate_grid(
+        np.asarray(rates), np.asarray(terms), np.asarray(amounts), np.asarray(shocks), method, grace_months,
+        season_months, nguon_tra_no=nguon_tra_no, chenh_lech_thu_chi=chenh_lech_thu_chi,
+        doanh_thu=doanh_thu, tsdb_gia_tri=tsdb_gia_tri,
+    )
+@st.cache_resource
+def get_figure_cache():
+    """Cache biểu đồ đã dựng dùng chung cho mọi phiên (khóa là mã băm dữ liệu của biểu đồ)."""
+    return FigureCache()
+def portfolio_excel(portfolio_df):
+    """Ghi file Excel kế hoạch trả nợ của mọi khoản vay trong danh mục vào thư mục tải xuống; trả về mã file."""
+    with downloads.new_download("KeHoachTraNo_DanhMuc.xlsx") as (token, path):
+        write_workbook(path, portfolio_schedule_sheets(Portfolio.from_frame(portfolio_df)))
+    return token
+# --------------------------------------------------------------------------------------
+# Đồ thị phụ thuộc của bảng điều khiển:
+#   đầu vào -> chỉ số -> lịch trả nợ -> bảng hiển thị -> biểu đồ
+# Mỗi nút được cache theo đúng các đầu vào nó phụ thuộc (nút sau nhận tham số của nút
+# trước thay vì DataFrame, để khóa cache rẻ). Sửa các trường chỉ là văn bản (họ tên,
+# địa chỉ, mục đích vay...) không làm thay đổi khóa nào nên không phải tính lại lịch
+# trả nợ hay vẽ lại biểu đồ.
+# --------------------------------------------------------------------------------------
+CURRENCY_COLUMNS = ["Dư nợ đầu kỳ", "Gốc trả trong kỳ", "Lãi trả trong kỳ", "Tổng gốc và lãi", "Dư nợ cuối kỳ"]
+@st.cache_data(show_spinner=False)
+def ratios_node(so_tien_vay, tong_nhu_cau_von, von_doi_ung, tsdb_gia_tri):
+    return core.calculate_ratios(so_tien_vay, tong_nhu_cau_von, von_doi_ung, tsdb_gia_tri)
+@st.cache_data(show_spinner=False, max_entries=32)
+def schedule_node(so_tien_vay, lai_suat, thoi_gian_vay, phuong_thuc_tra_no, an_han_goc, chu_ky_tra_goc):
+    return calculate_repayment_schedule(
+        so_tien_vay, lai_suat, thoi_gian_vay, phuong_thuc_tra_no, an_han_goc, chu_ky_tra_goc
+    )
+@st.cache_data(show_spinner=False, max_entries=32)
+def schedule_display_node(*loan_terms):
+    """Bảng kế hoạch trả nợ đã định dạng tiền tệ để hiển thị."""
+    df_display = schedule_node(*loan_terms).copy()
+    for col in CURRENCY_COLUMNS:
+        df_display[col] = format_currency_array(df_display[col])
+    return df_display
+def balance_chart_node(*loan_terms):
+    """Biểu đồ dư nợ giảm dần qua các kỳ kèm FigureStats ((None, None) nếu không có lịch trả nợ)."""
+    repayment_df = schedule_node(*loan_terms)
+    if repayment_df.empty:
+        return None, None
+    # Thêm dư nợ ban đầu tại kỳ 0; lịch dài được giảm mẫu trước khi gửi xuống trình duyệt
+    return get_figure_cache().get_or_build(
+        data_hash(extra=("balance", loan_terms)),
+        lambda: balance_figure(
+            np.r_[0, repayment_df['Kỳ trả nợ'].to_numpy()],
+            np.r_[loan_terms[0], repayment_df['Dư nợ cuối kỳ'].to_numpy()],
+        ),
+    )
+@st.cache_data(show_spinner=False, max_entries=32)
+def capital_pie_node(so_tien_vay, von_doi_ung):
+    """Biểu đồ cơ cấu nguồn vốn."""
+    fig_pie = go.Figure(data=[go.Pie(
+        labels=['Vốn vay', 'Vốn đối ứng'],
+        values=[so_tien_vay, von_doi_ung],
+        hole=.3,
+        textinfo='percent+label',
+        marker_colors=px.colors.sequential.Blues_r
+    )])
+    fig_pie.update_layout(
+        title_text='Tỷ trọng Vốn vay và Vốn đối ứng',
+        legend_title_text='Nguồn vốn',
+        uniformtext_minsize=12,
+        uniformtext_mode='hide'
+    )
+    return fig_pie
+# Các trường chỉ là văn bản nằm trong fragment: sửa chúng chỉ chạy lại fragment đó,
+# không chạy lại cả trang. Giá trị vẫn được lưu vào session_state cho tab AI và báo cáo.
+@st.fragment
+def customer_info_fields():
+    col1, col2 = st.columns(2)
+    with col1:
+        st.session_state.ho_ten = st.text_input("Họ và tên", value=st.session_state.get('ho_ten', ''))
+        st.session_state.cccd = st.text_input("CCCD/CMND", value=st.session_state.get('cccd', ''))
+    with col2:
+        st.session_state.sdt = st.text_input("Số điện thoại", value=st.session_state.get('sdt', ''))
+        st.session_state.dia_chi = st.text_input("Địa chỉ", value=st.session_state.get('dia_chi', ''))
+@st.fragment
+def text_area_field(key, label):
+    st.session_state[key] = st.text_area(label, value=st.session_state.get(key, ''))
+# Các mục lớn của phiên này (văn bản phương án, phân tích AI, lịch sử trò chuyện) nằm trong
+# kho dùng chung; st.session_state chỉ giữ các trường nhỏ. Mỗi lượt chạy cũng thu hồi các
+# phiên đã không hoạt động quá lâu.
+artifacts = get_session_store().session(st.session_state.session_id)
+get_session_store().evict_idle()
+# Lịch sử trò chuyện đã bị thu hồi khỏi kho thì bỏ luôn phiên trò chuyện dựng từ nó (cùng các lượt
+# và bản tóm tắt đang giữ trong st.session_state), để hai bên luôn được thu hồi cùng nhau
+if "chat_history" not in artifacts:
+    st.session_state.pop('chat_session', None)
 # ======================================================================================
 # THANH BÊN (SIDEBAR)
 # ======================================================================================
@@ -175,18 +278,28 @@ with st.sidebar:
     st.subheader("Chức năng Xuất dữ liệu")
     export_option = st.selectbox(
         "Chọn loại báo cáo:",
-        ("--- Chọn ---", "Xuất Kế hoạch trả nợ (Excel)", "Xuất Báo cáo Thẩm định")
+        ("--- Chọn ---", "Xuất Kế hoạch trả nợ (Excel)", "Xuất Báo cáo Thẩm định", "Xuất Báo cáo hàng loạt (.zip)")
     )
+    bulk_files = []
+    if export_option == "Xuất Báo cáo hàng loạt (.zip)":
+        bulk_files = st.file_uploader(
+            "Các file phương án (.docx)",
+            type=['docx'],
+            accept_multiple_files=True,
+            key="bulk_report_files"
+        )
     execute_export = st.button("Thực hiện", use_container_width=True, disabled=(export_option == "--- Chọn ---"))
 # ======================================================================================
 # KHU VỰC CHỨC NĂNG CHÍNH (TABS)
 # ======================================================================================
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
     "📝 Nhập liệu & Trích xuất thông tin",
     "📊 Phân tích Chỉ số & Dòng tiền",
     "📈 Biểu đồ Trực quan",
     "🤖 Phân tích bởi AI",
-    "💬 Chatbot Hỗ trợ"
+    "💬 Chatbot Hỗ trợ",
+    "🏢 Dòng tiền Danh mục",
+    "🎯 Kịch bản Độ nhạy"
 ])
 # --------------------------------------------------------------------------------------
 # TAB 1: NHẬP LIỆU & TRÍCH XUẤT
@@ -200,28 +313,31 @@ with tab1:
         accept_multiple_files=False
     )
     if uploaded_file is not None:
-        # Chỉ trích xuất lại nếu file thay đổi hoặc chưa trích xuất
-        if not st.session_state.data_extracted:
+        file_bytes = uploaded_file.getvalue()
+        file_key = ParseCache.make_key(file_bytes)
+        # Chỉ trích xuất lại khi nội dung file khác với file đã trích xuất trong phiên này
+        if st.session_state.get('uploaded_file_key') != file_key:
             with st.spinner("Đang đọc và trích xuất thông tin từ file..."):
-                st.session_state.docx_text = extract_text_from_docx(uploaded_file)
-                parsed_data = parse_info_from_text(st.session_state.docx_text)
+                docx_text, parsed_data = extract_and_parse_docx(file_bytes, file_key)
+                artifacts["docx_text"] = docx_text
+                st.session_state.uploaded_file_key = file_key
+                # Lập chỉ mục truy xuất cho chatbot ngay khi tải lên
+                get_retrieval_index(file_key, docx_text)
                 # Lưu dữ liệu đã trích xuất vào session_state
                 for key, value in parsed_data.items():
                     st.session_state[key] = value
                 st.session_state.data_extracted = True
                 st.success("Trích xuất thông tin thành công! Vui lòng kiểm tra và hiệu chỉnh bên dưới.")
+        elif "docx_text" not in artifacts:
+            # Văn bản đã bị thu hồi khỏi kho (phiên không hoạt động lâu): lấy lại qua cache trích xuất,
+            # giữ nguyên các trường người dùng đã hiệu chỉnh
+            artifacts["docx_text"] = extract_and_parse_docx(file_bytes, file_key)[0]
    
     # Sử dụng expander để nhóm các trường thông tin
     with st.expander("Vùng 1 - Thông tin khách hàng", expanded=True):
-        col1, col2 = st.columns(2)
-        with col1:
-            st.session_state.ho_ten = st.text_input("Họ và tên", value=st.session_state.get('ho_ten', ''))
-            st.session_state.cccd = st.text_input("CCCD/CMND", value=st.session_state.get('cccd', ''))
-        with col2:
-            st.session_state.sdt = st.text_input("Số điện thoại", value=st.session_state.get('sdt', ''))
-            st.session_state.dia_chi = st.text_input("Địa chỉ", value=st.session_state.get('dia_chi', ''))
+        customer_info_fields()
     with st.expander("Vùng 2 - Thông tin phương án vay", expanded=True):
-        st.session_state.muc_dich_vay = st.text_area("Mục đích vay", value=st.session_state.get('muc_dich_vay', ''))
+        text_area_field('muc_dich_vay', "Mục đích vay")
         col1, col2, col3 = st.columns(3)
         with col1:
             st.session_state.tong_nhu_cau_von = st.number_input(
@@ -260,9 +376,34 @@ with tab1:
                 value=int(st.session_state.get('thoi_gian_vay', 12)),
                 step=1
             )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            phuong_thuc_keys = list(METHODS.keys())
+            st.session_state.phuong_thuc_tra_no = st.selectbox(
+                "Phương thức trả nợ",
+                phuong_thuc_keys,
+                index=phuong_thuc_keys.index(st.session_state.get('phuong_thuc_tra_no', GOC_DEU)),
+                format_func=METHODS.get
+            )
+        with col2:
+            st.session_state.an_han_goc = st.number_input(
+                "Ân hạn gốc (tháng)",
+                min_value=0,
+                value=int(st.session_state.get('an_han_goc', 0)),
+                step=1,
+                help="Số tháng đầu chỉ trả lãi, chưa trả gốc."
+            )
+        with col3:
+            st.session_state.chu_ky_tra_goc = st.number_input(
+                "Chu kỳ trả gốc theo mùa vụ (tháng)",
+                min_value=1,
+                value=int(st.session_state.get('chu_ky_tra_goc', 3)),
+                step=1,
+                disabled=(st.session_state.phuong_thuc_tra_no != THEO_MUA_VU)
+            )
            
     with st.expander("Vùng 3 - Thông tin tài sản đảm bảo", expanded=True):
-        st.session_state.tsdb_mo_ta = st.text_area("Mô tả tài sản", value=st.session_state.get('tsdb_mo_ta', ''))
+        text_area_field('tsdb_mo_ta', "Mô tả tài sản")
         st.session_state.tsdb_gia_tri = st.number_input(
             "Giá trị định giá (VNĐ)",
             min_value=0,
@@ -277,6 +418,11 @@ von_doi_ung = st.session_state.get('von_doi_ung', 0)
 tsdb_gia_tri = st.session_state.get('tsdb_gia_tri', 0)
 lai_suat = st.session_state.get('lai_suat', 0.0)
 thoi_gian_vay = st.session_state.get('thoi_gian_vay', 0)
+phuong_thuc_tra_no = st.session_state.get('phuong_thuc_tra_no', GOC_DEU)
+an_han_goc = st.session_state.get('an_han_goc', 0)
+chu_ky_tra_goc = st.session_state.get('chu_ky_tra_goc', 3)
+# Đầu vào của nút lịch trả nợ (và các nút phụ thuộc: bảng hiển thị, biểu đồ dư nợ)
+loan_terms = (so_tien_vay, lai_suat, thoi_gian_vay, phuong_thuc_tra_no, an_han_goc, chu_ky_tra_goc)
 # --------------------------------------------------------------------------------------
 # TAB 2: PHÂN TÍCH CHỈ SỐ & DÒNG TIỀN
 # --------------------------------------------------------------------------------------
@@ -287,33 +433,20 @@ with tab2:
         col1, col2, col3 = st.columns(3)
        
         # Tính toán chỉ số
-        ty_le_vay_tong_von = (so_tien_vay / tong_nhu_cau_von * 100) if tong_nhu_cau_von > 0 else 0
-        ty_le_doi_ung = (von_doi_ung / tong_nhu_cau_von * 100) if tong_nhu_cau_von > 0 else 0
-        ty_le_vay_tsdb = (so_tien_vay / tsdb_gia_tri * 100) if tsdb_gia_tri > 0 else 0
+        ratios = ratios_node(so_tien_vay, tong_nhu_cau_von, von_doi_ung, tsdb_gia_tri)
         # Lưu chỉ số để xuất báo cáo
-        ratios_for_report = {
-            "Tỷ lệ Vay/Tổng nhu cầu vốn": f"{ty_le_vay_tong_von:.2f}%",
-            "Tỷ lệ Vốn đối ứng/Tổng nhu cầu vốn": f"{ty_le_doi_ung:.2f}%",
-            "Tỷ lệ Vay/Giá trị TSĐB": f"{ty_le_vay_tsdb:.2f}%"
-        }
-        st.session_state.ratios = ratios_for_report
-        col1.metric("Tỷ lệ Vay/Tổng nhu cầu vốn", f"{ty_le_vay_tong_von:.2f}%")
-        col2.metric("Tỷ lệ Vốn đối ứng", f"{ty_le_doi_ung:.2f}%")
-        col3.metric("Tỷ lệ Vay/Giá trị TSĐB", f"{ty_le_vay_tsdb:.2f}%", help="Tỷ lệ giữa số tiền vay và tổng giá trị tài sản đảm bảo.")
+        st.session_state.ratios = core.format_ratios_for_report(ratios)
+        col1.metric("Tỷ lệ Vay/Tổng nhu cầu vốn", f"{ratios['ty_le_vay_tong_von']:.2f}%")
+        col2.metric("Tỷ lệ Vốn đối ứng", f"{ratios['ty_le_doi_ung']:.2f}%")
+        col3.metric("Tỷ lệ Vay/Giá trị TSĐB", f"{ratios['ty_le_vay_tsdb']:.2f}%", help="Tỷ lệ giữa số tiền vay và tổng giá trị tài sản đảm bảo.")
         st.markdown("---")
        
         st.subheader("Bảng kế hoạch trả nợ chi tiết")
-        repayment_df = calculate_repayment_schedule(so_tien_vay, lai_suat, thoi_gian_vay)
-       
-        # Lưu bảng để có thể xuất Excel
-        st.session_state.repayment_df = repayment_df
+        # Bảng dùng chung qua cache theo tham số khoản vay (phần xuất Excel lấy lại từ cache, không lưu vào phiên)
+        repayment_df = schedule_node(*loan_terms)
         if not repayment_df.empty:
-            # Định dạng lại các cột tiền tệ để hiển thị
-            df_display = repayment_df.copy()
-            currency_cols = ["Dư nợ đầu kỳ", "Gốc trả trong kỳ", "Lãi trả trong kỳ", "Tổng gốc và lãi", "Dư nợ cuối kỳ"]
-            for col in currency_cols:
-                df_display[col] = df_display[col].apply(format_currency)
-           
+            # Bảng đã định dạng tiền tệ (cache theo tham số khoản vay)
+            df_display = schedule_display_node(*loan_terms)
             st.dataframe(df_display, use_container_width=True, height=min(35 * (len(df_display) + 1), 600))
         else:
             st.warning("Vui lòng nhập đầy đủ thông tin khoản vay (Số tiền, Lãi suất, Thời gian) để xem kế hoạch trả nợ.")
@@ -328,43 +461,13 @@ with tab3:
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Cơ cấu Nguồn vốn")
-            labels = ['Vốn vay', 'Vốn đối ứng']
-            values = [so_tien_vay, von_doi_ung]
-            fig_pie = go.Figure(data=[go.Pie(
-                labels=labels,
-                values=values,
-                hole=.3,
-                textinfo='percent+label',
-                marker_colors=px.colors.sequential.Blues_r
-            )])
-            fig_pie.update_layout(
-                title_text='Tỷ trọng Vốn vay và Vốn đối ứng',
-                legend_title_text='Nguồn vốn',
-                uniformtext_minsize=12,
-                uniformtext_mode='hide'
-            )
-            st.plotly_chart(fig_pie, use_container_width=True)
+            st.plotly_chart(capital_pie_node(so_tien_vay, von_doi_ung), use_container_width=True)
         with col2:
             st.subheader("Biến động Dư nợ")
-            if 'repayment_df' in st.session_state and not st.session_state.repayment_df.empty:
-                df_chart = st.session_state.repayment_df
-                # Thêm dòng dư nợ ban đầu tại kỳ 0
-                initial_row = pd.DataFrame([{'Kỳ trả nợ': 0, 'Dư nợ cuối kỳ': so_tien_vay}])
-                df_chart = pd.concat([initial_row, df_chart[['Kỳ trả nợ', 'Dư nợ cuối kỳ']]], ignore_index=True)
-                fig_line = go.Figure()
-                fig_line.add_trace(go.Scatter(
-                    x=df_chart['Kỳ trả nợ'],
-                    y=df_chart['Dư nợ cuối kỳ'],
-                    mode='lines+markers',
-                    name='Dư nợ',
-                    fill='tozeroy' # Tô màu vùng dưới đường line
-                ))
-                fig_line.update_layout(
-                    title_text='Dư nợ giảm dần qua các kỳ',
-                    xaxis_title='Kỳ trả nợ (Tháng)',
-                    yaxis_title='Dư nợ còn lại (VNĐ)',
-                )
+            fig_line, chart_stats = balance_chart_node(*loan_terms)
+            if fig_line is not None:
                 st.plotly_chart(fig_line, use_container_width=True)
+                st.caption(describe_stats(chart_stats))
             else:
                  st.warning("Không có dữ liệu kế hoạch trả nợ để vẽ biểu đồ.")
     else:
@@ -379,92 +482,119 @@ with tab4:
         st.warning("Vui lòng nhập Gemini API Key ở thanh bên để sử dụng tính năng này.")
     else:
         try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash-exp') # Hoặc gemini-pro
+            model = get_gemini_client(api_key, 'gemini-2.0-flash-exp') # Hoặc gemini-pro
         except Exception as e:
             st.error(f"Lỗi khởi tạo Gemini: {e}")
             model = None
+        bypass_cache = st.checkbox("🔄 Phân tích lại (không dùng kết quả đã lưu)", help="Gửi lại yêu cầu tới Gemini kể cả khi dữ liệu không đổi.")
+        analysis_sections = {
+            "ai_analysis_1": ("1. Phân tích từ dữ liệu trên ứng dụng",
+                              "Nguồn dữ liệu: Các thông số và chỉ số tài chính đã nhập/hiệu chỉnh trên ứng dụng."),
+            "ai_analysis_2": ("2. Phân tích từ file .docx của khách hàng",
+                              "Nguồn dữ liệu: Nội dung phương án kinh doanh từ file .docx khách hàng tải lên."),
+        }
+        streamed = set()
         if st.button("🚀 Bắt đầu Phân tích", use_container_width=True, disabled=(not model or not st.session_state.data_extracted)):
            
             # Phân tích 1: Dựa trên dữ liệu đã hiệu chỉnh trên ứng dụng
-            with st.spinner("AI đang phân tích các chỉ số và dữ liệu đã hiệu chỉnh trên ứng dụng..."):
-                # Tổng hợp thông tin từ session_state thành một chuỗi
-                adjusted_data_summary = f"""
-                - Khách hàng: {st.session_state.ho_ten}, CCCD: {st.session_state.cccd}
-                - Địa chỉ: {st.session_state.dia_chi}
-                - Số điện thoại: {st.session_state.sdt}
-                - Mục đích vay: {st.session_state.muc_dich_vay}
-                - Tổng nhu cầu vốn: {format_currency(st.session_state.tong_nhu_cau_von)} VNĐ
-                - Vốn đối ứng: {format_currency(st.session_state.von_doi_ung)} VNĐ
-                - Số tiền vay: {format_currency(st.session_state.so_tien_vay)} VNĐ
-                - Lãi suất: {st.session_state.lai_suat}%/năm
-                - Thời gian vay: {st.session_state.thoi_gian_vay} tháng
-                - Mô tả TSĐB: {st.session_state.tsdb_mo_ta}
-                - Tổng giá trị TSĐB: {format_currency(st.session_state.tsdb_gia_tri)} VNĐ
-                - Tỷ lệ Vay/TSĐB: {st.session_state.get('ratios', {}).get('Tỷ lệ Vay/Giá trị TSĐB', 'N/A')}
-                - Tỷ lệ Vay/Tổng vốn: {st.session_state.get('ratios', {}).get('Tỷ lệ Vay/Tổng nhu cầu vốn', 'N/A')}
-                - Tỷ lệ Vốn đối ứng: {st.session_state.get('ratios', {}).get('Tỷ lệ Vốn đối ứng/Tổng nhu cầu vốn', 'N/A')}
-                """
-               
-                prompt1 = f"""
-                Với vai trò là một chuyên gia thẩm định tín dụng ngân hàng, hãy phân tích sâu về các chỉ số tài chính của phương án vay vốn dựa trên các thông số đã được nhập và hiệu chỉnh trên hệ thống dưới đây.
+            # Tổng hợp thông tin từ session_state thành một chuỗi
+            adjusted_data_summary = f"""
+            - Khách hàng: {st.session_state.ho_ten}, CCCD: {st.session_state.cccd}
+            - Địa chỉ: {st.session_state.dia_chi}
+            - Số điện thoại: {st.session_state.sdt}
+            - Mục đích vay: {st.session_state.muc_dich_vay}
+            - Tổng nhu cầu vốn: {format_currency(st.session_state.tong_nhu_cau_von)} VNĐ
+            - Vốn đối ứng: {format_currency(st.session_state.von_doi_ung)} VNĐ
+            - Số tiền vay: {format_currency(st.session_state.so_tien_vay)} VNĐ
+            - Lãi suất: {st.session_state.lai_suat}%/năm
+            - Thời gian vay: {st.session_state.thoi_gian_vay} tháng
+            - Phương thức trả nợ: {METHODS.get(phuong_thuc_tra_no)}, ân hạn gốc {an_han_goc} tháng
+            - Mô tả TSĐB: {st.session_state.tsdb_mo_ta}
+            - Tổng giá trị TSĐB: {format_currency(st.session_state.tsdb_gia_tri)} VNĐ
+            - Tỷ lệ Vay/TSĐB: {st.session_state.get('ratios', {}).get('Tỷ lệ Vay/Giá trị TSĐB', 'N/A')}
+            - Tỷ lệ Vay/Tổng vốn: {st.session_state.get('ratios', {}).get('Tỷ lệ Vay/Tổng nhu cầu vốn', 'N/A')}
+            - Tỷ lệ Vốn đối ứng: {st.session_state.get('ratios', {}).get('Tỷ lệ Vốn đối ứng/Tổng nhu cầu vốn', 'N/A')}
+            """
+           
+            prompt1 = f"""
+            Với vai trò là một chuyên gia thẩm định tín dụng ngân hàng, hãy phân tích sâu về các chỉ số tài chính của phương án vay vốn dựa trên các thông số đã được nhập và hiệu chỉnh trên hệ thống dưới đây.
+            
+            Hãy tập trung vào:
+            1. Đánh giá tổng quan về thông tin khách hàng và mục đích vay vốn
+            2. Phân tích tính hợp lý của cơ cấu nguồn vốn (tỷ lệ vay/vốn đối ứng/tổng nhu cầu)
+            3. Đánh giá khả năng trả nợ dựa trên số tiền vay, lãi suất và thời hạn
+            4. Phân tích mức độ an toàn của khoản vay dựa trên tỷ lệ cho vay so với giá trị tài sản đảm bảo (LTV)
+            5. Đưa ra các khuyến nghị cụ thể để tăng tính khả thi cho phương án
+            6. Đánh giá rủi ro tín dụng và các điểm cần lưu ý
+            
+            Dữ liệu đã nhập trên ứng dụng:
+            ---
+            {adjusted_data_summary}
+            ---
+            """
+            prompts = {"ai_analysis_1": prompt1}
+           
+            # Phân tích 2: Dựa trên file .docx gốc
+            docx_text = artifacts.get("docx_text", "")
+            if docx_text:
+                prompt2 = f"""
+                Với vai trò là một chuyên gia thẩm định tín dụng ngân hàng, hãy phân tích toàn bộ nội dung của phương án kinh doanh được khách hàng cung cấp trong file .docx dưới đây.
                 
-                Hãy tập trung vào:
-                1. Đánh giá tổng quan về thông tin khách hàng và mục đích vay vốn
-                2. Phân tích tính hợp lý của cơ cấu nguồn vốn (tỷ lệ vay/vốn đối ứng/tổng nhu cầu)
-                3. Đánh giá khả năng trả nợ dựa trên số tiền vay, lãi suất và thời hạn
-                4. Phân tích mức độ an toàn của khoản vay dựa trên tỷ lệ cho vay so với giá trị tài sản đảm bảo (LTV)
-                5. Đưa ra các khuyến nghị cụ thể để tăng tính khả thi cho phương án
-                6. Đánh giá rủi ro tín dụng và các điểm cần lưu ý
+                Cần tập trung vào các điểm sau:
+                1. Tóm tắt tổng quan về phương án kinh doanh
+                2. Phân tích các điểm mạnh của phương án (ví dụ: kinh nghiệm, thị trường, sản phẩm/dịch vụ, khả năng cạnh tranh)
+                3. Phân tích các điểm yếu hoặc các điểm cần làm rõ thêm
+                4. Nhận diện các rủi ro tiềm ẩn (rủi ro thị trường, rủi ro hoạt động, rủi ro tài chính)
+                5. Đánh giá tính khả thi và hiệu quả của phương án kinh doanh
+                6. Đưa ra kết luận sơ bộ và các kiến nghị
                 
-                Dữ liệu đã nhập trên ứng dụng:
+                Nội dung phương án kinh doanh từ file .docx:
                 ---
-                {adjusted_data_summary}
+                {docx_text}
                 ---
                 """
-                try:
-                    response1 = model.generate_content(prompt1)
-                    st.session_state.ai_analysis_1 = response1.text
-                except Exception as e:
-                    st.session_state.ai_analysis_1 = f"Lỗi khi gọi API Gemini: {e}"
-           
-            # Phân tích 2: Dựa trên file .docx gốc
-            with st.spinner("AI đang phân tích nội dung file .docx của khách hàng..."):
-                if st.session_state.docx_text:
-                    prompt2 = f"""
-                    Với vai trò là một chuyên gia thẩm định tín dụng ngân hàng, hãy phân tích toàn bộ nội dung của phương án kinh doanh được khách hàng cung cấp trong file .docx dưới đây.
-                    
-                    Cần tập trung vào các điểm sau:
-                    1. Tóm tắt tổng quan về phương án kinh doanh
-                    2. Phân tích các điểm mạnh của phương án (ví dụ: kinh nghiệm, thị trường, sản phẩm/dịch vụ, khả năng cạnh tranh)
-                    3. Phân tích các điểm yếu hoặc các điểm cần làm rõ thêm
-                    4. Nhận diện các rủi ro tiềm ẩn (rủi ro thị trường, rủi ro hoạt động, rủi ro tài chính)
-                    5. Đánh giá tính khả thi và hiệu quả của phương án kinh doanh
-                    6. Đưa ra kết luận sơ bộ và các kiến nghị
-                    
-                    Nội dung phương án kinh doanh từ file .docx:
-                    ---
-                    {st.session_state.docx_text}
-                    ---
-                    """
-                    try:
-                        response2 = model.generate_content(prompt2)
-                        st.session_state.ai_analysis_2 = response2.text
-                    except Exception as e:
-                         st.session_state.ai_analysis_2 = f"Lỗi khi gọi API Gemini: {e}"
-                else:
-                    st.session_state.ai_analysis_2 = "Không có nội dung file .docx để phân tích."
+                prompts["ai_analysis_2"] = prompt2
+            else:
+                artifacts["ai_analysis_2"] = "Không có nội dung file .docx để phân tích."
+            # Gửi đồng thời các yêu cầu, mỗi phản hồi hiển thị dần trong khung riêng của nó
+            placeholders = {}
+            for name, (title, source) in analysis_sections.items():
+                if name in prompts:
+                    with st.expander(title, expanded=True):
+                        st.info(source)
+                        placeholders[name] = st.empty()
+                        placeholders[name].markdown("⏳ AI đang phân tích...")
+            results = {name: "" for name in prompts}
+            # Lấy cache ở luồng chính: các hàm dưới đây chạy trong luồng phụ của stream_concurrently,
+            # không có ScriptRunContext nên không được gọi hàm st.cache_resource
+            analysis_cache = get_llm_cache()
+            streams = {
+                "ai_analysis_1": lambda: analysis_cache.generate_stream(model, prompt1, bypass=bypass_cache, stage="phan_tich_1")
+            }
+            if "ai_analysis_2" in prompts:
+                # Phương án quá lớn được phân tích theo từng mục rồi tổng hợp (map-reduce)
+                streams["ai_analysis_2"] = lambda: analyze_document(
+                    model, docx_text, prompt2, analysis_cache, bypass=bypass_cache, stage="phan_tich_2"
+                )
+            for event in stream_concurrently(streams):
+                if event.error is not None:
+                    results[event.name] = describe_error(event.error)
+                elif event.text:
+                    results[event.name] += event.text
+                placeholders[event.name].markdown(results[event.name] + ("" if event.done else " ▌"))
+            for name, text in results.items():
+                artifacts[name] = text
+            streamed = set(prompts)
         
         # Hiển thị kết quả phân tích
-        if 'ai_analysis_1' in st.session_state:
-            with st.expander("1. Phân tích từ dữ liệu trên ứng dụng", expanded=True):
-                st.info("Nguồn dữ liệu: Các thông số và chỉ số tài chính đã nhập/hiệu chỉnh trên ứng dụng.")
-                st.markdown(st.session_state.ai_analysis_1)
-        
-        if 'ai_analysis_2' in st.session_state:
-            with st.expander("2. Phân tích từ file .docx của khách hàng", expanded=True):
-                st.info("Nguồn dữ liệu: Nội dung phương án kinh doanh từ file .docx khách hàng tải lên.")
-                st.markdown(st.session_state.ai_analysis_2)
+        for name, (title, source) in analysis_sections.items():
+            if name in artifacts and name not in streamed:
+                with st.expander(title, expanded=True):
+                    st.info(source)
+                    st.markdown(artifacts[name])
+        cache_stats = get_llm_cache().stats()
+        st.caption(f"Cache phân tích AI: {cache_stats['hits']} lần dùng lại, {cache_stats['misses']} lần gọi mới, "
+                   f"{cache_stats['entries']} kết quả đang lưu.")
 # --------------------------------------------------------------------------------------
 # TAB 5: CHATBOT HỖ TRỢ
 # --------------------------------------------------------------------------------------
@@ -474,32 +604,42 @@ with tab5:
         st.warning("Vui lòng nhập Gemini API Key ở thanh bên để sử dụng tính năng này.")
     else:
         try:
-            # Khởi tạo model cho chatbot
-            model_chat = genai.GenerativeModel('gemini-2.0-flash-exp')
-            chat = model_chat.start_chat(history=[])
+            # Model dùng chung giữa các lần rerun; phiên trò chuyện giữ riêng cho từng người dùng
+            model_chat = get_gemini_client(api_key, 'gemini-2.0-flash-exp')
+            chat = st.session_state.get('chat_session')
+            if chat is None or chat.model is not model_chat:
+                chat = ChatSession.from_history(model_chat, artifacts.get("chat_history", []))
+                st.session_state.chat_session = chat
         except Exception as e:
             st.error(f"Lỗi khởi tạo Gemini Chat: {e}")
             chat = None
-        # Hiển thị lịch sử chat
-        for message in st.session_state.chat_history:
+        # Hiển thị lịch sử chat (danh sách trong kho dùng chung: thêm tin nhắn bằng artifacts.append)
+        chat_history = artifacts.get("chat_history", [])
+        for message in chat_history:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
         # Input từ người dùng
         if prompt := st.chat_input("Đặt câu hỏi về thẩm định, tài chính..."):
             if chat:
                 # Thêm tin nhắn của người dùng vào lịch sử và hiển thị
-                st.session_state.chat_history.append({"role": "user", "content": prompt})
+                chat_history = chat_history + [{"role": "user", "content": prompt}]
+                artifacts.append("chat_history", chat_history[-1])
                 with st.chat_message("user"):
                     st.markdown(prompt)
                 # Gửi tin nhắn đến Gemini và nhận phản hồi
                 with st.chat_message("assistant"):
                     with st.spinner("Bot đang suy nghĩ..."):
                         try:
-                            # Bổ sung context từ file vào prompt
+                            # Bổ sung context từ file vào prompt: chỉ các đoạn liên quan nhất tới câu hỏi
+                            docx_context = ""
+                            docx_text = artifacts.get("docx_text", "")
+                            if docx_text:
+                                doc_key = st.session_state.get('uploaded_file_key') or content_hash(docx_text.encode("utf-8"))
+                                docx_context = get_retrieval_index(doc_key, docx_text).context_for(prompt)
                             context_prompt = f"""
                             Dựa trên bối cảnh của phương án kinh doanh này (nếu có):
                             ---
-                            {st.session_state.docx_text[:2000]}...
+                            {docx_context}
                             ---
                             Và dữ liệu tổng hợp:
                             ---
@@ -509,28 +649,184 @@ with tab5:
                             ---
                             Hãy trả lời câu hỏi sau: "{prompt}"
                             """
-                            response = chat.send_message(context_prompt)
-                            response_text = response.text
+                            response_text = chat.send(prompt, context_prompt, cache=get_llm_cache())
                             st.markdown(response_text)
                             # Thêm phản hồi của bot vào lịch sử
-                            st.session_state.chat_history.append({"role": "assistant", "content": response_text})
+                            chat_history = chat_history + [{"role": "assistant", "content": response_text}]
                         except Exception as e:
-                            error_message = f"Xin lỗi, đã có lỗi xảy ra: {e}"
+                            error_message = f"Xin lỗi, đã có lỗi xảy ra. {describe_error(e)}"
                             st.error(error_message)
-                            st.session_state.chat_history.append({"role": "assistant", "content": error_message})
+                            chat_history = chat_history + [{"role": "assistant", "content": error_message, "error": True}]
+                artifacts.append("chat_history", chat_history[-1])
             else:
                 st.error("Không thể khởi tạo chatbot. Vui lòng kiểm tra API Key.")
-        if st.session_state.chat_history:
+        if chat_history:
             if st.button("🗑️ Xóa lịch sử trò chuyện"):
-                st.session_state.chat_history = []
+                del artifacts["chat_history"]
+                st.session_state.pop('chat_session', None)
                 st.rerun()
+# --------------------------------------------------------------------------------------
+# TAB 6: DÒNG TIỀN DANH MỤC
+# --------------------------------------------------------------------------------------
+with tab6:
+    st.header("Dự báo Dòng thu Gốc và Lãi của Danh mục cho vay")
+    portfolio_file = st.file_uploader(
+        "Tải lên danh mục khoản vay (.csv, .xlsx, .parquet)",
+        type=['csv', 'xlsx', 'parquet'],
+        help="Bắt buộc: so_tien_vay, lai_suat, thoi_gian_vay. Tùy chọn: phuong_thuc_tra_no, an_han_goc, "
+             "chu_ky_tra_goc, san_pham, can_bo, ngay_giai_ngan. Có thể dùng trực tiếp file kết quả của batch.py."
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        include_current = st.checkbox("Bao gồm khoản vay đang thẩm định", value=True)
+    with col2:
+        group_by = st.multiselect("Tổng hợp theo", list(GROUP_DIMENSIONS), format_func=GROUP_DIMENSIONS.get)
+    portfolio_frames = []
+    if portfolio_file is not None:
+        try:
+            portfolio_frames.append(load_portfolio_frame(portfolio_file.getvalue(), portfolio_file.name))
+        except Exception as e:
+            st.error(f"Lỗi khi đọc file danh mục: {e}")
+    if include_current and so_tien_vay > 0 and lai_suat > 0 and thoi_gian_vay > 0:
+        portfolio_frames.append(pd.DataFrame([{
+            "so_tien_vay": so_tien_vay,
+            "lai_suat": lai_suat,
+            "thoi_gian_vay": thoi_gian_vay,
+            "phuong_thuc_tra_no": phuong_thuc_tra_no,
+            "an_han_goc": an_han_goc,
+            "chu_ky_tra_goc": chu_ky_tra_goc,
+            "san_pham": "Khoản vay đang thẩm định",
+        }]))
+    if portfolio_frames:
+        portfolio_df = pd.concat(portfolio_frames, ignore_index=True)
+        try:
+            so_khoan_vay, cash_flows = project_portfolio(portfolio_df, tuple(group_by))
+        except ValueError as e:
+            st.error(f"Dữ liệu danh mục không hợp lệ: {e}")
+            cash_flows = None
+        if cash_flows is not None and not cash_flows.empty:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Số khoản vay", f"{so_khoan_vay:,}".replace(",", "."))
+            col2.metric("Tổng gốc thu về (VNĐ)", format_currency(cash_flows["goc"].sum()))
+            col3.metric("Tổng lãi thu về (VNĐ)", format_currency(cash_flows["lai"].sum()))
+            # Biểu đồ tô màu theo chiều tổng hợp đầu tiên; các chiều còn lại được cộng gộp
+            chart_flows = cash_flows.groupby(["thang"] + group_by[:1], as_index=False)["tong"].sum()
+            fig_portfolio, chart_stats = get_figure_cache().get_or_build(
+                data_hash(chart_flows["thang"].array.asi8, chart_flows["tong"],
+                          *(chart_flows[col].astype(str) for col in group_by[:1]), extra=("portfolio", group_by[:1])),
+                lambda: cash_flow_figure(chart_flows, group_by[0] if group_by else None, GROUP_DIMENSIONS.get(group_by[0]) if group_by else None),
+            )
+            st.plotly_chart(fig_portfolio, use_container_width=True)
+            st.caption(describe_stats(chart_stats))
+            chart_df = cash_flows.assign(thang=cash_flows["thang"].astype(str))
+            df_display = chart_df.rename(columns={"thang": "Tháng", "goc": "Gốc", "lai": "Lãi", "tong": "Tổng", **GROUP_DIMENSIONS})
+            for col in ["Gốc", "Lãi", "Tổng"]:
+                df_display[col] = format_currency_array(df_display[col])
+            st.dataframe(df_display, use_container_width=True, height=400)
+            if st.button("📄 Tạo file Excel kế hoạch trả nợ toàn danh mục"):
+                with st.spinner("Đang ghi kế hoạch trả nợ của từng khoản vay..."):
+                    token = portfolio_excel(portfolio_df)
+                offer_download(st, "📥 Tải xuống file Excel danh mục", token,
+                               "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    else:
+        st.info("Tải lên file danh mục hoặc nhập thông tin khoản vay ở tab 'Nhập liệu' để dự báo dòng tiền.")
+# --------------------------------------------------------------------------------------
+# TAB 7: KỊCH BẢN ĐỘ NHẠY
+# --------------------------------------------------------------------------------------
+with tab7:
+    st.header("Phân tích Độ nhạy theo Lãi suất, Thời hạn, Số tiền vay và Doanh thu")
+    if so_tien_vay > 0 and lai_suat > 0 and thoi_gian_vay > 0:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            # Khoảng mặc định ±3 điểm quanh lãi suất hiện tại, kẹp trong [0.5, 30] (lãi suất ngoài thang vẫn có khoảng hợp lệ)
+            rate_default = (max(0.5, min(lai_suat - 3.0, 27.0)), min(30.0, max(lai_suat + 3.0, 3.5)))
+            rate_range = st.slider("Lãi suất (%/năm)", 0.5, 30.0, rate_default, step=0.5)
+            term_range = st.slider("Thời gian vay (tháng)", 1, 480, (max(1, int(thoi_gian_vay) // 2), min(480, int(thoi_gian_vay) * 2)))
+        with col2:
+            amount_range = st.slider("Số tiền vay (% so với đề nghị)", 10, 300, (50, 150), step=10)
+            shock_range = st.slider("Doanh thu giảm (%)", 0, 100, (0, 50), step=5)
+        with col3:
+            so_diem = st.slider("Số điểm trên mỗi trục", 3, 40, 20, help="Tổng số kịch bản = số điểm mũ 4.")
+            nguon_tra_no_nam = st.number_input(
+                "Nguồn trả nợ hằng năm (VNĐ)",
+                min_value=0,
+                value=int(st.session_state.get('nguon_tra_no') or st.session_state.get('chenh_lech_thu_chi') or 0),
+                step=1000000,
+                format="%d",
+                help="Để 0 thì dùng chênh lệch thu chi trích xuất từ phương án."
+            )
+            doanh_thu_nam = st.number_input(
+                "Doanh thu hằng năm (VNĐ)",
+                min_value=0,
+                value=int(st.session_state.get('doanh_thu') or 0),
+                step=1000000,
+                format="%d"
+            )
+        axis_values = {
+            "lai_suat": tuple(np.round(np.linspace(*rate_range, so_diem), 2)),
+            "thoi_gian_vay": tuple(np.unique(np.linspace(*term_range, so_diem).round().astype(int)).tolist()),
+            "so_tien_vay": tuple(np.round(np.linspace(*amount_range, so_diem) / 100 * so_tien_vay, -3)),
+            "cu_soc_doanh_thu": tuple(np.round(np.linspace(*shock_range, so_diem), 1)),
+        }
+        start = time.perf_counter()
+        grid = scenario_grid(
+            *axis_values.values(), phuong_thuc_tra_no, an_han_goc, chu_ky_tra_goc,
+            nguon_tra_no_nam, st.session_state.get('chenh_lech_thu_chi') or 0, doanh_thu_nam, tsdb_gia_tri
+        )
+        elapsed = time.perf_counter() - start
+        st.caption(f"Đã tính {grid.tong_lai.size:,} kịch bản trong {elapsed * 1000:.0f} ms.".replace(",", "."))
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            metric = st.selectbox("Chỉ tiêu", list(SCENARIO_METRICS), format_func=SCENARIO_METRICS.get, index=2)
+        with col2:
+            x_axis = st.selectbox("Trục ngang", list(SCENARIO_AXES), format_func=SCENARIO_AXES.get, index=0)
+        with col3:
+            y_options = [axis for axis in SCENARIO_AXES if axis != x_axis]
+            y_axis = st.selectbox("Trục dọc", y_options, format_func=SCENARIO_AXES.get)
+        # Hai trục còn lại được cố định tại giá trị chọn (mặc định: gần với phương án hiện tại nhất)
+        current = {"lai_suat": lai_suat, "thoi_gian_vay": thoi_gian_vay, "so_tien_vay": so_tien_vay, "cu_soc_doanh_thu": 0}
+        fixed = {}
+        fixed_axes = [axis for axis in SCENARIO_AXES if axis not in (x_axis, y_axis)]
+        for col, axis in zip(st.columns(len(fixed_axes)), fixed_axes):
+            values = grid.axes[axis]
+            default = values[int(np.abs(values - current[axis]).argmin())]
+            with col:
+                chosen = st.select_slider(SCENARIO_AXES[axis], options=values.tolist(), value=default.item())
+            fixed[axis] = values.tolist().index(chosen)
+        x_values, y_values, matrix = grid_slice(grid, metric, x_axis, y_axis, fixed)
+        fig_heatmap = px.imshow(
+            matrix,
+            x=[str(v) for v in x_values],
+            y=[str(v) for v in y_values],
+            labels={"x": SCENARIO_AXES[x_axis], "y": SCENARIO_AXES[y_axis], "color": SCENARIO_METRICS[metric]},
+            color_continuous_scale="RdYlGn" if metric == "he_so_tra_no" else "RdYlGn_r",
+            aspect="auto",
+            origin="lower",
+            title=SCENARIO_METRICS[metric]
+        )
+        st.plotly_chart(fig_heatmap, use_container_width=True)
+        if metric == "he_so_tra_no" and nguon_tra_no_nam == 0:
+            st.warning("Chưa có nguồn trả nợ hằng năm nên hệ số khả năng trả nợ bằng 0.")
+    else:
+        st.info("Vui lòng nhập Số tiền vay, Lãi suất và Thời gian vay ở tab 'Nhập liệu' để phân tích độ nhạy.")
 # ======================================================================================
 # LOGIC XỬ LÝ NÚT EXPORT (đặt ở cuối để truy cập được mọi state)
 # ======================================================================================
 if execute_export:
     if export_option == "Xuất Kế hoạch trả nợ (Excel)":
-        if 'repayment_df' in st.session_state and not st.session_state.repayment_df.empty:
-            excel_data = generate_excel_download(st.session_state.repayment_df)
+        repayment_df = schedule_node(*loan_terms)
+        if not repayment_df.empty:
+            excel_inputs = appraisal_inputs({
+                **{k: st.session_state.get(k, '') for k in ['ho_ten', 'cccd', 'muc_dich_vay']},
+                "tong_nhu_cau_von": tong_nhu_cau_von, "von_doi_ung": von_doi_ung, "so_tien_vay": so_tien_vay,
+                "lai_suat": lai_suat, "thoi_gian_vay": thoi_gian_vay, "phuong_thuc_tra_no": phuong_thuc_tra_no,
+                "an_han_goc": an_han_goc, "tsdb_gia_tri": tsdb_gia_tri,
+            })
+            excel_data = generate_excel_download(
+                repayment_df, excel_inputs,
+                ratios_node(so_tien_vay, tong_nhu_cau_von, von_doi_ung, tsdb_gia_tri)
+            )
             st.sidebar.download_button(
                 label="📥 Tải xuống file Excel",
                 data=excel_data,
@@ -553,8 +849,8 @@ if execute_export:
                     loan_info,
                     collateral_info,
                     st.session_state.get('ratios', {}),
-                    st.session_state.get('ai_analysis_1', 'Chưa thực hiện phân tích.'),
-                    st.session_state.get('ai_analysis_2', 'Chưa thực hiện phân tích.')
+                    artifacts.get('ai_analysis_1', 'Chưa thực hiện phân tích.'),
+                    artifacts.get('ai_analysis_2', 'Chưa thực hiện phân tích.')
                 )
                 st.sidebar.download_button(
                     label="📥 Tải xuống Báo cáo (.docx)",
@@ -566,3 +862,77 @@ if execute_export:
                 st.sidebar.success("Đã tạo file báo cáo!")
         else:
             st.sidebar.error("Chưa có dữ liệu để tạo báo cáo.")
+    elif export_option == "Xuất Báo cáo hàng loạt (.zip)":
+        if bulk_files and not DOWNLOAD_BASE_URL and len(bulk_files) > BULK_MAX_FILES:
+            st.sidebar.error(f"Mỗi lần xuất tối đa {BULK_MAX_FILES} file phương án. Vui lòng chia nhỏ danh sách.")
+        elif bulk_files:
+            with st.spinner("Đang tạo các báo cáo..."):
+                so_bao_cao, token, failed = generate_reports_zip(bulk_files)
+            for message in failed:
+                st.sidebar.warning(f"Bỏ qua file lỗi - {message}")
+            if offer_download(st.sidebar, f"📥 Tải xuống {so_bao_cao} báo cáo (.zip)", token, "application/zip"):
+                st.sidebar.success("Đã tạo file .zip báo cáo!")
+        else:
+            st.sidebar.error("Vui lòng tải lên ít nhất một file phương án.")
+# ======================================================================================
+# BẢNG VẬN HÀNH (ADMIN)
+# Thời gian từng công đoạn, số token Gemini và bộ nhớ đỉnh của tiến trình (dùng chung
+# cho mọi phiên). Bật bằng biến môi trường ADMIN_PANEL=1.
+# ======================================================================================
+REGISTRY.observe("streamlit_rerun", time.perf_counter() - run_started)
+# Bộ nhớ của phiên này (đặt cuối script để tính cả các mục vừa ghi trong lượt chạy)
+session_usage = artifacts.usage()
+field_bytes = sum(estimate_size(value) for value in st.session_state.to_dict().values())
+st.sidebar.caption(
+    f"💾 Bộ nhớ phiên: {session_usage.memory_bytes / 2**20:.1f}/{get_session_store().session_budget / 2**20:.0f} MB "
+    f"({session_usage.items} mục, {session_usage.shared_items} dùng chung với phiên khác), "
+    f"{session_usage.disk_bytes / 2**20:.1f} MB tạm trên đĩa, trường nhập liệu {field_bytes / 1024:.0f} KB"
+)
+if os.environ.get("ADMIN_PANEL"):
+    with st.sidebar.expander("🛠️ Vận hành hệ thống"):
+        stage_rows = REGISTRY.summary()
+        if stage_rows:
+            st.dataframe(
+                pd.DataFrame(stage_rows)[["stage", "count", "errors", "p50_ms", "p95_ms", "max_ms", "peak_rss_mb"]]
+                .rename(columns={"stage": "Công đoạn", "count": "Số lần", "errors": "Lỗi", "p50_ms": "p50 (ms)",
+                                 "p95_ms": "p95 (ms)", "max_ms": "Lớn nhất (ms)", "peak_rss_mb": "RSS đỉnh (MB)"})
+                .round(1),
+                hide_index=True, use_container_width=True
+            )
+        counter_rows = REGISTRY.counters()
+        if counter_rows:
+            st.dataframe(
+                pd.DataFrame([{"Bộ đếm": name, "Công đoạn": labels.get("stage", ""), "Giá trị": value}
+                              for name, labels, value in counter_rows]),
+                hide_index=True, use_container_width=True
+            )
+        store_stats = get_session_store().stats()
+        st.caption(f"Kho phiên: {store_stats['sessions']} phiên, {store_stats['items']} mục "
+                   f"({store_stats['shared_items']} dùng chung), {store_stats['memory_bytes'] / 2**20:.1f} MB trong bộ nhớ, "
+                   f"{store_stats['disk_bytes'] / 2**20:.1f} MB trên đĩa · {store_stats['spills']} lần chuyển xuống đĩa, "
+                   f"{store_stats['loads']} lần nạp lại, {store_stats['evicted_sessions']} phiên đã thu hồi")
+        session_rows = get_session_store().usage()
+        if session_rows:
+            st.dataframe(
+                pd.DataFrame([{
+                    "Phiên": row.session_id[:8] + (" (bạn)" if row.session_id == st.session_state.session_id else ""),
+                    "Không hoạt động (phút)": row.idle_seconds / 60,
+                    "Số mục": row.items,
+                    "Bộ nhớ (MB)": row.memory_bytes / 2**20,
+                    "Trên đĩa (MB)": row.disk_bytes / 2**20,
+                    "Dùng chung": row.shared_items,
+                } for row in session_rows]).round(2),
+                hide_index=True, use_container_width=True
+            )
+        parse_stats = get_parse_cache().stats()
+        llm_stats = get_llm_cache().stats()
+        st.caption(f"Cache trích xuất: {parse_stats['hits']} trúng, {parse_stats['disk_hits']} trúng từ đĩa, "
+                   f"{parse_stats['misses']} trượt · Cache Gemini: {llm_stats['hits']} trúng, {llm_stats['misses']} trượt")
+        col1, col2 = st.columns(2)
+        col1.download_button("JSON lines", REGISTRY.to_jsonl(), file_name="metrics.jsonl",
+                             mime="application/x-ndjson", use_container_width=True)
+        col2.download_button("Prometheus", REGISTRY.to_prometheus(), file_name="metrics.prom",
+                             mime="text/plain", use_container_width=True)
+        if st.button("Xóa số liệu", use_container_width=True):
+            REGISTRY.reset()
+            st.rerun()
@@ -0,0 +1,212 @@
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+from core import format_currency
+from metrics import timed
+# ======================================================================================
+# SINH BÁO CÁO THẨM ĐỊNH TỪ MẪU .DOCX
+# Mẫu được đọc và phân tích một lần: word/document.xml được tách thành các đoạn XML
+# cố định, các trường {{ten_truong}} và các dòng bảng lặp lại ({{ten_danh_sach.cot}}).
+# Mỗi báo cáo chỉ là phép ghép chuỗi rồi đóng gói lại thành .docx, không dựng lại
+# tài liệu bằng python-docx. Chế độ hàng loạt render trên nhiều tiến trình và ghi
+# dần từng báo cáo vào file .zip.
+# ======================================================================================
+DOCUMENT_PART = "word/document.xml"
+
+# Trường có thể bị Word tách thành nhiều run: cho phép thẻ XML xen giữa {{ và }}
+_PLACEHOLDER = re.compile(r"\{\{((?:[^{}<]|<[^>]*>)+?)\}\}")
+_TAG = re.compile(r"<[^>]+>")
+_TABLE_ROW = re.compile(r"<w:tr[ >].*?</w:tr>", re.DOTALL)
+_LINE_BREAK = '</w:t><w:br/><w:t xml:space="preserve">'
+
+def _field_name(raw):
+    return _TAG.sub("", raw).strip()
+
+def _xml_value(value):
+    """Giá trị của trường dưới dạng XML an toàn; xuống dòng thành thẻ ngắt dòng của Word."""
+    text = "" if value is None else str(value)
+    return _LINE_BREAK.join(escape(line) for line in text.split("\n"))
+
+def _parse_segments(xml):
+    """Tách XML thành danh sách: chuỗi cố định hoặc ('field', tên trường)."""
+    segments = []
+    last = 0
+    for match in _PLACEHOLDER.finditer(xml):
+        segments.append(xml[last:match.start()])
+        segments.append(("field", _field_name(match.group(1))))
+        last = match.end()
+    segments.append(xml[last:])
+    return segments
+
+def _render_segments(segments, context):
+    return "".join(s if isinstance(s, str) else _xml_value(context.get(s[1], "")) for s in segments)
+
+class ReportTemplate:
+    """Mẫu báo cáo .docx đã phân tích sẵn."""
+
+    def __init__(self, docx_bytes):
+        self.source = docx_bytes
+        # Các phần cố định (styles, theme...) được nén một lần vào một file .zip gốc; mỗi báo cáo
+        # chỉ sao chép file gốc này và ghi thêm word/document.xml đã điền trường
+        base = BytesIO()
+        with zipfile.ZipFile(BytesIO(docx_bytes)) as archive, \
+                zipfile.ZipFile(base, "w", zipfile.ZIP_DEFLATED) as static:
+            for info in archive.infolist():
+                if info.filename == DOCUMENT_PART:
+                    document = archive.read(info).decode("utf-8")
+                else:
+                    static.writestr(info.filename, archive.read(info))
+        self._base = base.getvalue()
+        # Khối: chuỗi XML đã tách trường, hoặc ('rows', tên danh sách, các đoạn của dòng mẫu)
+        self._blocks = []
+        last = 0
+        for match in _TABLE_ROW.finditer(document):
+            names = {_field_name(m.group(1)) for m in _PLACEHOLDER.finditer(match.group(0))}
+            lists = {name.split(".", 1)[0] for name in names if "." in name}
+            if not lists:
+                continue
+            self._blocks.append(_parse_segments(document[last:match.start()]))
+            self._blocks.append(("rows", lists.pop(), _parse_segments(match.group(0))))
+            last = match.end()
+        self._blocks.append(_parse_segments(document[last:]))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    @property
+    def fields(self):
+        """Tên các trường và danh sách mà mẫu sử dụng."""
+        names = set()
+        for block in self._blocks:
+            segments = block[2] if isinstance(block, tuple) else block
+            names.update(s[1] for s in segments if not isinstance(s, str))
+        return sorted(names)
+
+    @timed("report_render")
+    def render(self, context):
+        """Trả về nội dung file .docx cho context (dict; danh sách là list các dict)."""
+        pieces = []
+        for block in self._blocks:
+            if isinstance(block, tuple):
+                _, list_name, segments = block
+                for item in context.get(list_name, []):
+                    row = {f"{list_name}.{key}": value for key, value in item.items()}
+                    pieces.append(_render_segments(segments, row))
+            else:
+                pieces.append(_render_segments(block, context))
+        output = BytesIO(self._base)
+        with zipfile.ZipFile(output, "a", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(DOCUMENT_PART, "".join(pieces).encode("utf-8"))
+        return output.getvalue()
+
+def build_default_template():
+    """Mẫu báo cáo mặc định (cùng bố cục với báo cáo cũ), tạo bằng python-docx."""
+    from docx import Document
+    doc = Document()
+    doc.add_heading("BÁO CÁO THẨM ĐỊNH SƠ BỘ", level=1)
+    doc.add_paragraph("Ngày lập báo cáo: {{ngay_lap}}")
+    doc.add_heading("1. Thông tin khách hàng", level=2)
+    for label, field in [("Họ và tên", "ho_ten"), ("CCCD/CMND", "cccd"), ("Số điện thoại", "sdt"), ("Địa chỉ", "dia_chi")]:
+        doc.add_paragraph(f"{label}: {{{{{field}}}}}")
+    doc.add_heading("2. Thông tin Phương án vay & Các chỉ số", level=2)
+    for label, field in [("Mục đích vay", "muc_dich_vay"), ("Tổng nhu cầu vốn", "tong_nhu_cau_von"),
+                         ("Vốn đối ứng", "von_doi_ung"), ("Số tiền vay", "so_tien_vay"),
+                         ("Lãi suất", "lai_suat"), ("Thời gian vay", "thoi_gian_vay")]:
+        doc.add_paragraph(f"{label}: {{{{{field}}}}}")
+    table = doc.add_table(rows=2, cols=2)
+    table.style = "Table Grid"
+    table.cell(0, 0).text = "Chỉ số"
+    table.cell(0, 1).text = "Giá trị"
+    table.cell(1, 0).text = "{{chi_so.ten}}"
+    table.cell(1, 1).text = "{{chi_so.gia_tri}}"
+    doc.add_heading("3. Thông tin tài sản đảm bảo", level=2)
+    doc.add_paragraph("Mô tả: {{tsdb_mo_ta}}")
+    doc.add_paragraph("Tổng giá trị định giá: {{tsdb_gia_tri}}")
+    doc.add_heading("4. Phân tích tự động bởi AI", level=2)
+    doc.add_heading("4.1. Phân tích từ dữ liệu trên ứng dụng", level=3)
+    doc.add_paragraph("{{phan_tich_1}}")
+    doc.add_heading("4.2. Phân tích từ file .docx của khách hàng", level=3)
+    doc.add_paragraph("{{phan_tich_2}}")
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+def build_context(info, ratios, ai_analysis_1=None, ai_analysis_2=None):
+    """
+    Context cho mẫu báo cáo từ thông tin phương án (các khóa như core.parse_info_from_text)
+    và chỉ số đã định dạng (core.format_ratios_for_report).
+    """
+    def money(key):
+        value = info.get(key)
+        return f"{format_currency(value)} VNĐ" if isinstance(value, (int, float)) else ""
+    context = {key: info.get(key) or "" for key in ("ho_ten", "cccd", "sdt", "dia_chi", "muc_dich_vay", "tsdb_mo_ta")}
+    context.update({key: money(key) for key in ("tong_nhu_cau_von", "von_doi_ung", "so_tien_vay", "tsdb_gia_tri")})
+    context["lai_suat"] = f"{info['lai_suat']} %/năm" if info.get("lai_suat") is not None else ""
+    context["thoi_gian_vay"] = f"{int(info['thoi_gian_vay'])} tháng" if info.get("thoi_gian_vay") is not None else ""
+    context["ngay_lap"] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    context["chi_so"] = [{"ten": label, "gia_tri": value} for label, value in ratios.items()]
+    context["phan_tich_1"] = ai_analysis_1 or "Chưa có phân tích."
+    context["phan_tich_2"] = ai_analysis_2 or "Chưa có phân tích."
+    return context
+
+# Mẫu đã phân tích của từng tiến trình con (nạp một lần qua initializer)
+_worker_template = None
+
+def _init_worker(template_bytes):
+    global _worker_template
+    _worker_template = ReportTemplate(template_bytes)
+
+def _render_job(job):
+    name, context = job
+    return name, _worker_template.render(context)
+
+def create_report_pool(template, workers=None, mp_context=None):
+    """
+    Nhóm tiến trình render báo cáo theo template (mặc định số nhân CPU), dùng lại được cho nhiều
+    lần gọi render_reports_zip để không phải khởi động lại tiến trình con mỗi lần.
+    """
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=mp_context,
+                               initializer=_init_worker, initargs=(template.source,))
+
+@timed("render_reports_zip")
+def render_reports_zip(jobs, target, template=None, workers=None, max_in_flight=None, pool=None):
+    """
+    Render hàng loạt báo cáo và ghi vào file .zip (target: đường dẫn hoặc file-like).
+    jobs: iterable (tên file trong zip, context); template: ReportTemplate (mặc định: mẫu mặc định).
+    workers=0 render ngay trong tiến trình hiện tại; ngược lại dùng pool (từ create_report_pool
+    với cùng template, workers là số tiến trình của nó) hoặc một nhóm tiến trình tạo riêng cho
+    lần gọi này (mặc định: số nhân CPU).
+    Chỉ tối đa max_in_flight báo cáo đang chờ ghi tại một thời điểm, nên bộ nhớ không tăng
+    theo số báo cáo. Trả về số báo cáo đã ghi.
+    """
+    template = template or ReportTemplate(build_default_template())
+    count = 0
+    # Các file .docx đã được nén bên trong nên lưu nguyên (ZIP_STORED) vào file .zip ngoài
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_STORED) as archive:
+        if workers == 0:
+            for name, context in jobs:
+                archive.writestr(name, template.render(context))
+                count += 1
+            return count
+        workers = workers or os.cpu_count() or 1
+        max_in_flight = max_in_flight or 4 * workers
+        # Nhóm tạo riêng thì đóng khi xong; nhóm dùng chung (pool) để nguyên cho lần gọi sau
+        with nullcontext(pool) if pool is not None else create_report_pool(template, workers) as executor:
+            pending = deque()
+            for job in jobs:
+                pending.append(executor.submit(_render_job, job))
+                if len(pending) >= max_in_flight:
+                    archive.writestr(*pending.popleft().result())
+                    count += 1
+            while pending:
+                archive.writestr(*pending.popleft().result())
+                count += 1
+    return count
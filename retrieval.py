@@ -0,0 +1,115 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+# ======================================================================================
+# TRUY XUẤT ĐOẠN VĂN BẢN LIÊN QUAN (BM25, CHẠY CỤC BỘ)
+# Văn bản phương án được chia thành các đoạn một lần khi tải lên và lập chỉ mục BM25.
+# Mỗi câu hỏi của chatbot chỉ nhận các đoạn liên quan nhất, trong giới hạn số token.
+# Tách từ theo âm tiết tiếng Việt, kèm cặp âm tiết liền kề (từ ghép như "lãi suất")
+# và dạng bỏ dấu để câu hỏi gõ không dấu vẫn tìm được.
+# ======================================================================================
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset("""
+và của là các có được cho với trong này những một để theo từ đã không thì tại về
+như khi đến trên cũng đó nên hoặc nếu vì do bị rằng mà ra lại sẽ đang rất
+""".split())
+
+# Ước lượng thô số token: khoảng 3 ký tự mỗi token với văn bản tiếng Việt
+CHARS_PER_TOKEN = 3
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def fold_diacritics(word):
+    """Bỏ dấu tiếng Việt: 'lãi' -> 'lai', 'đồng' -> 'dong'."""
+    decomposed = unicodedata.normalize("NFD", word.replace("đ", "d").replace("Đ", "D"))
+    return "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+
+def tokenize(text):
+    """Tách âm tiết (chữ thường, chuẩn hóa NFC), thêm cặp âm tiết liền kề và dạng bỏ dấu."""
+    syllables = _WORD.findall(unicodedata.normalize("NFC", text).lower())
+    tokens = [s for s in syllables if s not in STOPWORDS]
+    tokens += [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])
+               if a not in STOPWORDS and b not in STOPWORDS]
+    for syllable in syllables:
+        if syllable not in STOPWORDS:
+            folded = fold_diacritics(syllable)
+            if folded != syllable:
+                tokens.append(folded)
+    return tokens
+
+def split_chunks(text, max_chars=1200):
+    """Chia văn bản thành các đoạn không quá max_chars ký tự, ưu tiên cắt theo ranh giới dòng."""
+    chunks = []
+    current = []
+    current_len = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # Dòng quá dài được cắt cứng theo max_chars
+        pieces = [line[i:i + max_chars] for i in range(0, len(line), max_chars)]
+        for piece in pieces:
+            if current and current_len + len(piece) + 1 > max_chars:
+                chunks.append("\n".join(current))
+                current, current_len = [], 0
+            current.append(piece)
+            current_len += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+class BM25Index:
+    """Chỉ mục BM25 trên danh sách đoạn văn bản."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(list)   # token -> [(chỉ số đoạn, tần suất)]
+        self._lengths = []
+        for idx, chunk in enumerate(self.chunks):
+            counts = Counter(tokenize(chunk))
+            self._lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self._postings[token].append((idx, tf))
+        n_docs = len(self.chunks)
+        self._avg_length = (sum(self._lengths) / n_docs) if n_docs else 0.0
+        self._idf = {
+            token: math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for token, postings in self._postings.items()
+        }
+
+    @classmethod
+    def from_text(cls, text, max_chars=1200):
+        return cls(split_chunks(text, max_chars))
+
+    def search(self, query, top_k=5):
+        """Trả về danh sách (điểm, chỉ số đoạn) của top_k đoạn liên quan nhất."""
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            idf = self._idf.get(token)
+            if idf is None:
+                continue
+            for idx, tf in self._postings[token]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[idx] / self._avg_length)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, ((score, idx) for idx, score in scores.items()))
+
+    def context_for(self, query, top_k=5, token_budget=1500):
+        """
+        Ghép các đoạn liên quan nhất với câu hỏi thành ngữ cảnh không vượt quá token_budget,
+        giữ thứ tự xuất hiện trong tài liệu.
+        """
+        selected = []
+        used = 0
+        for _, idx in self.search(query, top_k):
+            cost = estimate_tokens(self.chunks[idx])
+            if used + cost > token_budget:
+                continue
+            selected.append(idx)
+            used += cost
+        return "\n...\n".join(self.chunks[idx] for idx in sorted(selected))
@@ -0,0 +1,94 @@
+from collections import namedtuple
+import numpy as np
+from schedule import GOC_DEU, compute_schedules
+# ======================================================================================
+# LƯỚI KỊCH BẢN ĐỘ NHẠY (LÃI SUẤT x THỜI HẠN x SỐ TIỀN VAY x CÚ SỐC DOANH THU)
+# Kế hoạch trả nợ tỷ lệ thuận với số tiền vay, nên chỉ cần tính kế hoạch cho 1 đồng
+# vốn với từng cặp (lãi suất, thời hạn) - vài trăm kế hoạch - rồi nhân broadcast theo
+# trục số tiền vay và trục cú sốc doanh thu. Lưới 10^6 kịch bản tính trong một lượt
+# phép toán mảng NumPy.
+# ======================================================================================
+# Các trục của lưới theo đúng thứ tự chiều của mảng kết quả
+AXES = {
+    "lai_suat": "Lãi suất (%/năm)",
+    "thoi_gian_vay": "Thời gian vay (tháng)",
+    "so_tien_vay": "Số tiền vay (VNĐ)",
+    "cu_soc_doanh_thu": "Doanh thu giảm (%)",
+}
+
+METRICS = {
+    "tong_lai": "Tổng lãi phải trả (VNĐ)",
+    "ky_tra_cao_nhat": "Số tiền trả cao nhất một kỳ (VNĐ)",
+    "he_so_tra_no": "Hệ số khả năng trả nợ (lần)",
+    "ltv": "Tỷ lệ Vay/Giá trị TSĐB (%)",
+}
+
+# axes: dict {tên trục: mảng giá trị}; các chỉ tiêu là mảng 4 chiều (lãi suất, thời hạn, số tiền, cú sốc)
+ScenarioGrid = namedtuple("ScenarioGrid", ["axes", "tong_lai", "ky_tra_cao_nhat", "he_so_tra_no", "ltv"])
+
+def _max_annual_service(payment):
+    """Tổng gốc + lãi lớn nhất trong 12 tháng liên tiếp của từng kế hoạch (khoản vay ngắn hơn 12 tháng: toàn bộ)."""
+    cumulative = np.cumsum(payment, axis=1)
+    if payment.shape[1] <= 12:
+        return cumulative[:, -1]
+    windows = cumulative[:, 11:] - np.hstack([np.zeros((payment.shape[0], 1)), cumulative[:, :-12]])
+    return windows.max(axis=1)
+
+def repayment_source(shocks, nguon_tra_no=0, chenh_lech_thu_chi=0, doanh_thu=0):
+    """
+    Nguồn trả nợ hằng năm sau cú sốc doanh thu (shocks: % doanh thu giảm).
+    Chi phí giữ nguyên nên phần doanh thu mất đi trừ thẳng vào nguồn trả nợ; nếu không có
+    số liệu doanh thu thì nguồn trả nợ giảm cùng tỷ lệ.
+    """
+    shocks = np.asarray(shocks, dtype=float) / 100
+    base = nguon_tra_no if nguon_tra_no > 0 else chenh_lech_thu_chi
+    if doanh_thu > 0:
+        return np.maximum(base - doanh_thu * shocks, 0.0)
+    return np.maximum(base * (1.0 - shocks), 0.0)
+
+def evaluate_grid(rates, terms, amounts, shocks, method=GOC_DEU, grace_months=0, season_months=3,
+                  nguon_tra_no=0, chenh_lech_thu_chi=0, doanh_thu=0, tsdb_gia_tri=0):
+    """
+    Tính toàn bộ lưới kịch bản.
+    - tong_lai, ky_tra_cao_nhat: theo kế hoạch trả nợ của phương thức method
+    - he_so_tra_no: nguồn trả nợ hằng năm (sau cú sốc) / nghĩa vụ trả nợ lớn nhất trong 12 tháng liên tiếp
+    - ltv: số tiền vay / giá trị tài sản bảo đảm (%), 0 nếu chưa có giá trị TSĐB
+    Các mảng kết quả có thể là view broadcast (chỉ đọc) để không nhân bản dữ liệu theo các trục không liên quan.
+    """
+    rates = np.asarray(rates, dtype=float)
+    terms = np.asarray(terms, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=float)
+    shocks = np.asarray(shocks, dtype=float)
+    shape = (rates.size, terms.size, amounts.size, shocks.size)
+
+    rate_grid, term_grid = np.meshgrid(rates, terms, indexing="ij")
+    unit = compute_schedules(1.0, rate_grid.ravel(), term_grid.ravel(), method, grace_months, season_months)
+    interest = unit.interest.sum(axis=1).reshape(rates.size, terms.size, 1, 1)
+    peak = unit.payment.max(axis=1, initial=0.0).reshape(rates.size, terms.size, 1, 1)
+    annual_service = _max_annual_service(unit.payment).reshape(rates.size, terms.size, 1, 1)
+
+    amount = amounts.reshape(1, 1, -1, 1)
+    source = repayment_source(shocks, nguon_tra_no, chenh_lech_thu_chi, doanh_thu).reshape(1, 1, 1, -1)
+    service = annual_service * amount
+    with np.errstate(divide="ignore", invalid="ignore"):
+        he_so_tra_no = np.where(service > 0, source / service, 0.0)
+    ltv = amount / tsdb_gia_tri * 100 if tsdb_gia_tri > 0 else np.zeros((1, 1, amounts.size, 1))
+    return ScenarioGrid(
+        axes={"lai_suat": rates, "thoi_gian_vay": terms, "so_tien_vay": amounts, "cu_soc_doanh_thu": shocks},
+        tong_lai=np.broadcast_to(interest * amount, shape),
+        ky_tra_cao_nhat=np.broadcast_to(peak * amount, shape),
+        he_so_tra_no=np.broadcast_to(he_so_tra_no, shape),
+        ltv=np.broadcast_to(ltv, shape),
+    )
+
+def grid_slice(grid, metric, x_axis, y_axis, fixed):
+    """
+    Mặt cắt 2 chiều của chỉ tiêu metric để vẽ heatmap: trả về (giá trị trục x, giá trị trục y, ma trận y x x).
+    fixed: {tên trục: chỉ số phần tử} cho hai trục còn lại.
+    """
+    names = list(AXES)
+    index = tuple(slice(None) if name in (x_axis, y_axis) else fixed[name] for name in names)
+    values = getattr(grid, metric)[index]
+    if names.index(x_axis) < names.index(y_axis):
+        values = values.T
+    return grid.axes[x_axis], grid.axes[y_axis], values
@@ -0,0 +1,100 @@
+import numpy as np
+import numpy_financial as npf
+from collections import namedtuple
+# ======================================================================================
+# BỘ TÍNH KẾ HOẠCH TRẢ NỢ DẠNG VECTOR
+# Tính đồng thời kế hoạch trả nợ của một hoặc nhiều khoản vay bằng phép toán mảng
+# NumPy. Kết quả là các ma trận (số khoản vay x số kỳ lớn nhất); các kỳ nằm ngoài
+# thời hạn của từng khoản vay có giá trị 0.
+# ======================================================================================
+GOC_DEU = "goc_deu"
+NIEN_KIM = "nien_kim"
+CUOI_KY = "cuoi_ky"
+THEO_MUA_VU = "theo_mua_vu"
+
+METHODS = {
+    GOC_DEU: "Gốc đều, lãi theo dư nợ giảm dần",
+    NIEN_KIM: "Gốc và lãi đều hàng kỳ (niên kim)",
+    CUOI_KY: "Trả lãi hàng kỳ, gốc cuối kỳ",
+    THEO_MUA_VU: "Trả gốc theo mùa vụ",
+}
+
+# term: thời hạn (tháng) của từng khoản vay; các trường còn lại là ma trận (khoản vay x kỳ)
+Schedules = namedtuple("Schedules", ["term", "opening", "principal", "interest", "payment", "closing"])
+
+def _remaining(method, P, r, m, s, j):
+    """Dư nợ còn lại (theo từng phương thức) sau khi đã qua j kỳ trả gốc trên tổng số m kỳ."""
+    if method == GOC_DEU:
+        return P * (1.0 - j / m)
+    if method == NIEN_KIM:
+        installment = npf.pmt(r, m, -P)
+        growth = (1.0 + r) ** j
+        safe_r = np.where(r > 0, r, 1.0)
+        return np.where(r > 0, P * growth - installment * (growth - 1.0) / safe_r, P * (1.0 - j / m))
+    if method == CUOI_KY:
+        return np.where(j < m, P, 0.0)
+    if method == THEO_MUA_VU:
+        # Trả gốc bằng nhau mỗi s tháng; phần lẻ (nếu có) trả vào kỳ cuối cùng
+        installments = np.ceil(m / s)
+        paid = j // s + ((j == m) & (m % s != 0))
+        return P * (1.0 - paid / installments)
+    raise ValueError(f"Phương thức trả nợ không hợp lệ: {method}")
+
+def compute_schedules(principal, annual_rate, term_months, method=GOC_DEU, grace_months=0, season_months=3):
+    """
+    Tính kế hoạch trả nợ cho một hoặc nhiều khoản vay.
+    Mọi tham số có thể là số hoặc mảng (được broadcast với nhau):
+    - annual_rate: lãi suất %/năm, lãi tính theo dư nợ đầu kỳ
+    - grace_months: số tháng ân hạn gốc đầu kỳ (chỉ trả lãi)
+    - season_months: chu kỳ trả gốc (tháng) của phương thức THEO_MUA_VU
+    """
+    principal, rate, term, grace, season, method = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(principal, dtype=float)),
+        np.atleast_1d(np.asarray(annual_rate, dtype=float)) / 12 / 100,
+        np.atleast_1d(np.asarray(term_months)).astype(np.int64),
+        np.atleast_1d(np.asarray(grace_months)).astype(np.int64),
+        np.atleast_1d(np.asarray(season_months)).astype(np.int64),
+        np.atleast_1d(np.asarray(method)),
+    )
+    n_loans = principal.shape[0]
+    n_periods = int(term.max()) if n_loans else 0
+    shape = (n_loans, n_periods)
+    opening = np.zeros(shape)
+    closing = np.zeros(shape)
+
+    k = np.arange(1, n_periods + 1)[None, :]
+    n = term[:, None]
+    # Kỳ ân hạn không được vượt quá thời hạn (luôn còn ít nhất một kỳ trả gốc)
+    g = np.clip(grace, 0, np.maximum(term - 1, 0))[:, None]
+    m = np.maximum(n - g, 1)
+    active = (k <= n) & (principal[:, None] > 0)
+    # Số kỳ trả gốc đã qua tính đến đầu và cuối kỳ k
+    j_open = np.clip(k - 1 - g, 0, m)
+    j_close = np.clip(k - g, 0, m)
+
+    for name in np.unique(method):
+        rows = method == name
+        P = principal[rows, None]
+        r = rate[rows, None]
+        s = np.maximum(season[rows], 1)[:, None]
+        m_rows = m[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            opening[rows] = _remaining(name, P, r, m_rows, s, j_open[rows])
+            closing[rows] = _remaining(name, P, r, m_rows, s, j_close[rows])
+
+    # Đảm bảo dư nợ cuối kỳ cuối cùng là 0 và các kỳ ngoài thời hạn bằng 0
+    closing[k >= n] = 0.0
+    opening[~active] = 0.0
+    closing[~active] = 0.0
+    principal_paid = opening - closing
+    interest = opening * rate[:, None]
+    return Schedules(term, opening, principal_paid, interest, principal_paid + interest, closing)
+
+def schedule_totals(schedules):
+    """Tổng hợp theo từng khoản vay: tổng gốc, tổng lãi, tổng phải trả và kỳ trả cao nhất."""
+    return {
+        "tong_goc": schedules.principal.sum(axis=1),
+        "tong_lai": schedules.interest.sum(axis=1),
+        "tong_goc_lai": schedules.payment.sum(axis=1),
+        "ky_tra_cao_nhat": schedules.payment.max(axis=1, initial=0.0),
+    }
@@ -0,0 +1,392 @@
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+# ======================================================================================
+# KHO DỮ LIỆU LỚN CỦA CÁC PHIÊN LÀM VIỆC
+# Văn bản phương án, kết quả phân tích AI, lịch sử trò chuyện... không nằm trong
+# st.session_state mà được lưu một lần trong kho dùng chung theo mã băm nội dung:
+# nhiều phiên mở cùng một phương án chỉ giữ một bản. Mỗi phiên có ngân sách bộ nhớ
+# riêng; vượt ngân sách (hoặc vượt tổng bộ nhớ của kho) thì mục ít dùng gần đây nhất
+# được chuyển xuống đĩa và nạp lại khi cần. Phiên không hoạt động quá lâu bị thu hồi:
+# các mục không còn phiên nào tham chiếu được xóa khỏi bộ nhớ và đĩa. Danh sách chỉ
+# thêm dần (lịch sử trò chuyện) được lưu từng phần tử qua append: thêm một tin nhắn
+# chỉ băm tin nhắn đó thay vì cả lịch sử. Lưu lại đúng đối tượng đang giữ (mỗi lần
+# rerun) thì bỏ qua bước pickle và băm.
+# Mỗi kho (mỗi tiến trình) ghi xuống một thư mục tạm riêng, xóa khi kho bị hủy: các
+# tiến trình dùng chung thư mục gốc không xóa nhầm file của nhau.
+# ======================================================================================
+DEFAULT_SESSION_BUDGET_MB = 16
+DEFAULT_MEMORY_BUDGET_MB = 256
+DEFAULT_IDLE_SECONDS = 2 * 60 * 60
+
+# Số liệu bộ nhớ của một phiên; mục dùng chung được tính đủ cho mỗi phiên tham chiếu
+SessionUsage = namedtuple("SessionUsage", ["session_id", "idle_seconds", "items", "memory_bytes", "disk_bytes", "shared_items"])
+
+def estimate_size(value):
+    """Ước lượng số byte bộ nhớ của một giá trị (chuỗi, DataFrame, list/dict lồng nhau)."""
+    if hasattr(value, "memory_usage"):  # DataFrame / Series
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+class _Blob:
+    """Một nội dung trong kho: value là None khi đang nằm trên đĩa."""
+
+    def __init__(self, key, size, value):
+        self.key = key
+        self.size = size
+        self.value = value
+        self.on_disk = False
+        # Các tham chiếu (phiên, tên) hoặc (phiên, tên, vị trí trong danh sách); hết tham chiếu thì nội dung bị xóa
+        self.refs = set()
+        # Tham chiếu yếu tới đối tượng gốc (nếu kiểu hỗ trợ), để nhận ra nó cả khi nội dung đã xuống đĩa
+        try:
+            self.source = weakref.ref(value)
+        except TypeError:
+            self.source = None
+
+    def holds(self, value):
+        """value chính là đối tượng đã lưu vào blob này (so sánh định danh, không so nội dung)."""
+        return self.value is value or (self.source is not None and self.source() is value)
+
+class SessionStore:
+    """Kho dùng chung cho mọi phiên, an toàn khi dùng từ nhiều luồng."""
+
+    def __init__(self, session_budget_mb=DEFAULT_SESSION_BUDGET_MB, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                 idle_seconds=DEFAULT_IDLE_SECONDS, spill_dir=None, clock=time.monotonic):
+        self.session_budget = int(session_budget_mb * 1024 * 1024)
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.idle_seconds = idle_seconds
+        # Thư mục riêng của kho này, tạo trong spill_dir (None: thư mục tạm của hệ thống)
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = tempfile.mkdtemp(prefix="tham_dinh_phien_", dir=spill_dir)
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.spill_dir, ignore_errors=True)
+        self._clock = clock
+        self._lock = threading.RLock()
+        # Thứ tự LRU: mục dùng gần nhất ở cuối
+        self._blobs = OrderedDict()
+        # phiên -> {"last_seen": thời điểm, "items": OrderedDict tên -> khóa, hoặc list khóa với mục append (LRU)}
+        self._sessions = {}
+        self.memory_bytes = 0
+        self.spills = 0
+        self.loads = 0
+        self.evicted_sessions = 0
+        self.unchanged_puts = 0
+
+    def close(self):
+        """Xóa thư mục tạm của kho (cũng tự chạy khi kho bị hủy hoặc tiến trình kết thúc)."""
+        self._cleanup()
+
+    def session(self, session_id):
+        """Giao diện dạng dict của một phiên."""
+        return SessionArtifacts(self, session_id)
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = {"last_seen": self._clock(), "items": OrderedDict(), "versions": {}}
+        session["last_seen"] = self._clock()
+        return session
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.pkl")
+
+    def _add(self, value):
+        """Blob của value (tạo mới nếu nội dung chưa có trong kho), đã đánh dấu vừa dùng."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        key = hashlib.sha256(data).hexdigest()
+        blob = self._blobs.get(key)
+        if blob is None:
+            blob = self._blobs[key] = _Blob(key, estimate_size(value), value)
+            self.memory_bytes += blob.size
+        else:
+            self._touch(blob, value)
+        return blob
+
+    def _touch(self, blob, value):
+        """Đánh dấu blob vừa dùng; đang nằm trên đĩa thì dùng luôn value (cùng nội dung) thay vì đọc lại file."""
+        if blob.value is None:
+            blob.value = value
+            self.memory_bytes += blob.size
+        self._blobs.move_to_end(blob.key)
+
+    def put(self, session_id, name, value, version=None):
+        """
+        Lưu value dưới tên name của phiên; nội dung đã có trong kho thì dùng chung bản sẵn có.
+        Tên đang giữ đúng đối tượng value (hoặc cùng version khác None do nơi gọi tự quản lý) thì
+        không pickle và băm lại: giá trị trong kho được coi là không bị sửa tại chỗ.
+        """
+        with self._lock:
+            session = self._session(session_id)
+            old_entry = session["items"].get(name)
+            blob = self._blobs.get(old_entry) if isinstance(old_entry, str) else None
+            if blob is not None and (
+                (version is not None and session["versions"].get(name) == version)
+                or (version is None and name not in session["versions"] and blob.holds(value))
+            ):
+                self.unchanged_puts += 1
+            else:
+                blob = self._add(value)
+                blob.refs.add((session_id, name))
+                session["items"][name] = blob.key
+                if old_entry is not None and old_entry != blob.key:
+                    self._unref_entry(session_id, name, old_entry)
+                if version is None:
+                    session["versions"].pop(name, None)
+                else:
+                    session["versions"][name] = version
+            self._touch(blob, value)
+            session["items"].move_to_end(name)
+            self._enforce(session_id, blob.key)
+        return blob.key
+
+    def append(self, session_id, name, item):
+        """
+        Thêm item vào cuối danh sách name của phiên. Mỗi phần tử là một mục riêng trong kho nên
+        chi phí chỉ theo cỡ item, không theo độ dài danh sách; get trả về danh sách đầy đủ.
+        """
+        with self._lock:
+            session = self._session(session_id)
+            entry = session["items"].get(name)
+            if not isinstance(entry, list):
+                # Chưa có, hoặc đang lưu nguyên cả danh sách (qua put): tách thành từng phần tử một lần
+                existing = [] if entry is None else list(self.get(session_id, name, []))
+                if name in session["items"]:
+                    self._unref_entry(session_id, name, session["items"].pop(name))
+                    session["versions"].pop(name, None)
+                entry = session["items"][name] = []
+                for value in existing:
+                    self._add_item(session_id, name, entry, value)
+            key = self._add_item(session_id, name, entry, item)
+            session["items"].move_to_end(name)
+            self._enforce(session_id, key)
+
+    def _add_item(self, session_id, name, entry, item):
+        blob = self._add(item)
+        blob.refs.add((session_id, name, len(entry)))
+        entry.append(blob.key)
+        return blob.key
+
+    def _load(self, blob):
+        """Nạp lại blob đang nằm trên đĩa; False nếu mất file tạm (ví dụ bị dọn thư mục tạm)."""
+        try:
+            with open(self._spill_path(blob.key), "rb") as f:
+                blob.value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+        self.memory_bytes += blob.size
+        self.loads += 1
+        return True
+
+    def get(self, session_id, name, default=None):
+        with self._lock:
+            session = self._session(session_id)
+            entry = session["items"].get(name)
+            if entry is None:
+                return default
+            session["items"].move_to_end(name)
+            keys = entry if isinstance(entry, list) else [entry]
+            loaded = False
+            for key in keys:
+                self._blobs.move_to_end(key)
+                blob = self._blobs[key]
+                if blob.value is None:
+                    if not self._load(blob):
+                        # Mất file tạm: coi như mục đã bị thu hồi
+                        self._unref_entry(session_id, name, entry)
+                        del session["items"][name]
+                        session["versions"].pop(name, None)
+                        return default
+                    loaded = True
+            if loaded:
+                self._enforce(session_id, keys)
+            if isinstance(entry, list):
+                return [self._blobs[key].value for key in entry]
+            return self._blobs[entry].value
+
+    def delete(self, session_id, name):
+        with self._lock:
+            session = self._session(session_id)
+            session["versions"].pop(name, None)
+            entry = session["items"].pop(name, None)
+            if entry is not None:
+                self._unref_entry(session_id, name, entry)
+
+    def contains(self, session_id, name):
+        with self._lock:
+            return name in self._session(session_id)["items"]
+
+    def _unref_entry(self, session_id, name, entry):
+        """Bỏ tham chiếu của tên name tới khóa (hoặc danh sách khóa) entry."""
+        if isinstance(entry, list):
+            for index, key in enumerate(entry):
+                self._unref(key, (session_id, name, index))
+        else:
+            self._unref(entry, (session_id, name))
+
+    def _unref(self, key, ref):
+        blob = self._blobs.get(key)
+        if blob is None:
+            return
+        blob.refs.discard(ref)
+        if blob.refs:
+            return
+        del self._blobs[key]
+        if blob.value is not None:
+            self.memory_bytes -= blob.size
+        if blob.on_disk:
+            try:
+                os.remove(self._spill_path(key))
+            except OSError:
+                pass
+
+    def _spill(self, blob):
+        """Chuyển một mục xuống đĩa; trả về False nếu không ghi được (mục giữ nguyên trong bộ nhớ)."""
+        if not blob.on_disk:
+            # Ghi ra file tạm rồi đổi tên để không bao giờ để lại file dở dang
+            fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(blob.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._spill_path(blob.key))
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return False
+            blob.on_disk = True
+        blob.value = None
+        self.memory_bytes -= blob.size
+        self.spills += 1
+        return True
+
+    def _enforce(self, session_id, keep):
+        """Chuyển xuống đĩa các mục ít dùng nhất cho tới khi phiên và cả kho nằm trong ngân sách."""
+        # Mục vừa dùng (keep: một khóa hoặc danh sách khóa) luôn được giữ trong bộ nhớ, kể cả khi vượt ngân sách
+        keep = set(keep) if isinstance(keep, list) else {keep}
+        keys = list(dict.fromkeys(self._session_keys(self._sessions[session_id])))
+        charged = sum(self._blobs[key].size for key in keys if self._blobs[key].value is not None)
+        for key in keys:
+            if charged <= self.session_budget:
+                break
+            blob = self._blobs[key]
+            if key not in keep and blob.value is not None and self._spill(blob):
+                charged -= blob.size
+        if self.memory_bytes > self.memory_budget:
+            for blob in list(self._blobs.values()):
+                if self.memory_bytes <= self.memory_budget:
+                    break
+                if blob.key not in keep and blob.value is not None:
+                    self._spill(blob)
+
+    def evict_idle(self):
+        """Thu hồi các phiên không hoạt động quá idle_seconds; trả về số phiên bị thu hồi."""
+        with self._lock:
+            now = self._clock()
+            idle = [sid for sid, session in self._sessions.items() if now - session["last_seen"] > self.idle_seconds]
+            for sid in idle:
+                for name, entry in self._sessions.pop(sid)["items"].items():
+                    self._unref_entry(sid, name, entry)
+            self.evicted_sessions += len(idle)
+            return len(idle)
+
+    @staticmethod
+    def _session_keys(session):
+        """Các khóa mà phiên tham chiếu, theo thứ tự LRU của tên (có thể lặp lại)."""
+        for entry in session["items"].values():
+            if isinstance(entry, list):
+                yield from entry
+            else:
+                yield entry
+
+    def _usage(self, session_id, session, now):
+        keys = set(self._session_keys(session))
+        blobs = [self._blobs[key] for key in keys]
+        return SessionUsage(
+            session_id=session_id,
+            idle_seconds=now - session["last_seen"],
+            items=len(session["items"]),
+            memory_bytes=sum(blob.size for blob in blobs if blob.value is not None),
+            disk_bytes=sum(blob.size for blob in blobs if blob.value is None),
+            shared_items=sum(1 for blob in blobs if len({ref[0] for ref in blob.refs}) > 1),
+        )
+
+    def session_usage(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id) or {"last_seen": self._clock(), "items": {}}
+            return self._usage(session_id, session, self._clock())
+
+    def usage(self):
+        """SessionUsage của mọi phiên, phiên tốn bộ nhớ nhất trước."""
+        with self._lock:
+            now = self._clock()
+            rows = [self._usage(sid, session, now) for sid, session in self._sessions.items()]
+        return sorted(rows, key=lambda row: row.memory_bytes, reverse=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "items": len(self._blobs),
+                "shared_items": sum(1 for blob in self._blobs.values() if len({ref[0] for ref in blob.refs}) > 1),
+                "memory_bytes": self.memory_bytes,
+                "disk_bytes": sum(blob.size for blob in self._blobs.values() if blob.value is None),
+                "spills": self.spills,
+                "loads": self.loads,
+                "evicted_sessions": self.evicted_sessions,
+                "unchanged_puts": self.unchanged_puts,
+            }
+
+class SessionArtifacts:
+    """Các mục lớn của một phiên, dùng như dict. Giá trị trả về được dùng chung: không sửa tại chỗ."""
+
+    def __init__(self, store, session_id):
+        self.store = store
+        self.session_id = session_id
+
+    def get(self, name, default=None):
+        return self.store.get(self.session_id, name, default)
+
+    def __getitem__(self, name):
+        value = self.store.get(self.session_id, name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name, value):
+        self.store.put(self.session_id, name, value)
+
+    def put(self, name, value, version=None):
+        """Như artifacts[name] = value, kèm version của nơi gọi (xem SessionStore.put)."""
+        self.store.put(self.session_id, name, value, version)
+
+    def append(self, name, item):
+        """Thêm item vào danh sách name (xem SessionStore.append)."""
+        self.store.append(self.session_id, name, item)
+
+    def __delitem__(self, name):
+        self.store.delete(self.session_id, name)
+
+    def __contains__(self, name):
+        return self.store.contains(self.session_id, name)
+
+    def pop(self, name, default=None):
+        value = self.get(name, default)
+        self.store.delete(self.session_id, name)
+        return value
+
+    def usage(self):
+        return self.store.session_usage(self.session_id)
+
+_MISSING = object()
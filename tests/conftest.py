@@ -0,0 +1,4 @@
+import os
+import sys
+# Chạy được từ mọi thư mục: các module của dự án nằm ở thư mục gốc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
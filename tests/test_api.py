@@ -0,0 +1,130 @@
+"""Các điểm cuối của api.py, gọi thẳng ứng dụng ASGI (không mở cổng mạng): kết quả như core, kiểm tra dữ liệu vào 400/422."""
+import asyncio
+import functools
+import json
+from io import BytesIO
+import openpyxl
+import pytest
+import api
+import core
+import downloads
+from benchmarks.synthetic import build_plan_docx
+
+def call(method, path, body=b"", query=""):
+    """(mã trạng thái, tiêu đề, thân phản hồi) của một yêu cầu; chạy cả vòng đời ứng dụng với API_WORKERS=0."""
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"content-length", str(len(body)).encode())], "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response = {"headers": {}, "body": b""}
+
+    async def receive():
+        # Sau thân yêu cầu: máy khách chờ phản hồi, không ngắt kết nối
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    async def run():
+        async with api.lifespan(api.app):
+            await api.app(scope, receive, send)
+
+    asyncio.run(run())
+    return response["status"], response["headers"], response["body"]
+
+@pytest.fixture(autouse=True)
+def in_process(monkeypatch):
+    monkeypatch.setenv("API_WORKERS", "0")
+
+TERMS = {"so_tien_vay": 3e8, "lai_suat": 8.5, "thoi_gian_vay": 24, "phuong_thuc_tra_no": "goc_deu"}
+
+def test_repayment_schedule_matches_core():
+    status, _, body = call("POST", "/lich-tra-no", TERMS)
+    assert status == 200
+    result = json.loads(body)
+    df = core.calculate_repayment_schedule(3e8, 8.5, 24, "goc_deu", 0, 3)
+    assert result["lich_tra_no"]["du_no_cuoi_ky"] == df["Dư nợ cuối kỳ"].tolist()
+    assert result["tong_hop"] == json.loads(json.dumps(core.summarize_schedule(df)))
+
+def test_ratios_match_core():
+    payload = {"so_tien_vay": 3e8, "tong_nhu_cau_von": 4e8, "von_doi_ung": 1e8, "tsdb_gia_tri": 5e8}
+    status, _, body = call("POST", "/chi-so", payload)
+    assert status == 200
+    assert json.loads(body)["chi_so"] == core.calculate_ratios(3e8, 4e8, 1e8, 5e8)
+
+@pytest.mark.parametrize("change, status", [
+    ({"so_tien_vay": None}, 422),
+    ({"lai_suat": "8.5"}, 422),
+    ({"phuong_thuc_tra_no": "khong_co"}, 422),
+    ({"so_tien_vay": 1e308}, 400),
+    ({"so_tien_vay": 0}, 400),
+    ({"lai_suat": 150}, 400),
+    ({"thoi_gian_vay": 12.5}, 400),
+    ({"thoi_gian_vay": 10_000}, 400),
+    ({"an_han_goc": -1}, 400),
+    ({"chu_ky_tra_goc": 0}, 400),
+])
+def test_invalid_loan_terms(change, status):
+    payload = {key: value for key, value in {**TERMS, **change}.items() if value is not None}
+    got, _, body = call("POST", "/lich-tra-no", payload)
+    assert got == status
+    assert "loi" in json.loads(body)
+
+def test_non_finite_and_malformed_json_are_rejected():
+    assert call("POST", "/lich-tra-no", b'{"so_tien_vay": Infinity, "lai_suat": 8, "thoi_gian_vay": 12}')[0] == 400
+    assert call("POST", "/chi-so", b'{"so_tien_vay": NaN}')[0] == 400
+    assert call("POST", "/chi-so", b"khong phai json")[0] == 400
+    assert call("POST", "/chi-so", b"[1, 2]")[0] == 400
+
+def test_excel_returns_workbook():
+    status, headers, body = call("POST", "/excel", {**TERMS, "ho_ten": "Nguyen Van A", "tsdb_gia_tri": 5e8})
+    assert status == 200
+    assert headers["content-type"] == api.XLSX_MIME
+    assert 'filename="KeHoachTraNo_NguyenVanA.xlsx"' in headers["content-disposition"]
+    assert openpyxl.load_workbook(BytesIO(body)).sheetnames
+
+@pytest.mark.parametrize("change", [{"ho_ten": 123}, {"cccd": ["0123"]}, {"muc_dich_vay": "a\x01b"},
+                                    {"ho_ten": "x" * (api.MAX_TEXT_LENGTH + 1)}])
+def test_excel_rejects_invalid_text(change):
+    assert call("POST", "/excel", {**TERMS, **change})[0] == 400
+
+def test_extract_docx():
+    data, _ = build_plan_docx(pages=2, seed=0)
+    status, _, body = call("POST", "/trich-xuat", data, query="van_ban=1")
+    assert status == 200
+    result = json.loads(body)
+    assert result["thong_tin"] == core.parse_docx(BytesIO(data))
+    assert result["van_ban"]
+    assert call("POST", "/trich-xuat", b"")[0] == 400
+    assert call("POST", "/trich-xuat", b"khong phai docx")[0] == 422
+
+def test_download_by_token(monkeypatch, tmp_path):
+    monkeypatch.setattr(downloads, "resolve", functools.partial(downloads.resolve, directory=str(tmp_path)))
+    content = bytes(range(256)) * 1000
+    with downloads.new_download("BaoCao.zip", directory=str(tmp_path)) as (token, path):
+        with open(path, "wb") as f:
+            f.write(content)
+    status, headers, body = call("GET", f"/tai-xuong/{token}")
+    assert status == 200 and body == content
+    assert "BaoCao.zip" in headers["content-disposition"]
+    assert call("GET", "/tai-xuong/khong-ton-tai")[0] == 404
+    assert call("GET", "/tai-xuong/..")[0] == 404
+    downloads.discard(token, directory=str(tmp_path))
+    assert call("GET", f"/tai-xuong/{token}")[0] == 404
+
+def test_health_and_metrics():
+    assert call("GET", "/health")[:1] == (200,)
+    call("POST", "/chi-so", {"so_tien_vay": 1, "tong_nhu_cau_von": 1, "von_doi_ung": 0, "tsdb_gia_tri": 1})
+    status, _, body = call("GET", "/metrics")
+    assert status == 200
+    assert "/chi-so" in body.decode()
@@ -0,0 +1,60 @@
+"""Giảm mẫu LTTB (vector hóa từng nhóm) so với bản thuần Python theo bài gốc của Steinarsson; cache biểu đồ."""
+import math
+import numpy as np
+import pytest
+from charts import FigureCache, balance_figure, data_hash, downsample, lttb
+
+def reference_lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets, viết lại từng điểm một như mã tham khảo của thuật toán."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = math.floor((i + 1) * every) + 1
+        avg_end = min(math.floor((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        best, best_area = None, -1.0
+        for j in range(math.floor(i * every) + 1, math.floor((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+@pytest.mark.parametrize("n, threshold", [(10, 3), (101, 10), (1000, 97), (4800, 1000), (12345, 500)])
+def test_matches_reference(n, threshold):
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype=float)
+    y = np.cumsum(rng.normal(size=n))
+    assert lttb(x, y, threshold).tolist() == reference_lttb(x.tolist(), y.tolist(), threshold)
+
+def test_short_series_and_small_thresholds_are_kept():
+    assert lttb(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(np.arange(5), np.arange(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+def test_downsample_keeps_extremes_and_order():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[4321] = 50
+    dx, dy = downsample(x, y, 200)
+    assert len(dx) == 200 and dx[0] == 0 and dx[-1] == 9999
+    assert np.all(np.diff(dx) > 0)
+    assert 4321 in dx
+
+def test_figure_cache_reuses_built_figures():
+    cache = FigureCache(max_entries=1)
+    periods, balances = np.arange(5001), np.linspace(1e9, 0, 5001)
+    key = data_hash(periods, balances)
+    fig, stats = cache.get_or_build(key, lambda: balance_figure(periods, balances))
+    again, _ = cache.get_or_build(key, lambda: pytest.fail("không được dựng lại"))
+    assert again is fig
+    assert stats.source_points == 5001 and stats.points < stats.source_points
+    cache.get_or_build("khac", lambda: balance_figure(periods[:10], balances[:10]))
+    assert cache.hits == 1 and cache.misses == 2
+    assert data_hash(periods, balances, extra="khac") != key
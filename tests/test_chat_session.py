@@ -0,0 +1,78 @@
+"""Phiên trò chuyện: dưới ngân sách gửi đúng lịch sử như cách cũ; vượt ngân sách thì nén lượt cũ vào bản tóm tắt."""
+import types
+from chat_session import ChatSession
+from llm_cache import LLMCache
+from retrieval import estimate_tokens
+
+class FakeModel:
+    """Model giả: ghi lại nội dung mỗi lần gọi, trả lời bằng số thứ tự lần gọi."""
+
+    model_name = "gia-lap"
+
+    def __init__(self, fail_summary=False):
+        self.requests = []
+        self.fail_summary = fail_summary
+
+    def generate_content(self, contents, generation_config=None):
+        self.requests.append(contents)
+        if self.fail_summary and isinstance(contents, str):
+            raise RuntimeError("không tóm tắt được")
+        prefix = "tóm tắt" if isinstance(contents, str) else "trả lời"
+        return types.SimpleNamespace(text=f"{prefix} {len(self.requests)}", usage_metadata=None)
+
+def legacy_contents(chat_history, message):
+    """Cách cũ: gửi lại toàn bộ lịch sử cùng tin nhắn mới."""
+    contents = [{"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]}
+                for m in chat_history]
+    return contents + [{"role": "user", "parts": [message]}]
+
+def test_matches_full_history_under_budget():
+    model = FakeModel()
+    chat = ChatSession(model, token_budget=10_000)
+    history = []
+    for i in range(6):
+        question = f"Câu hỏi {i}"
+        expected = legacy_contents(history, f"[ngữ cảnh] {question}")
+        answer = chat.send(question, f"[ngữ cảnh] {question}")
+        assert model.requests[-1] == expected
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+    assert chat.summary == ""
+
+def test_from_history_skips_failed_turns():
+    history = [
+        {"role": "user", "content": "hỏi 1"}, {"role": "assistant", "content": "đáp 1"},
+        {"role": "user", "content": "hỏi 2"}, {"role": "assistant", "content": "lỗi", "error": True},
+        {"role": "user", "content": "hỏi 3"}, {"role": "assistant", "content": "đáp 3"},
+    ]
+    chat = ChatSession.from_history(FakeModel(), history)
+    assert [turn["text"] for turn in chat.turns] == ["hỏi 1", "đáp 1", "hỏi 3", "đáp 3"]
+    assert chat.tokens == sum(estimate_tokens(turn["text"]) for turn in chat.turns)
+
+def test_compacts_old_turns_into_summary():
+    model = FakeModel()
+    chat = ChatSession(model, token_budget=200, keep_recent=4)
+    for i in range(20):
+        chat.send("x" * 150 + str(i), "x" * 150 + str(i))
+        # Lịch sử gửi kèm luôn bị chặn trên: ngân sách + một lượt hỏi - đáp mới
+        assert chat.tokens <= 200 + 2 * estimate_tokens("x" * 152) + estimate_tokens(chat.summary)
+    assert chat.summary.startswith("tóm tắt")
+    contents = chat.contents("câu mới")
+    assert contents[0]["parts"][0].endswith(chat.summary)
+    assert len(chat.turns) < 2 * 20
+
+def test_failed_summary_still_drops_old_turns():
+    chat = ChatSession(FakeModel(fail_summary=True), token_budget=100, keep_recent=2)
+    for i in range(6):
+        chat.send("y" * 200, "y" * 200)
+    assert chat.summary == ""
+    assert len(chat.turns) <= 4
+
+def test_cache_key_includes_history():
+    cache = LLMCache(":memory:")
+    model = FakeModel()
+    first, second = ChatSession(model), ChatSession(model)
+    assert first.send("hỏi", "hỏi", cache=cache) == second.send("hỏi", "hỏi", cache=cache)
+    assert len(model.requests) == 1
+    first.send("tiếp", "tiếp", cache=cache)
+    ChatSession(model).send("tiếp", "tiếp", cache=cache)
+    assert len(model.requests) == 3
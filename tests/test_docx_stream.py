@@ -0,0 +1,63 @@
+"""Đọc .docx dạng luồng (docx_stream) so với python-docx, kể cả nội dung lồng nhau."""
+from io import BytesIO
+import pytest
+from docx import Document
+from docx.oxml import parse_xml
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from benchmarks.synthetic import build_plan_docx
+from core import extract_text_from_docx
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+MC = 'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+
+def python_docx_text(data):
+    """Cách đọc cũ: đoạn văn ở thân tài liệu, mỗi dòng bảng là các ô nối bằng tab."""
+    doc = Document(BytesIO(data))
+    lines = []
+    for child in doc.element.body.iterchildren():
+        if child.tag.endswith("}p"):
+            lines.append(Paragraph(child, doc).text)
+        elif child.tag.endswith("}tbl"):
+            lines.extend("\t".join(cell.text for cell in row.cells) for row in Table(child, doc).rows)
+    return "\n".join(lines)
+
+def saved(doc):
+    output = BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+@pytest.mark.parametrize("pages, seed, financial_at_end", [(1, 0, True), (3, 1, False), (10, 2, True)])
+def test_matches_python_docx(pages, seed, financial_at_end):
+    data, _ = build_plan_docx(pages, seed, financial_at_end)
+    assert extract_text_from_docx(BytesIO(data)) == python_docx_text(data)
+
+def test_text_box_and_nested_table():
+    doc = Document()
+    doc.add_paragraph("Trước")
+    paragraph = doc.add_paragraph("Phần đầu ")
+    # Khung văn bản có cả bản vẽ mới (Choice) và bản dự phòng (Fallback) như Word ghi ra
+    paragraph._p.append(parse_xml(
+        f'<w:r {W} {MC}><mc:AlternateContent><mc:Choice Requires="wps"><w:drawing><w:txbxContent>'
+        '<w:p><w:r><w:t>Trong khung</w:t></w:r></w:p></w:txbxContent></w:drawing></mc:Choice>'
+        '<mc:Fallback><w:pict><w:txbxContent><w:p><w:r><w:t>Trong khung</w:t></w:r></w:p></w:txbxContent>'
+        '</w:pict></mc:Fallback></mc:AlternateContent></w:r>'))
+    paragraph.add_run("phần cuối")
+    table = doc.add_table(rows=1, cols=3)
+    table.cell(0, 0).text = "Nhãn"
+    inner = table.cell(0, 1).add_table(rows=2, cols=2)
+    for i in range(2):
+        for j in range(2):
+            inner.cell(i, j).text = f"c{i}{j}"
+    table.cell(0, 2).text = "Sau"
+    doc.add_paragraph("Kết thúc")
+
+    # Đoạn văn bên ngoài giữ nguyên, khung văn bản đọc một lần (bỏ Fallback) ngay sau đoạn chứa nó;
+    # bảng lồng thành các dòng nối bằng tab trong ô chứa nó, dòng ngoài vẫn đủ ba ô
+    assert extract_text_from_docx(BytesIO(saved(doc))) == (
+        "Trước\nPhần đầu phần cuối\nTrong khung\nNhãn\t\nc00\tc01\nc10\tc11\n\tSau\nKết thúc"
+    )
+
+def test_empty_document():
+    data = saved(Document())
+    assert extract_text_from_docx(BytesIO(data)) == python_docx_text(data) == ""
@@ -0,0 +1,27 @@
+"""Ghi workbook: sheet vượt giới hạn số dòng được chia sang các sheet tiếp theo."""
+from io import BytesIO
+from openpyxl import load_workbook
+from excel_export import FORMAT_VND, SheetSpec, write_workbook
+
+def sheet_rows(data):
+    wb = load_workbook(BytesIO(data))
+    return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in wb}
+
+def test_rolls_over_to_numbered_sheets():
+    output = BytesIO()
+    write_workbook(output, [
+        SheetSpec("LichTraNo", [("Kỳ", FORMAT_VND, 8), ("Ghi chú", None, 10)], ((i, f"k{i}") for i in range(7))),
+        SheetSpec("TongHop", [("Chỉ tiêu", None, 10)], iter([["a"]])),
+    ], max_rows=4)
+    sheets = sheet_rows(output.getvalue())
+    header = ["Kỳ", "Ghi chú"]
+    assert list(sheets) == ["LichTraNo", "LichTraNo_2", "LichTraNo_3", "TongHop"]
+    assert sheets["LichTraNo"] == [header, [0, "k0"], [1, "k1"], [2, "k2"]]
+    assert sheets["LichTraNo_2"] == [header, [3, "k3"], [4, "k4"], [5, "k5"]]
+    assert sheets["LichTraNo_3"] == [header, [6, "k6"]]
+    assert sheets["TongHop"] == [["Chỉ tiêu"], ["a"]]
+
+def test_exact_fit_does_not_add_sheet():
+    output = BytesIO()
+    write_workbook(output, [SheetSpec("A", [("x", None, 8)], ([i] for i in range(3)))], max_rows=4)
+    assert list(sheet_rows(output.getvalue())) == ["A"]
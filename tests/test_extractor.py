@@ -0,0 +1,46 @@
+"""
+FieldExtractor (một lượt quét) phải cho đúng kết quả của 16 biểu thức chính quy cũ,
+cả khi trích từ toàn văn (extract) lẫn khi đọc dần từng dòng (extract_stream).
+"""
+import random
+import pytest
+from benchmarks.bench_extractor import SCENARIOS, build_plan_text, legacy_parse_info_from_text
+from extractor import get_extractor
+
+# Mảnh văn bản ghép ngẫu nhiên: nhãn của mọi trường (kể cả viết hoa, lặp lại), số liệu, dấu câu
+# và xuống dòng ở vị trí bất kỳ, đoạn dài để thử các trường có phạm vi tìm kiếm rộng
+PIECES = [
+    "Họ và tên:", "HỌ VÀ TÊN:", "CCCD số:", "Nơi cư trú:", "Số điện thoại:", "Mục đích vay:", "- Chi phí kinh doanh:",
+    "Vốn đối ứng", "Chênh lệch thu chi:", "+  Chênh lệch thu chi:", "Lãi suất đề nghị:", "Thời hạn cho vay:",
+    "Tài sản bảo đảm:", "III. Thông tin", "Tổng tài sản đảm bảo:", "+Doanh thu của phương án:",
+    "+  Chi phí kinh doanh:", "- Từ nguồn thu của phương án kinh doanh:", " 1.500.000 đồng", "đồng,", "đồng,2.000",
+    "12", " 7,5%/năm", " 24 tháng", "123456789", ".", ",", "\n", " ", "Nguyễn Văn A", "xã Thạch Hà", "đồng",
+    "lorem ipsum dolor ", "x" * 300,
+]
+
+def random_text(rng, n_pieces):
+    return "".join(rng.choice(PIECES) for _ in range(n_pieces))
+
+def check(text):
+    expected = legacy_parse_info_from_text(text)
+    extractor = get_extractor()
+    assert extractor.extract(text) == expected
+    assert extractor.extract_stream(iter(text.split("\n"))) == expected
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+@pytest.mark.parametrize("pages", [1, 20])
+def test_plan_text(scenario, pages):
+    check(build_plan_text(pages, scenario))
+
+def test_empty_text():
+    check("")
+
+def test_random_short_texts():
+    rng = random.Random(0)
+    for _ in range(1500):
+        check(random_text(rng, rng.randint(1, 40)))
+
+def test_random_long_texts():
+    rng = random.Random(1)
+    for _ in range(60):
+        check(random_text(rng, rng.randint(200, 1500)))
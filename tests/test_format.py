@@ -0,0 +1,31 @@
+"""format_currency_array phải cho đúng chuỗi của format_currency cho từng giá trị."""
+import numpy as np
+import pytest
+from core import format_currency, format_currency_array
+
+EDGE_VALUES = [
+    0.0, -0.0, 0.5, 1.5, 2.5, -2.5, 0.125, 999.5, 999.9996, -1234567.891, 1e15 + 0.5,
+    2.0 ** 53, 9.2e18, 9.3e18, -1e20, 1.7e308, 5e-324,
+]
+
+def expected(values, decimal_places):
+    return [format_currency(float(v), decimal_places) if np.isfinite(v) else "0" for v in values]
+
+@pytest.mark.parametrize("decimal_places", [0, 1, 2, 3])
+def test_edge_values(decimal_places):
+    assert format_currency_array(EDGE_VALUES, decimal_places).tolist() == expected(EDGE_VALUES, decimal_places)
+
+@pytest.mark.parametrize("decimal_places", [0, 2])
+def test_random_values(decimal_places):
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(0, 1e9, 20000), rng.uniform(-1e4, 1e4, 20000).round(2), rng.integers(-10**12, 10**12, 2000)])
+    assert format_currency_array(values, decimal_places).tolist() == expected(values, decimal_places)
+
+def test_non_finite_values_become_zero():
+    assert format_currency_array([np.nan, np.inf, -np.inf, 1000.0]).tolist() == ["0", "0", "0", "1.000"]
+
+def test_shape_is_preserved():
+    result = format_currency_array(np.array([[1.0, 2e19], [-3000.0, 4.5]]))
+    assert result.shape == (2, 2)
+    assert result.tolist() == [["1", "20.000.000.000.000.000.000"], ["-3.000", "4"]]
+    assert format_currency_array([]).shape == (0,)
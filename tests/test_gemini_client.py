@@ -0,0 +1,151 @@
+"""
+gemini_client: mỗi client gửi đúng API key của mình tới máy chủ giả lập mà không đụng cấu hình
+toàn cục; yêu cầu giống hệt đang chờ được gộp, lỗi tạm thời được thử lại, tốc độ bị giới hạn.
+"""
+import threading
+import time
+import types
+import google.generativeai as genai
+import google.generativeai.client as genai_client
+import pytest
+from google.api_core import exceptions as api_exceptions
+import gemini_client
+from benchmarks.gemini_stub import start_stub
+
+@pytest.fixture
+def stub(monkeypatch):
+    server, endpoint = start_stub(latency=0.0, chunks=3)
+    monkeypatch.setenv("GEMINI_API_ENDPOINT", endpoint)
+    yield server
+    server.shutdown()
+
+def test_requests_use_each_clients_own_key(stub):
+    first = gemini_client.create_client("key-A", "gemini-2.0-flash-exp")
+    second = gemini_client.create_client("key-B", "gemini-2.0-flash-exp")
+    assert first.generate_content("xin chào A").text.startswith("Phản hồi giả lập")
+    assert second.generate_content("xin chào B").text.startswith("Phản hồi giả lập")
+    streamed = "".join(chunk.text for chunk in first.generate_content("luồng A", stream=True))
+    assert streamed.startswith("Phản hồi giả lập")
+    assert first.count_tokens("đếm token").total_tokens > 0
+    assert stub.state.api_keys == ["key-A", "key-B", "key-A", "key-A"]
+    # Không ghi API key vào cấu hình toàn cục của thư viện
+    assert genai_client._client_manager.client_config["client_options"].api_key is None
+
+def test_clients_of_same_key_share_limiter(stub):
+    first = gemini_client.create_client("key-C", "gemini-2.0-flash-exp")
+    second = gemini_client.create_client("key-C", "gemini-1.5-flash")
+    other = gemini_client.create_client("key-D", "gemini-2.0-flash-exp")
+    assert first.limiter is second.limiter
+    assert first.limiter is not other.limiter
+
+def test_fails_loudly_without_private_client_slot(monkeypatch):
+    class Model(genai.GenerativeModel):
+        def __init__(self, model_name):
+            super().__init__(model_name)
+            del self._client
+    monkeypatch.setattr(gemini_client.genai, "GenerativeModel", Model)
+    with pytest.raises(RuntimeError, match="client riêng"):
+        gemini_client.create_model("key-A", "gemini-2.0-flash-exp")
+
+class FakeModel:
+    """Model giả: đếm số lần gọi, lỗi failures lần đầu, chờ release trước khi trả lời."""
+
+    model_name = "gia-lap"
+
+    def __init__(self, failures=0, error=api_exceptions.TooManyRequests("hết hạn mức")):
+        self.calls = 0
+        self.failures = failures
+        self.error = error
+        self.release = threading.Event()
+        self.release.set()
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            failing = self.calls <= self.failures
+        self.release.wait(5)
+        if failing:
+            raise self.error
+        if stream:
+            return iter([f"{contents}-{i}" for i in range(3)])
+        return f"trả lời {contents}"
+
+    def count_tokens(self, contents):
+        return len(contents)
+
+def fast_client(model, **kwargs):
+    return gemini_client.GeminiClient(model, gemini_client.Limiter(8, 6000, 100), sleep=lambda seconds: None, seed=0,
+                                      **kwargs)
+
+def run_concurrently(func, n):
+    results = [None] * n
+    def worker(i):
+        results[i] = func()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def test_identical_inflight_requests_are_coalesced():
+    model = FakeModel()
+    client = fast_client(model)
+    model.release.clear()
+    threads, results = run_concurrently(lambda: client.generate_content("câu hỏi"), 5)
+    # Yêu cầu đầu tiên đã tới model; chờ các luồng còn lại nhập vào nó rồi mới cho model trả lời
+    while model.calls == 0:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    model.release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["trả lời câu hỏi"] * 5
+    assert model.calls == 1
+    # Yêu cầu khác nhau không gộp; yêu cầu sau khi xong được gửi lại
+    assert client.generate_content("câu khác") == "trả lời câu khác"
+    assert client.generate_content("câu hỏi") == "trả lời câu hỏi"
+    assert model.calls == 3
+
+def test_coalesced_stream_is_shared():
+    model = FakeModel()
+    client = fast_client(model)
+    model.release.clear()
+    threads, results = run_concurrently(lambda: list(client.generate_content("luồng", stream=True)), 3)
+    time.sleep(0.2)
+    model.release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [["luồng-0", "luồng-1", "luồng-2"]] * 3
+    assert model.calls == 1
+
+def test_retries_transient_errors_with_bounded_backoff():
+    model = FakeModel(failures=3)
+    delays = []
+    client = gemini_client.GeminiClient(model, gemini_client.Limiter(8, 6000, 100), max_retries=5, base_delay=1,
+                                        max_delay=4, sleep=delays.append, seed=0)
+    assert client.generate_content("hỏi") == "trả lời hỏi"
+    assert model.calls == 4
+    assert len(delays) == 3
+    assert all(0 <= delay <= min(4, 2 ** attempt) for attempt, delay in enumerate(delays))
+
+def test_gives_up_after_max_retries_and_on_permanent_errors():
+    model = FakeModel(failures=10)
+    client = fast_client(model, max_retries=2)
+    with pytest.raises(api_exceptions.TooManyRequests):
+        client.generate_content("hỏi")
+    assert model.calls == 3
+    model = FakeModel(failures=1, error=api_exceptions.InvalidArgument("sai"))
+    with pytest.raises(api_exceptions.InvalidArgument):
+        fast_client(model).generate_content("hỏi")
+    assert model.calls == 1
+    assert "API Key" in gemini_client.describe_error(api_exceptions.PermissionDenied("x"))
+
+def test_token_bucket_limits_rate():
+    clock = types.SimpleNamespace(now=0.0)
+    def sleep(seconds):
+        clock.now += seconds
+    bucket = gemini_client.TokenBucket(rate=2, capacity=3, clock=lambda: clock.now, sleep=sleep)
+    waits = [bucket.acquire() for _ in range(7)]
+    # 3 lượt dồn đầu tiên không chờ, sau đó mỗi lượt cách nhau 1/rate giây
+    assert waits[:3] == [0, 0, 0]
+    assert clock.now == pytest.approx(2.0)
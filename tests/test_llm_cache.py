@@ -0,0 +1,72 @@
+"""Cache phản hồi LLM: thời hạn sống (TTL), xóa mục ít dùng nhất khi vượt dung lượng, không lưu lỗi."""
+import types
+import pytest
+import llm_cache
+from llm_cache import LLMCache, make_key
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(llm_cache, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+def counting_call(text):
+    calls = []
+    def call():
+        calls.append(1)
+        return text
+    return call, calls
+
+def test_hit_miss_and_bypass(clock):
+    cache = LLMCache(":memory:")
+    call, calls = counting_call("trả lời")
+    assert cache.cached_call("m", "hỏi", call) == "trả lời"
+    assert cache.cached_call("m", "hỏi", call) == "trả lời"
+    assert cache.cached_call("m", "hỏi", call, bypass=True) == "trả lời"
+    assert len(calls) == 2
+    assert {k: cache.stats()[k] for k in ("hits", "misses", "bypassed")} == {"hits": 1, "misses": 1, "bypassed": 1}
+
+def test_entries_expire_after_ttl(clock):
+    cache = LLMCache(":memory:", ttl_seconds=60)
+    call, calls = counting_call("trả lời")
+    cache.cached_call("m", "hỏi", call)
+    clock.now += 59
+    cache.cached_call("m", "hỏi", call)
+    assert len(calls) == 1
+    # Lần đọc gần đây không gia hạn TTL: hạn tính từ lúc tạo
+    clock.now += 2
+    cache.cached_call("m", "hỏi", call)
+    assert len(calls) == 2
+
+def test_evicts_least_recently_used_over_size_limit(clock):
+    cache = LLMCache(":memory:", max_bytes=250)
+    for name in ("a", "b", "c"):
+        cache.put(make_key("m", name), "m", name * 100)
+        clock.now += 1
+    # c vượt giới hạn nên a (dùng lâu nhất) bị xóa; đọc b thì b thành mục mới dùng
+    assert cache.get(make_key("m", "a")) is None
+    assert cache.get(make_key("m", "b")) == "b" * 100
+    clock.now += 1
+    cache.put(make_key("m", "d"), "m", "d" * 100)
+    assert cache.get(make_key("m", "b")) == "b" * 100
+    assert cache.get(make_key("m", "c")) is None
+    assert cache.stats()["bytes"] <= 250
+
+def test_errors_and_partial_streams_are_not_cached(clock):
+    cache = LLMCache(":memory:")
+    def failing():
+        raise RuntimeError("lỗi")
+    with pytest.raises(RuntimeError):
+        cache.cached_call("m", "hỏi", failing)
+    def broken_stream():
+        yield "phần đầu"
+        raise RuntimeError("đứt")
+    with pytest.raises(RuntimeError):
+        list(cache.cached_stream("m", "hỏi", broken_stream))
+    assert cache.stats()["entries"] == 0
+    assert list(cache.cached_stream("m", "hỏi", lambda: iter(["a", "b"]))) == ["a", "b"]
+    assert list(cache.cached_stream("m", "hỏi", lambda: iter(["x"]))) == ["ab"]
+
+def test_key_depends_on_model_prompt_and_settings():
+    assert make_key("m", "p", {"a": 1, "b": 2}) == make_key("m", "p", {"b": 2, "a": 1})
+    assert len({make_key("m", "p"), make_key("m2", "p"), make_key("m", "p2"), make_key("m", "p", {"t": 0.1})}) == 4
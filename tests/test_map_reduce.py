@@ -0,0 +1,88 @@
+"""Chia văn bản theo tiêu đề mục và phân tích map-reduce qua LLMCache (sửa một mục chỉ tóm tắt lại mục đó)."""
+import types
+import pytest
+from llm_cache import LLMCache
+from map_reduce import analyze_document, is_heading, split_sections
+from retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+class FakeModel:
+    """Model giả: ghi lại prompt, trả lời (thường hoặc dạng luồng) bằng số thứ tự lần gọi."""
+
+    model_name = "gia-lap"
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.prompts.append(prompt)
+        response = types.SimpleNamespace(text=f"kết quả {len(self.prompts)}", usage_metadata=None)
+        return iter([response]) if stream else response
+
+    def count_tokens(self, text):
+        return types.SimpleNamespace(total_tokens=estimate_tokens(text))
+
+def body(label, n_chars):
+    return "\n".join(f"nội dung {label} dòng {i} " + "x" * 60 for i in range(n_chars // 80 + 1))
+
+def document(sections):
+    return "\n".join(f"{heading}\n{body(heading, size)}" for heading, size in sections)
+
+@pytest.mark.parametrize("line", [
+    "I. THÔNG TIN KHÁCH HÀNG", "IV. Phương án kinh doanh", "PHẦN 2: TÀI CHÍNH", "Chương II", "Phụ lục 1",
+    "1. Thông tin chung", "2.3 Doanh thu", "4) Ý kiến", "  12. Điều khoản",
+])
+def test_heading_lines(line):
+    assert is_heading(line)
+
+@pytest.mark.parametrize("line", [
+    "1.500.000 đồng", "2024 năm tài chính", "c. Chi phí", "v.v. và các khoản khác", "Phần lớn doanh thu",
+    "iv. chữ thường", "3 tháng", "100. tỷ đồng", "IV.không cách",
+])
+def test_not_heading_lines(line):
+    assert not is_heading(line)
+
+def test_sections_start_at_headings_and_keep_all_text():
+    text = document([("I. MỞ ĐẦU", 2000), ("II. THỊ TRƯỜNG", 100), ("III. TÀI CHÍNH", 3000), ("IV. KẾT LUẬN", 50)])
+    sections = split_sections(text, max_tokens=6000, min_tokens=300)
+    # Mục ngắn hơn ngưỡng được ghép vào mục đứng trước
+    assert [section.splitlines()[0] for section in sections] == ["I. MỞ ĐẦU", "III. TÀI CHÍNH"]
+    assert "\n".join(sections) == text
+
+def test_major_headings_take_precedence_over_numbered_items():
+    text = document([("I. MỞ ĐẦU", 1500), ("1. Thông tin", 1500), ("2. Mục tiêu", 1500), ("II. TÀI CHÍNH", 1500)])
+    sections = split_sections(text, min_tokens=10)
+    assert [section.splitlines()[0] for section in sections] == ["I. MỞ ĐẦU", "II. TÀI CHÍNH"]
+
+def test_oversized_section_is_split_within_itself():
+    text = document([("I. MỞ ĐẦU", 500 * CHARS_PER_TOKEN), ("II. PHỤ LỤC", 5000 * CHARS_PER_TOKEN)])
+    sections = split_sections(text, max_tokens=1000, min_tokens=10)
+    assert sections[0].startswith("I. MỞ ĐẦU") and sections[1].startswith("II. PHỤ LỤC")
+    assert all(len(section) <= 1000 * CHARS_PER_TOKEN for section in sections)
+    assert all("I. MỞ ĐẦU" not in section for section in sections[1:])
+
+def test_editing_one_section_changes_only_its_part():
+    layout = [(f"{i}. Mục số {i}", 400 + 700 * (i % 3)) for i in range(1, 12)]
+    before = split_sections(document(layout))
+    edited = document(layout).replace("nội dung 3. Mục số 3 dòng 0 x", "nội dung 3. Mục số 3 đã sửa x")
+    after = split_sections(edited)
+    assert len(before) == len(after)
+    assert sum(a != b for a, b in zip(before, after)) == 1
+
+def test_analyze_document_small_text_sends_full_prompt():
+    model = FakeModel()
+    pieces = list(analyze_document(model, "văn bản ngắn", "PROMPT ĐẦY ĐỦ", LLMCache(":memory:")))
+    assert pieces == ["kết quả 1"] and model.prompts == ["PROMPT ĐẦY ĐỦ"]
+
+def test_analyze_document_map_reduce_reuses_cached_sections():
+    layout = [(f"{roman}. MỤC {roman}", 30_000) for roman in ("I", "II", "III", "IV", "V", "VI")]
+    text = document(layout)
+    model = FakeModel()
+    cache = LLMCache(":memory:")
+    list(analyze_document(model, text, "không dùng", cache, max_prompt_tokens=20_000, concurrency=2))
+    n_sections = len(split_sections(text))
+    assert len(model.prompts) == n_sections + 1
+    assert "Phần 1:" in model.prompts[-1]
+    # Sửa một mục: chỉ tóm tắt lại mục đó, rồi gộp lại
+    edited = text.replace("nội dung III. MỤC III dòng 5 x", "nội dung III. MỤC III đã sửa x")
+    list(analyze_document(model, edited, "không dùng", cache, max_prompt_tokens=20_000))
+    assert len(model.prompts) == n_sections + 1 + 2
@@ -0,0 +1,66 @@
+"""Dự báo dòng tiền danh mục (tính theo khối, cộng dồn bằng bincount) so với vòng lặp từng khoản vay."""
+import numpy as np
+import pandas as pd
+import pytest
+from core import calculate_repayment_schedule
+from portfolio import Portfolio, project_cash_flows
+from schedule import METHODS
+
+def random_frame(n_loans, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "so_tien_vay": rng.uniform(1e7, 5e9, n_loans).round(-6),
+        # Bội số của 0,25: biểu diễn đúng bằng float32 như cột lãi suất của Portfolio
+        "lai_suat": rng.integers(20, 61, n_loans) / 4,
+        "thoi_gian_vay": rng.integers(1, 121, n_loans),
+        "phuong_thuc_tra_no": rng.choice(list(METHODS), n_loans),
+        "an_han_goc": rng.integers(0, 6, n_loans),
+        "chu_ky_tra_goc": rng.choice([1, 3, 6], n_loans),
+        "san_pham": rng.choice(["Tiêu dùng", "Kinh doanh", "Nhà ở"], n_loans),
+        "can_bo": rng.choice(["A", "B"], n_loans),
+        "ngay_giai_ngan": pd.Timestamp("2022-01-15") + pd.to_timedelta(rng.integers(0, 900, n_loans), unit="D"),
+    })
+
+def legacy_cash_flows(df, group_by):
+    """Cách cũ: một DataFrame kế hoạch trả nợ cho mỗi khoản vay rồi groupby."""
+    frames = []
+    for row in df.itertuples(index=False):
+        schedule = calculate_repayment_schedule(row.so_tien_vay, row.lai_suat, row.thoi_gian_vay,
+                                                row.phuong_thuc_tra_no, row.an_han_goc, row.chu_ky_tra_goc)
+        start = pd.Period(row.ngay_giai_ngan, freq="M")
+        frame = pd.DataFrame({
+            "thang": [start + int(k) for k in schedule["Kỳ trả nợ"]],
+            "goc": schedule["Gốc trả trong kỳ"],
+            "lai": schedule["Lãi trả trong kỳ"],
+        })
+        for dim in group_by:
+            frame[dim] = getattr(row, dim)
+        frames.append(frame)
+    result = pd.concat(frames).groupby(["thang"] + list(group_by), as_index=False)[["goc", "lai"]].sum()
+    result["tong"] = result["goc"] + result["lai"]
+    return result[["thang"] + list(group_by) + ["goc", "lai", "tong"]]
+
+@pytest.mark.parametrize("group_by", [(), ("san_pham",), ("san_pham", "can_bo")])
+def test_matches_per_loan_loop(group_by):
+    df = random_frame(60, seed=len(group_by))
+    result = project_cash_flows(Portfolio.from_frame(df), group_by)
+    pd.testing.assert_frame_equal(result, legacy_cash_flows(df, group_by), check_dtype=False, rtol=1e-9)
+
+def test_chunking_does_not_change_result():
+    portfolio = Portfolio.from_frame(random_frame(200, seed=7))
+    # Ngân sách rất nhỏ: mỗi khối chỉ một vài khoản vay
+    pd.testing.assert_frame_equal(project_cash_flows(portfolio, ("can_bo",), memory_budget_mb=0.01),
+                                  project_cash_flows(portfolio, ("can_bo",)), rtol=1e-12)
+
+def test_totals_equal_principal():
+    df = random_frame(50, seed=3)
+    result = project_cash_flows(Portfolio.from_frame(df))
+    assert result["goc"].sum() == pytest.approx(df["so_tien_vay"].sum(), rel=1e-9)
+
+def test_empty_and_invalid_portfolios():
+    empty = random_frame(5).assign(so_tien_vay=0)
+    assert project_cash_flows(Portfolio.from_frame(empty)).empty
+    with pytest.raises(ValueError):
+        Portfolio.from_frame(random_frame(5).assign(phuong_thuc_tra_no="khong_ro"))
+    with pytest.raises(ValueError):
+        Portfolio.from_frame(random_frame(5).drop(columns="lai_suat"))
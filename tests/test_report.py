@@ -0,0 +1,94 @@
+"""Mẫu báo cáo đã phân tích sẵn (ghép chuỗi XML) so với báo cáo dựng bằng python-docx như cách cũ; ghi .zip hàng loạt."""
+import multiprocessing
+import zipfile
+from io import BytesIO
+import pytest
+from docx import Document
+from core import calculate_ratios, format_ratios_for_report
+from report import ReportTemplate, build_context, build_default_template, create_report_pool, render_reports_zip
+
+INFO = {
+    "ho_ten": "Nguyễn Văn A & B <C>", "cccd": "012345678901", "sdt": "0912345678", "dia_chi": "Hà Tĩnh",
+    "muc_dich_vay": "Kinh doanh\nnông sản", "tong_nhu_cau_von": 4e8, "von_doi_ung": 1e8, "so_tien_vay": 3e8,
+    "lai_suat": 8.5, "thoi_gian_vay": 24, "tsdb_mo_ta": "Nhà đất", "tsdb_gia_tri": 5e8,
+}
+
+@pytest.fixture(scope="module")
+def template():
+    return ReportTemplate(build_default_template())
+
+def docx_lines(data):
+    """Các dòng văn bản của file .docx: đoạn văn, rồi các ô bảng theo dòng."""
+    doc = Document(BytesIO(data))
+    lines = [p.text for p in doc.paragraphs]
+    for table in doc.tables:
+        lines += ["\t".join(cell.text for cell in row.cells) for row in table.rows]
+    return lines
+
+def legacy_report_lines(info, ratios, ai_analysis_1, ai_analysis_2):
+    """Nội dung báo cáo cũ (dựng từng đoạn bằng python-docx) ở dạng các dòng cần có trong báo cáo mới."""
+    money = lambda key: f"{info[key]:,.0f}".replace(",", ".") + " VNĐ"
+    return [
+        "BÁO CÁO THẨM ĐỊNH SƠ BỘ", "1. Thông tin khách hàng", f"Họ và tên: {info['ho_ten']}",
+        f"CCCD/CMND: {info['cccd']}", f"Số điện thoại: {info['sdt']}", f"Địa chỉ: {info['dia_chi']}",
+        "2. Thông tin Phương án vay & Các chỉ số", f"Mục đích vay: {info['muc_dich_vay']}",
+        f"Tổng nhu cầu vốn: {money('tong_nhu_cau_von')}", f"Vốn đối ứng: {money('von_doi_ung')}",
+        f"Số tiền vay: {money('so_tien_vay')}", f"Lãi suất: {info['lai_suat']} %/năm",
+        f"Thời gian vay: {info['thoi_gian_vay']} tháng",
+        *(f"{label}\t{value}" for label, value in ratios.items()),
+        "3. Thông tin tài sản đảm bảo", f"Mô tả: {info['tsdb_mo_ta']}", f"Tổng giá trị định giá: {money('tsdb_gia_tri')}",
+        "4. Phân tích tự động bởi AI", ai_analysis_1, ai_analysis_2,
+    ]
+
+def test_matches_legacy_report_content(template):
+    ratios = format_ratios_for_report(calculate_ratios(3e8, 4e8, 1e8, 5e8))
+    data = template.render(build_context(INFO, ratios, "Phân tích 1", "Phân tích 2"))
+    lines = docx_lines(data)
+    for expected in legacy_report_lines(INFO, ratios, "Phân tích 1", "Phân tích 2"):
+        assert expected in lines
+    assert not any("{{" in line for line in lines)
+
+def test_fields_split_across_runs_and_repeated_rows():
+    doc = Document()
+    paragraph = doc.add_paragraph()
+    for text in ("Tên: {{", "ho_", "ten}}"):
+        paragraph.add_run(text)
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "{{dong.a}}"
+    table.cell(0, 1).text = "{{dong.b}}"
+    buffer = BytesIO()
+    doc.save(buffer)
+    template = ReportTemplate(buffer.getvalue())
+    assert template.fields == ["dong.a", "dong.b", "ho_ten"]
+    lines = docx_lines(template.render({"ho_ten": "Lê C", "dong": [{"a": 1, "b": 2}, {"a": 3, "b": 4}]}))
+    assert "Tên: Lê C" in lines
+    assert lines[-2:] == ["1\t2", "3\t4"]
+    # Danh sách rỗng: bỏ dòng mẫu
+    assert docx_lines(template.render({"ho_ten": ""}))[-1] == "Tên: "
+
+def jobs(n):
+    ratios = format_ratios_for_report(calculate_ratios(3e8, 4e8, 1e8, 5e8))
+    context = build_context(INFO, ratios)
+    return [(f"BaoCao_{i:03d}.docx", {**context, "ho_ten": f"Khách hàng {i}", "ngay_lap": "01/01/2025"}) for i in range(n)]
+
+def zip_contents(target):
+    """(tên file, nội dung các phần của báo cáo) trong file .zip; bỏ qua thời điểm ghi của từng phần."""
+    with zipfile.ZipFile(target) as archive:
+        reports = [(info.filename, archive.read(info)) for info in archive.infolist()]
+    contents = []
+    for name, data in reports:
+        with zipfile.ZipFile(BytesIO(data)) as report:
+            contents.append((name, {part: report.read(part) for part in report.namelist()}))
+    return contents
+
+def test_zip_in_process_and_with_pool_are_identical(template, tmp_path):
+    in_process = BytesIO()
+    assert render_reports_zip(iter(jobs(12)), in_process, template, workers=0) == 12
+    with create_report_pool(template, workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for attempt in range(2):
+            path = tmp_path / f"lan_{attempt}.zip"
+            assert render_reports_zip(iter(jobs(12)), str(path), template, workers=2, max_in_flight=3, pool=pool) == 12
+            assert zip_contents(path) == zip_contents(in_process)
+    with zipfile.ZipFile(in_process) as archive:
+        assert archive.namelist() == [name for name, _ in jobs(12)]
+        assert "Họ và tên: Khách hàng 7" in docx_lines(archive.read("BaoCao_007.docx"))
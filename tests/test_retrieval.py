@@ -0,0 +1,64 @@
+"""Chỉ mục BM25 (danh sách đảo) so với tính điểm trực tiếp trên từng đoạn; ghép ngữ cảnh trong ngân sách token."""
+import math
+from collections import Counter
+from io import BytesIO
+import pytest
+from benchmarks.synthetic import build_plan_docx
+from core import extract_text_from_docx
+from retrieval import BM25Index, estimate_tokens, split_chunks, tokenize
+
+def brute_force_scores(chunks, query, k1=1.5, b=0.75):
+    """Điểm BM25 của mọi đoạn, tính lại từ đầu cho từng đoạn (không chỉ mục)."""
+    docs = [Counter(tokenize(chunk)) for chunk in chunks]
+    avg_length = sum(sum(doc.values()) for doc in docs) / len(docs)
+    scores = [0.0] * len(docs)
+    for token in set(tokenize(query)):
+        df = sum(1 for doc in docs if token in doc)
+        if df == 0:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(docs):
+            tf = doc[token]
+            if tf:
+                length = sum(doc.values())
+                scores[i] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+    return scores
+
+QUERIES = ["lãi suất cho vay", "lai suat", "tài sản bảo đảm", "doanh thu của phương án", "chi phí", "không có từ này"]
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_brute_force(seed):
+    text = extract_text_from_docx(BytesIO(build_plan_docx(pages=8, seed=seed)[0]))
+    chunks = split_chunks(text, 600)
+    index = BM25Index(chunks)
+    for query in QUERIES:
+        expected = brute_force_scores(chunks, query)
+        ranked = sorted(((score, idx) for idx, score in enumerate(expected) if score > 0), reverse=True)[:5]
+        result = index.search(query, top_k=5)
+        assert [idx for _, idx in result] == [idx for _, idx in ranked]
+        assert [score for score, _ in result] == pytest.approx([score for score, _ in ranked], rel=1e-12)
+
+def test_unaccented_query_finds_accented_text():
+    index = BM25Index(["Khách hàng đề nghị lãi suất 8%/năm.", "Tài sản bảo đảm là nhà đất.", "Doanh thu hằng năm."])
+    assert index.search("lai suat", top_k=1)[0][1] == 0
+    assert index.search("TÀI SẢN", top_k=1)[0][1] == 1
+    assert "lãi_suất" in tokenize("Lãi suất")
+
+def test_context_respects_budget_and_document_order():
+    chunks = [f"Đoạn {i:02d}: lãi suất " + "nội dung " * 40 for i in range(20)]
+    index = BM25Index(chunks)
+    budget = 3 * estimate_tokens(chunks[0])
+    context = index.context_for("lãi suất", top_k=10, token_budget=budget)
+    parts = context.split("\n...\n")
+    assert len(parts) == 3
+    assert [chunks.index(part) for part in parts] == sorted(chunks.index(part) for part in parts)
+
+def test_split_chunks_limits_length_and_keeps_text():
+    text = "dòng ngắn\n\n" + "x" * 2500 + "\n" + "\n".join(f"dòng {i}" for i in range(300))
+    chunks = split_chunks(text, 1000)
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+
+def test_empty_index():
+    assert BM25Index([]).search("lãi suất") == []
+    assert BM25Index.from_text("").context_for("lãi suất") == ""
@@ -0,0 +1,45 @@
+"""Lưới kịch bản (kế hoạch cho 1 đồng vốn, nhân broadcast) so với tính riêng từng kịch bản như cách cũ."""
+import itertools
+import numpy as np
+import pytest
+from core import calculate_repayment_schedule
+from scenario import AXES, evaluate_grid, grid_slice, repayment_source
+from schedule import METHODS
+
+def legacy_scenario(rate, term, amount, shock, method, grace, season, source, doanh_thu, tsdb_gia_tri):
+    """Một kịch bản: dựng đủ bảng kế hoạch trả nợ rồi tính từng chỉ tiêu."""
+    df = calculate_repayment_schedule(amount, rate, term, method, grace, season)
+    payment = df["Tổng gốc và lãi"]
+    annual = payment.sum() if len(payment) <= 12 else payment.rolling(12).sum().max()
+    remaining = max(source - doanh_thu * shock / 100, 0.0) if doanh_thu > 0 else max(source * (1 - shock / 100), 0.0)
+    return {
+        "tong_lai": df["Lãi trả trong kỳ"].sum(),
+        "ky_tra_cao_nhat": payment.max(),
+        "he_so_tra_no": remaining / annual if annual > 0 else 0.0,
+        "ltv": amount / tsdb_gia_tri * 100 if tsdb_gia_tri > 0 else 0.0,
+    }
+
+@pytest.mark.parametrize("method", list(METHODS))
+@pytest.mark.parametrize("doanh_thu", [0, 9e8])
+def test_matches_per_scenario_loop(method, doanh_thu):
+    rates, terms, amounts, shocks = [6.5, 12.0], [6, 12, 37], [1e8, 7.5e8], [0, 30, 100]
+    grid = evaluate_grid(rates, terms, amounts, shocks, method, grace_months=2, season_months=3,
+                         nguon_tra_no=4e8, doanh_thu=doanh_thu, tsdb_gia_tri=1e9)
+    for (i, rate), (j, term), (k, amount), (m, shock) in itertools.product(*map(enumerate, (rates, terms, amounts, shocks))):
+        expected = legacy_scenario(rate, term, amount, shock, method, 2, 3, 4e8, doanh_thu, 1e9)
+        for metric, value in expected.items():
+            assert getattr(grid, metric)[i, j, k, m] == pytest.approx(value, rel=1e-9), metric
+
+def test_repayment_source_falls_back_to_income_surplus():
+    np.testing.assert_allclose(repayment_source([0, 50], nguon_tra_no=0, chenh_lech_thu_chi=2e8), [2e8, 1e8])
+    np.testing.assert_allclose(repayment_source([0, 50], nguon_tra_no=3e8, chenh_lech_thu_chi=2e8), [3e8, 1.5e8])
+    # Doanh thu giảm nhiều hơn nguồn trả nợ: không âm
+    np.testing.assert_allclose(repayment_source([100], nguon_tra_no=1e8, doanh_thu=5e8), [0.0])
+
+def test_grid_slice_orientation():
+    grid = evaluate_grid([5, 10, 15], [12, 24], [1e8], [0, 50], tsdb_gia_tri=2e8, nguon_tra_no=1e8)
+    x, y, matrix = grid_slice(grid, "tong_lai", "lai_suat", "thoi_gian_vay", {"so_tien_vay": 0, "cu_soc_doanh_thu": 1})
+    assert list(x) == [5, 10, 15] and list(y) == [12, 24]
+    assert matrix.shape == (2, 3)
+    assert matrix[1, 2] == grid.tong_lai[2, 1, 0, 1]
+    assert set(AXES) == set(grid.axes)
@@ -0,0 +1,67 @@
+"""Bộ tính kế hoạch trả nợ dạng vector so với vòng lặp tính từng kỳ của phiên bản cũ."""
+import numpy as np
+import pandas as pd
+import pytest
+from core import calculate_repayment_schedule
+from schedule import CUOI_KY, GOC_DEU, METHODS, NIEN_KIM, THEO_MUA_VU, compute_schedules
+
+def legacy_schedule(principal, annual_rate, term_months):
+    """Bản sao vòng lặp cũ (gốc đều, lãi theo dư nợ đầu kỳ)."""
+    if not all([principal > 0, annual_rate > 0, term_months > 0]):
+        return pd.DataFrame()
+    monthly_rate = annual_rate / 12 / 100
+    principal_payment = principal / term_months
+    schedule = []
+    remaining_balance = principal
+    for i in range(1, term_months + 1):
+        interest_payment = remaining_balance * monthly_rate
+        schedule.append({
+            "Kỳ trả nợ": i,
+            "Dư nợ đầu kỳ": remaining_balance,
+            "Gốc trả trong kỳ": principal_payment,
+            "Lãi trả trong kỳ": interest_payment,
+            "Tổng gốc và lãi": principal_payment + interest_payment,
+            "Dư nợ cuối kỳ": remaining_balance - principal_payment,
+        })
+        remaining_balance -= principal_payment
+    df = pd.DataFrame(schedule)
+    df.loc[df.index[-1], "Dư nợ cuối kỳ"] = 0
+    return df
+
+@pytest.mark.parametrize("principal, annual_rate, term", [
+    (300_000_000, 6.5, 24), (1_000_000_000, 9.0, 1), (123_456_789, 12.25, 7), (5e9, 7.1, 360), (1, 0.1, 480),
+])
+def test_matches_legacy_loop(principal, annual_rate, term):
+    expected = legacy_schedule(principal, annual_rate, term)
+    actual = calculate_repayment_schedule(principal, annual_rate, term)
+    assert list(actual.columns) == list(expected.columns)
+    assert actual["Kỳ trả nợ"].tolist() == expected["Kỳ trả nợ"].tolist()
+    # Vòng lặp cũ cộng dồn sai số làm tròn qua từng kỳ; công thức đóng thì không
+    for col in expected.columns[1:]:
+        np.testing.assert_allclose(actual[col], expected[col], rtol=1e-9, atol=principal * 1e-12)
+
+@pytest.mark.parametrize("args", [(0, 6.5, 12), (1e8, 0, 12), (1e8, 6.5, 0), (-1e8, 6.5, 12)])
+def test_invalid_inputs_give_empty_frame(args):
+    assert calculate_repayment_schedule(*args).empty
+    assert legacy_schedule(*args).empty
+
+@pytest.mark.parametrize("method", list(METHODS))
+def test_balances_are_consistent(method):
+    s = compute_schedules([5e8, 2e8, 7e8], [8.0, 0.0, 11.5], [36, 12, 25], method, grace_months=[0, 3, 6], season_months=4)
+    for i, term in enumerate(s.term):
+        np.testing.assert_allclose(s.principal[i].sum(), s.opening[i, 0])
+        np.testing.assert_allclose(s.opening[i, 1:term], s.closing[i, :term - 1])
+        assert s.closing[i, term - 1] == 0
+        assert not s.payment[i, term:].any()
+
+def test_batch_equals_single_loans():
+    principal = [3e8, 1.2e9, 5e7, 9e8]
+    rate = [6.5, 9.0, 12.0, 0.0]
+    term = [24, 60, 7, 18]
+    methods = [GOC_DEU, NIEN_KIM, CUOI_KY, THEO_MUA_VU]
+    grace = [0, 6, 2, 3]
+    batch = compute_schedules(principal, rate, term, methods, grace, 3)
+    for i in range(len(principal)):
+        single = compute_schedules(principal[i], rate[i], term[i], methods[i], grace[i], 3)
+        for field in ("opening", "principal", "interest", "payment", "closing"):
+            np.testing.assert_allclose(getattr(batch, field)[i, :term[i]], getattr(single, field)[0])
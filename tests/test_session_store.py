@@ -0,0 +1,106 @@
+"""Kho dữ liệu phiên: trả về đúng như lưu thẳng trong dict phiên (cách cũ), dù đã dùng chung, xuống đĩa hay bị thu hồi."""
+import os
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from session_store import SessionStore
+
+MB = 1024 * 1024
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(session_budget_mb=0.5, memory_budget_mb=1, idle_seconds=60, spill_dir=str(tmp_path),
+                         clock=FakeClock())
+    yield store
+    store.close()
+
+def text(seed, size=200_000):
+    return f"Phương án {seed} " + "x" * size
+
+def test_random_operations_match_plain_dicts(store):
+    rng = random.Random(0)
+    legacy = {}
+    for _ in range(400):
+        sid, name = f"s{rng.randrange(4)}", rng.choice(["docx_text", "ai_analysis_1", "chat_history"])
+        op = rng.random()
+        if name == "chat_history" and op < 0.7:
+            message = {"role": "user", "content": text(rng.randrange(6), 20_000)}
+            store.append(sid, name, message)
+            legacy.setdefault(sid, {}).setdefault(name, []).append(message)
+        elif name != "chat_history" and op < 0.7:
+            value = text(rng.randrange(6))
+            store.put(sid, name, value)
+            legacy.setdefault(sid, {})[name] = value
+        elif op < 0.8:
+            store.delete(sid, name)
+            legacy.get(sid, {}).pop(name, None)
+        for check_sid, items in legacy.items():
+            for check_name, value in items.items():
+                assert store.get(check_sid, check_name) == value
+    assert store.stats()["spills"] > 0 and store.stats()["loads"] > 0
+    assert store.memory_bytes <= 1 * MB + 300_000
+
+def test_identical_content_is_stored_once(store):
+    store.put("a", "docx_text", text(1))
+    store.put("b", "docx_text", "".join(text(1)))
+    stats = store.stats()
+    assert stats["items"] == 1 and stats["shared_items"] == 1
+    store.delete("a", "docx_text")
+    assert store.get("b", "docx_text") == text(1)
+
+def test_idle_sessions_are_evicted_with_their_files(store):
+    for i in range(8):
+        store.put("old", f"muc_{i}", text(i))
+    assert os.listdir(store.spill_dir)
+    store._clock.now += 61
+    store.put("new", "docx_text", text(99))
+    assert store.evict_idle() == 1
+    assert not store.contains("old", "muc_0")
+    assert store.stats()["items"] == 1
+    assert os.listdir(store.spill_dir) == []
+
+def test_lost_spill_file_reads_as_missing(store):
+    for i in range(8):
+        store.put("s", f"muc_{i}", text(i))
+    for name in os.listdir(store.spill_dir):
+        os.remove(os.path.join(store.spill_dir, name))
+    assert store.get("s", "muc_0", "mặc định") == "mặc định"
+    assert not store.contains("s", "muc_0")
+
+def test_append_converts_existing_list(store):
+    store.put("s", "chat_history", [{"role": "user", "content": "a"}])
+    store.append("s", "chat_history", {"role": "assistant", "content": "b"})
+    assert store.get("s", "chat_history") == [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}]
+    store.put("s", "chat_history", "thay thế")
+    assert store.get("s", "chat_history") == "thay thế"
+
+def test_unchanged_object_is_not_hashed_again(store):
+    df = pd.DataFrame(np.arange(200_000).reshape(-1, 4))
+    key = store.put("s", "df", df)
+    # Đẩy df xuống đĩa rồi lưu lại đúng đối tượng đó
+    store.put("s", "khac", text(0, 600_000))
+    assert store.put("s", "df", df) == key
+    assert store.stats()["unchanged_puts"] == 1
+    # Đối tượng khác (dù cùng nội dung) thì băm lại; version do nơi gọi quản lý cũng được tôn trọng
+    store.put("s", "df", df.copy())
+    store.put("s", "df", df, version=1)
+    store.put("s", "df", df.copy(), version=1)
+    assert store.stats()["unchanged_puts"] == 2
+    pd.testing.assert_frame_equal(store.get("s", "df"), df)
+
+def test_each_store_has_its_own_spill_directory(tmp_path):
+    first = SessionStore(spill_dir=str(tmp_path))
+    second = SessionStore(spill_dir=str(tmp_path))
+    assert first.spill_dir != second.spill_dir
+    assert os.path.dirname(first.spill_dir) == str(tmp_path)
+    first.close()
+    assert not os.path.exists(first.spill_dir) and os.path.exists(second.spill_dir)
+    second.close()